@@ -0,0 +1,76 @@
+# benchmarks/db_overhead.py
+"""Бір мәтіндік хабарламаға кететін дерекқор шығынын өлшейді.
+
+"Бұрын" режимі әр шақыруда жаңа sqlite3.connect() ашатын ескі тәсілді қайталайды
+(әдепкі DELETE журналы, synchronous=FULL), "кейін" режимі bot.database-тің
+ұзақ өмір сүретін WAL қосылымын қолданады.
+
+Іске қосу: python -m benchmarks.db_overhead [хабарлама саны]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+os.environ["RENDER_DISK_MOUNT_PATH"] = tempfile.mkdtemp(prefix="bench_db_")
+
+from bot import database  # noqa: E402
+
+USERS = 200
+
+
+def _simulate_message(user_id: int, i: int):
+    """handle_message бір хабарламада шақыратын дерекқор функциялары."""
+    database.get_user_language(user_id)
+    database.is_user_premium(user_id)
+    database.check_and_increment_usage(user_id, 'text', 10 ** 9)
+    database.get_thread_id(user_id)
+    database.set_thread_id(user_id, f"thread_{user_id}")
+    database.set_last_q_and_a(user_id, f"сұрақ {i}", f"жауап {i}")
+
+
+def _prepare(db_file: str):
+    database.close_connections()
+    database.DB_FILE = db_file
+    database.init_db()
+    for user_id in range(USERS):
+        database.add_or_update_user(user_id, "Bench User", "bench", "kk")
+
+
+def _run(messages: int) -> float:
+    start = time.perf_counter()
+    for i in range(messages):
+        _simulate_message(i % USERS, i)
+    return time.perf_counter() - start
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    data_dir = os.environ["RENDER_DISK_MOUNT_PATH"]
+    pooled_connection = database.get_connection
+
+    # Бұрын: әр шақыруда жаңа қосылым, pragma-сыз
+    legacy_file = os.path.join(data_dir, "legacy.db")
+    _prepare(legacy_file)
+    database.close_connections()
+    sqlite3.connect(legacy_file).execute("PRAGMA journal_mode=DELETE").close()
+    database.get_connection = lambda: sqlite3.connect(legacy_file)
+    try:
+        before = _run(messages)
+    finally:
+        database.get_connection = pooled_connection
+
+    # Кейін: ұзақ өмір сүретін WAL қосылымы
+    _prepare(os.path.join(data_dir, "pooled.db"))
+    after = _run(messages)
+    database.close_connections()
+
+    print(f"Хабарламалар саны: {messages} (әрқайсысында 6 дерекқор шақыруы)")
+    print(f"Бұрын: {before * 1000 / messages:8.3f} мс/хабарлама")
+    print(f"Кейін: {after * 1000 / messages:8.3f} мс/хабарлама")
+    print(f"Жылдамдау: x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
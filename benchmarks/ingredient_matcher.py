@@ -0,0 +1,64 @@
+# benchmarks/ingredient_matcher.py
+"""Ұзын OCR мәтіндерінде құрамдас бөліктерді іздеу жылдамдығын өлшейді.
+
+"Бұрын" режимі әр термин үшін мәтінді жеке регулярлы өрнекпен тексереді
+(терминдер саны өскен сайын баяулайды), "кейін" режимі bot.ingredients-тің
+Aho-Corasick автоматымен мәтінді бір рет өтеді.
+
+Іске қосу: python -m benchmarks.ingredient_matcher [мәтін саны]
+"""
+import json
+import random
+import re
+import sys
+import time
+
+from bot.ingredients import IngredientIndex, normalize
+
+FILLER_WORDS = ["ароматизатор", "идентичный", "натуральному", "эмульгатор", "краситель", "консервант",
+                "загуститель", "разрыхлитель", "масса", "нетто", "г", "ккал", "белки", "жиры", "углеводы",
+                "хранить", "при", "температуре", "не", "выше", "срок", "годности", "месяцев", "изготовитель"]
+
+
+def _make_texts(index: IngredientIndex, count: int, words: int) -> list[str]:
+    terms = [term for item in index.ingredients.values() for term in item["terms"]]
+    rng = random.Random(42)
+    texts = []
+    for _ in range(count):
+        tokens = [rng.choice(terms) if rng.random() < 0.2 else rng.choice(FILLER_WORDS) for _ in range(words)]
+        texts.append("Состав: " + ", ".join(tokens) + ".")
+    return texts
+
+
+def _naive_find(patterns: list[tuple[re.Pattern, str]], text: str) -> set[str]:
+    normalized = normalize(text)
+    return {value for pattern, value in patterns if pattern.search(normalized)}
+
+
+def main(count: int = 2000, words: int = 150):
+    with open("ingredients.json", encoding="utf-8") as f:
+        index = IngredientIndex(json.load(f))
+    texts = _make_texts(index, count, words)
+    patterns = [
+        (re.compile(r"(?<!\w)" + re.escape(normalize(term)) + r"(?!\w)"), item["id"])
+        for item in index.ingredients.values() for term in item["terms"]
+    ]
+
+    start = time.perf_counter()
+    for text in texts:
+        _naive_find(patterns, text)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in texts:
+        index.analyze(text)
+    automaton = time.perf_counter() - start
+
+    total_kb = sum(len(text.encode("utf-8")) for text in texts) / 1024
+    print(f"{count} мәтін, әрқайсысы ~{words} сөз ({total_kb:.0f} КБ), {len(patterns)} термин")
+    print(f"Бұрын (әр терминге бөлек regex): {naive:.3f} с, {total_kb / naive:.0f} КБ/с")
+    print(f"Кейін (Aho-Corasick, бір өту):   {automaton:.3f} с, {total_kb / automaton:.0f} КБ/с")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,116 @@
+# benchmarks/photo_pipeline.py
+"""Суретті OCR-ға дайындау кезеңінің байт көлемі мен кешігуін өлшейді.
+
+Telegram-ның әдеттегі өлшемдеріндегі (90…2560 px) синтетикалық этикетка
+суреттері жасалады. Желі BANDWIDTH_MBIT жолағымен, Vision өңдеуі тұрақты
+VISION_LATENCY кідірісімен модельденеді.
+
+"Бұрын": ең үлкен өлшем, bytearray-ге жүктеу + bytes() көшірмесі, суретті
+өзгертпей Vision-ға жіберу. "Кейін": bot.photo_prep — ең кіші оқылатын
+өлшем, бір рет жүктеу, сұр түс/кесу/сығу.
+
+Іске қосу: python -m benchmarks.photo_pipeline [сурет саны] [Мбит/с]
+"""
+import asyncio
+import io
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+from bot import photo_prep
+
+TELEGRAM_SIDES = [90, 320, 800, 1280, 2560]
+VISION_LATENCY = 0.15
+
+
+def _make_label(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.effect_noise((2560, 1920), 40).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((400, 300, 2160, 1620), fill=(240, 230, 200))
+    for row in range(30):
+        words = " ".join(rng.choice(["сахар", "E120", "желатин", "соль", "крахмал", "E471"]) for _ in range(12))
+        draw.text((450, 340 + row * 40), words, fill="black")
+    return image
+
+
+def _telegram_sizes(image: Image.Image) -> list:
+    sizes = []
+    for side in TELEGRAM_SIDES:
+        copy = image.copy()
+        copy.thumbnail((side, side))
+        buffer = io.BytesIO()
+        copy.save(buffer, format="JPEG", quality=87)
+        data = buffer.getvalue()
+        sizes.append(SimpleNamespace(width=copy.width, height=copy.height, file_unique_id=str(side), data=data,
+                                     get_file=_file_getter(data)))
+    return sizes
+
+
+def _file_getter(data: bytes):
+    async def get_file():
+        async def download_as_bytearray():
+            await _transfer(len(data))
+            return bytearray(data)
+
+        async def download_to_memory(out):
+            await _transfer(len(data))
+            out.write(data)
+
+        return SimpleNamespace(download_as_bytearray=download_as_bytearray, download_to_memory=download_to_memory)
+    return get_file
+
+
+_bandwidth = 20.0
+
+
+async def _transfer(size: int):
+    await asyncio.sleep(size * 8 / (_bandwidth * 1_000_000))
+
+
+async def _before(sizes) -> tuple[int, int, int]:
+    photo = sizes[-1]
+    tg_file = await photo.get_file()
+    photo_bytes = await tg_file.download_as_bytearray()
+    content = bytes(photo_bytes)
+    await _transfer(len(content))
+    await asyncio.sleep(VISION_LATENCY)
+    return len(photo.data), len(photo_bytes) + len(content), len(content)
+
+
+async def _after(sizes) -> tuple[int, int, int]:
+    photo = photo_prep.select_photo_size(sizes)
+    data = await photo_prep.download(photo)
+    content = await asyncio.to_thread(photo_prep.preprocess, data)
+    await _transfer(len(content))
+    await asyncio.sleep(VISION_LATENCY)
+    return len(photo.data), len(data) + (len(content) if content is not data else 0), len(content)
+
+
+async def _measure(name: str, pipeline, photos):
+    totals = [0, 0, 0]
+    start = time.perf_counter()
+    for sizes in photos:
+        for index, value in enumerate(await pipeline(sizes)):
+            totals[index] += value
+    elapsed = time.perf_counter() - start
+    count = len(photos)
+    downloaded, allocated, uploaded = (total / count / 1024 for total in totals)
+    print(f"{name}: жүктелді {downloaded:.0f} КБ, жадқа {allocated:.0f} КБ, Vision-ға {uploaded:.0f} КБ, "
+          f"кешігу {elapsed / count * 1000:.0f} мс / сурет")
+
+
+def main(count: int = 10, bandwidth: float = 20.0):
+    global _bandwidth
+    _bandwidth = bandwidth
+    photos = [_telegram_sizes(_make_label(seed)) for seed in range(count)]
+    print(f"{count} сурет, желі {bandwidth:.0f} Мбит/с, Vision {VISION_LATENCY * 1000:.0f} мс")
+    asyncio.run(_measure("Бұрын (ең үлкен, өзгертусіз)", _before, photos))
+    asyncio.run(_measure("Кейін (photo_prep)          ", _after, photos))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10, float(sys.argv[2]) if len(sys.argv) > 2 else 20.0)
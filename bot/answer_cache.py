@@ -0,0 +1,115 @@
+# bot/answer_cache.py
+"""Жиі қайталанатын сұрақтарға ассистент жауаптарының кэші.
+
+Кілт — қалыпқа келтірілген сұрақ мәтіні мен тіл. Жауаптар жадтағы LRU/TTL
+кэште және SQLite-та (answer_cache кестесі) сақталады. Білім қорына файл
+қосылғанда ``invalidate()`` нұсқаны арттырады: ескі нұсқамен алынған
+жауаптар бұдан былай қайтарылмайды және сақталмайды.
+
+Кэш жалпы (барлық қолданушыларға ортақ), сондықтан алдыңғы сұхбатқа
+сүйенетін сұрақтар ("ал бұл ше?", "why?") кэштен берілмейді де,
+сақталмайды. Өзіндік сұрақтардың жауабы қолданушының thread-і қанша
+ұзын болса да сақталады.
+"""
+import hashlib
+import os
+import re
+import time
+
+from bot import database
+from bot.cache import LRUCache
+from bot.repository import journal, run_read, run_write
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 2000))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 7 * 24 * 3600))
+ANSWER_CACHE_MAX_ROWS = int(os.getenv("ANSWER_CACHE_MAX_ROWS", 50000))
+# Жадтағы кэш басқа процестердегі инвалидацияны осы уақыттан кеш байқамайды
+ANSWER_CACHE_MEMORY_TTL = float(os.getenv("ANSWER_CACHE_MEMORY_TTL", 600))
+
+_memory = LRUCache(maxsize=ANSWER_CACHE_SIZE, ttl=min(ANSWER_CACHE_TTL, ANSWER_CACHE_MEMORY_TTL))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s-]")
+_SPACES_RE = re.compile(r"\s+")
+# "Е 120", "e-120", "Е120" (кирилл Е) — бәрі "e120"
+_E_CODE_RE = re.compile(r"\b[eе]\s*-?\s*(\d{3,4}[a-zа-я]?)\b")
+_NORMALIZED_E_CODE_RE = re.compile(r"e\d{3,4}")
+# Осыдан қысқа сұрақтар (E-кодтан басқа) алдыңғы сұхбатқа сүйенеді деп есептеледі
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("ANSWER_CACHE_MIN_WORDS", 2))
+# Қысқа сұрақтағы мына сөздер алдыңғы жауапқа сілтейді
+_FOLLOW_UP_MAX_WORDS = 5
+_FOLLOW_UP_WORDS = {
+    "бұл", "ол", "осы", "сол", "оның", "мұның", "ше", "неге", "неліктен", "тағы", "тағыда",
+    "это", "этот", "эта", "он", "она", "оно", "они", "его", "её", "почему", "зачем", "а", "еще", "ещё",
+    "this", "that", "it", "its", "they", "them", "why", "else",
+}
+
+
+def normalize_question(text: str) -> str:
+    """Регистр, тыныс белгілері, бос орындар және E-код жазылуындағы айырмашылықтарды жояды."""
+    text = _PUNCTUATION_RE.sub(" ", text.casefold())
+    text = _E_CODE_RE.sub(r"e\1", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def is_cacheable(question: str) -> bool:
+    """Сұрақ контекстсіз түсінікті ме (қысқа не алдыңғы жауапқа сілтейтін сұрақтар — жоқ)."""
+    words = normalize_question(question).split()
+    if any(_NORMALIZED_E_CODE_RE.fullmatch(word) for word in words):
+        return True
+    if len(words) < ANSWER_CACHE_MIN_WORDS:
+        return False
+    return len(words) > _FOLLOW_UP_MAX_WORDS or _FOLLOW_UP_WORDS.isdisjoint(words)
+
+
+def make_key(question: str, lang: str) -> str:
+    normalized = normalize_question(question)
+    return hashlib.sha1(f"{lang}:{normalized}".encode("utf-8")).hexdigest()
+
+
+async def get_kb_version() -> int:
+    """Жауапты сақтау үшін run басталмас бұрын алынатын білім қоры нұсқасы."""
+    return await run_read(database.get_kb_version)
+
+
+async def get(question: str, lang: str) -> str | None:
+    """Кэштелген жауапты қайтарады немесе None."""
+    if not ANSWER_CACHE_ENABLED or not is_cacheable(question):
+        return None
+    key = make_key(question, lang)
+    answer = _memory.get(key)
+    if answer is None:
+        generation = _memory.generation
+        cached = await run_read(database.get_cached_answer, key, ANSWER_CACHE_TTL)
+        if cached is None:
+            return None
+        answer = cached[0]
+        _memory.set(key, answer, generation=generation)
+    journal.put("answer_hit", (key, time.time()))
+    return answer
+
+
+async def put(question: str, lang: str, answer: str, kb_version: int):
+    """Жауапты сақтайды; kb_version run басталар алдында алынған болуы керек."""
+    if not ANSWER_CACHE_ENABLED or not answer or not is_cacheable(question):
+        return
+    key = make_key(question, lang)
+    generation = _memory.generation
+    stored = await run_write(
+        database.put_cached_answer, key, lang, question, answer, kb_version, ANSWER_CACHE_MAX_ROWS
+    )
+    if stored:
+        _memory.set(key, answer, generation=generation)
+
+
+async def invalidate():
+    """Білім қоры жаңарғанда барлық жауаптарды жарамсыз етеді."""
+    _memory.invalidate()
+    version = await run_write(database.bump_kb_version)
+    # Нұсқа ауысқанша басталған оқулар кэшке ескі мән салмауы үшін қайта тазалаймыз
+    _memory.invalidate()
+    return version
+
+
+def stats() -> dict:
+    return _memory.stats()
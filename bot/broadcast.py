@@ -0,0 +1,185 @@
+# bot/broadcast.py
+"""Фондық хабарлама тарату қозғалтқышы.
+
+Тапсырма SQLite-та сақталады және беттеп орындалады: әр бет аяқталғанда
+курсор (соңғы user_id) жазылады, сондықтан бот қайта іске қосылса, тарату
+тоқтаған жерінен жалғасады (ең көбі бір бет қайталануы мүмкін).
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from bot.database import get_user_id_page
+from bot.repository import (
+    create_broadcast_job, finish_broadcast_job, get_broadcast_job, get_unfinished_broadcast_jobs,
+    get_user_count, run_read, save_broadcast_page, set_broadcast_progress_message,
+)
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 30))  # Telegram: ~30 хабарлама/сек
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 10))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 200))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", 5))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", 3))
+
+
+class TokenBucket:
+    """Барлық таратулар бөлісетін жаһандық жылдамдық шектегіші."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Бір токен босағанша күтеді."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """RetryAfter келгенде барлық жіберушілерді көрсетілген уақытқа тоқтатады."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+_bucket = TokenBucket(BROADCAST_RATE)
+_tasks: dict[int, asyncio.Task] = {}
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+async def _send(bot, user_id: int, text: str) -> str:
+    """Бір хабарламаны жібереді: 'sent', 'blocked' немесе 'failed' қайтарады."""
+    for _ in range(BROADCAST_MAX_RETRIES + 1):
+        await _bucket.acquire()
+        try:
+            await bot.send_message(chat_id=user_id, text=text, parse_mode='HTML')
+            return 'sent'
+        except RetryAfter as e:
+            delay = _retry_after_seconds(e)
+            logger.warning(f"Telegram лимиті: {delay} секунд күтеміз.")
+            _bucket.pause(delay)
+        except Forbidden:
+            return 'blocked'
+        except Exception as e:
+            logger.error(f"Қолданушы {user_id} үшін хабарлама жіберуде қате: {e}")
+            return 'failed'
+    return 'failed'
+
+
+def _progress_text(job: dict, finished: bool = False) -> str:
+    processed = job['sent_count'] + job['failed_count'] + job['blocked_count']
+    header = "✅ Хабарлама тарату аяқталды." if finished else f"📬 Тарату жүріп жатыр: {processed}/{job['total']}"
+    return (
+        f"{header}\n"
+        f"👍 Сәтті жіберілді: {job['sent_count']}\n"
+        f"👎 Қатемен аяқталды: {job['failed_count']}\n"
+        f"🚫 Ботты блоктаған: {job['blocked_count']}"
+    )
+
+
+async def _report(bot, job: dict, finished: bool = False):
+    if not job.get('progress_message_id'):
+        return
+    try:
+        await bot.edit_message_text(
+            chat_id=job['admin_chat_id'], message_id=job['progress_message_id'], text=_progress_text(job, finished)
+        )
+    except BadRequest as e:
+        # "Message is not modified" және өшірілген хабарлама — маңызды емес
+        logger.debug(f"Прогресті жаңарту мүмкін болмады: {e}")
+
+
+async def _run_job(bot, job_id: int):
+    job = await get_broadcast_job(job_id)
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    last_report = 0.0
+
+    async def send_limited(user_id: int) -> str:
+        async with semaphore:
+            return await _send(bot, user_id, job['message_text'])
+
+    try:
+        cursor = job['cursor_user_id']
+        while True:
+            page = await run_read(get_user_id_page, cursor, BROADCAST_PAGE_SIZE, blocked=False)
+            if not page:
+                break
+            results = await asyncio.gather(*(send_limited(user_id) for user_id in page))
+            blocked = [user_id for user_id, result in zip(page, results) if result == 'blocked']
+            cursor = page[-1]
+            await save_broadcast_page(job_id, cursor, results.count('sent'), results.count('failed'), blocked)
+
+            if time.monotonic() - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                await _report(bot, await get_broadcast_job(job_id))
+            if len(page) < BROADCAST_PAGE_SIZE:
+                break
+
+        await finish_broadcast_job(job_id)
+        await _report(bot, await get_broadcast_job(job_id), finished=True)
+        logger.info(f"Тарату #{job_id} аяқталды.")
+    except asyncio.CancelledError:
+        # Тоқтату кезінде тапсырма 'running' күйінде қалады және келесі іске қосылуда жалғасады
+        logger.info(f"Тарату #{job_id} тоқтатылды, курсор сақталды.")
+        raise
+    except Exception as e:
+        logger.error(f"Тарату #{job_id} қатемен аяқталды: {e}", exc_info=True)
+        await finish_broadcast_job(job_id, 'failed')
+    finally:
+        _tasks.pop(job_id, None)
+
+
+def _spawn(bot, job_id: int):
+    _tasks[job_id] = asyncio.create_task(_run_job(bot, job_id))
+
+
+async def start_broadcast(bot, admin_chat_id: int, message_text: str) -> int | None:
+    """Жаңа таратуды фонда бастайды; алушылар болмаса None қайтарады."""
+    total = await get_user_count(include_blocked=False)
+    if not total:
+        return None
+    job_id = await create_broadcast_job(admin_chat_id, message_text, total)
+    progress_message = await bot.send_message(
+        chat_id=admin_chat_id, text=f"📬 Хабарламаны {total} қолданушыға жіберу басталды..."
+    )
+    await set_broadcast_progress_message(job_id, progress_message.message_id)
+    _spawn(bot, job_id)
+    return job_id
+
+
+async def resume_broadcasts(bot):
+    """Бот қайта іске қосылғанда аяқталмаған таратуларды жалғастырады."""
+    for job in await get_unfinished_broadcast_jobs():
+        if job['id'] not in _tasks:
+            logger.info(f"Тарату #{job['id']} {job['cursor_user_id']} ID-дан кейін жалғастырылады.")
+            _spawn(bot, job['id'])
+
+
+async def stop_broadcasts():
+    """Жүріп жатқан таратуларды тоқтатады (күйі сақталады)."""
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
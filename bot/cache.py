@@ -0,0 +1,94 @@
+# bot/cache.py
+"""Шектелген көлемді, TTL-ы бар жадтағы LRU кэш."""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Ағындар арасында қауіпсіз LRU/TTL кэш, hit/miss санауыштарымен.
+
+    ``generation`` әр write-through немесе invalidate кезінде өседі. Дерекқордан
+    оқып кэшке салатын код оқуды бастамас бұрын оны алып, ``set(...,
+    generation=...)``-ке береді: егер аралықта жазу болса, ескі мән кэшке түспейді.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Мәнді қайтарады және оны ең соңғы қолданылған деп белгілейді."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def peek(self, key, default=None):
+        """Мәнді статистика мен LRU ретін өзгертпей қайтарады."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or (item[1] is not None and item[1] <= self._timer()):
+                return default
+            return item[0]
+
+    def set(self, key, value, generation: int | None = None):
+        """Мәнді сақтайды; толып кетсе, ең ескі жазбаны шығарады."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            expires_at = self._timer() + self.ttl if self.ttl else None
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def write_through(self, key, update):
+        """Кэштегі мәнді ``update(value)`` нәтижесімен алмастырады (кэште болса ғана)."""
+        with self._lock:
+            self.generation += 1
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                self._data[key] = (update(item[0]), item[1])
+
+    def invalidate(self, key=_MISSING):
+        """Бір кілтті немесе (кілтсіз шақырылса) бүкіл кэшті тазалайды."""
+        with self._lock:
+            self.generation += 1
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Кэшті баптауға арналған санауыштар."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
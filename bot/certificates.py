@@ -0,0 +1,249 @@
+# bot/certificates.py
+"""Халал сертификаттар тізілімі (qmdb_data_json.json) бойынша жергілікті іздеу.
+
+Ұйымдардың атаулары қалыпқа келтірілген сөздерге бөлініп, кері индекске
+(сөз → ұйымдар) салынады. Құқықтық нысандар (ЖШС, ТОО, LLP...) мен жиі
+кездесетін жалпы сөздер ескерілмейді. OCR қателеріне төзімді болу үшін
+ұзын сөздер бір әріп айырмашылықпен де табылады (бір әріп өшірілген
+нұсқалардың индексі арқылы).
+
+Индекс мекемелер базасымен (bot.establishments) бір файлдан құрылады және
+сол база қайта жүктелген сайын қайта құрылады.
+
+Нәтиже екі түрлі қолданылады:
+  * атау толық әрі дәл сәйкес келсе, сертификат мерзімі өтпесе және суретте
+    терістелмеген халал белгісі болса — жауап OpenAI-сыз беріледі;
+  * әйтпесе табылған жазбалар ассистент сұрағына құрылымдық контекст
+    ретінде қосылады.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from bot.establishments import store
+from bot.ingredients import is_negated, normalize
+from bot.utils import get_text
+
+logger = logging.getLogger(__name__)
+
+CERT_FAST_PATH = os.getenv("CERT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Ұйым атауындағы сөздердің осы үлесі табылса, сәйкестік деп есептеледі
+CERT_MIN_SCORE = float(os.getenv("CERT_MIN_SCORE", 0.75))
+CERT_MAX_MATCHES = int(os.getenv("CERT_MAX_MATCHES", 3))
+# Осыдан ұзын сөздер бір әріп қатесімен де табылады
+CERT_FUZZY_MIN_LENGTH = 5
+# Ұйымдардың осы үлесінен көбінде кездесетін сөз жалпы сөз саналады
+CERT_MAX_DOC_FREQUENCY = 0.02
+
+_LEGAL_FORMS = {
+    "тоо", "жшс", "ип", "жк", "ао", "ақ", "ооо", "зао", "оао", "тд", "кх", "шқ", "пк", "llp", "llc", "ltd", "jsc", "inc",
+}
+_GENERIC_WORDS = {
+    "халал", "halal", "kz", "компания", "company", "кафе", "cafe", "ресторан", "restaurant", "магазин", "дүкен",
+    "казахстан", "қазақстан", "kazakhstan", "и", "мен", "және", "the",
+}
+_HALAL_MARKERS = {"халал", "halal", "حلال"}
+# Белгінің алдында тұрып, оны терістейтін сөздер ("не халал", "not halal")
+_NEGATING_PREFIXES = {"не", "not", "non", "no", "без"}
+_SERT_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%dT%H:%M:%S")
+
+
+@dataclass
+class RegistryMatch:
+    title: str
+    category: str
+    sert_date: str
+    score: float
+    exact: bool
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Екі сөз ең көбі бір әріппен (ауыстыру, қосу не өшіру) ерекшелене ме."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = j = edits = 0
+    while i < len(a) and j < len(b):
+        if a[i] != b[j]:
+            edits += 1
+            if edits > 1:
+                return False
+            if len(a) == len(b):
+                i += 1
+        else:
+            i += 1
+        j += 1
+    return edits + (len(b) - j) + (len(a) - i) <= 1
+
+
+def _deletes(word: str) -> set[str]:
+    return {word[:index] + word[index + 1:] for index in range(len(word))}
+
+
+class CertificateIndex:
+    """Тізілімдегі ұйым атауларының кері индексі."""
+
+    def __init__(self, data: dict):
+        organizations = data.get("data", {}).get("organizations", [])
+        self.records = []
+        self.tokens: list[set[str]] = []
+        document_frequency = defaultdict(int)
+        for org in organizations:
+            title = org.get("title")
+            if not title:
+                continue
+            words = {word for word in normalize(title).split()
+                     if len(word) >= 3 and not word.isdigit() and word not in _LEGAL_FORMS and word not in _GENERIC_WORDS}
+            if not words:
+                continue
+            self.records.append(org)
+            self.tokens.append(words)
+            for word in words:
+                document_frequency[word] += 1
+
+        common_limit = max(3, int(len(self.records) * CERT_MAX_DOC_FREQUENCY))
+        self.postings: dict[str, list[int]] = defaultdict(list)
+        self.variants: dict[str, set[str]] = defaultdict(set)
+        for org_id, words in enumerate(self.tokens):
+            # Тым жиі кездесетін сөздер ұйымды ажыратпайды
+            distinctive = {word for word in words if document_frequency[word] <= common_limit} or words
+            self.tokens[org_id] = distinctive
+            for word in distinctive:
+                self.postings[word].append(org_id)
+        for word in self.postings:
+            if len(word) >= CERT_FUZZY_MIN_LENGTH:
+                for variant in _deletes(word) | {word}:
+                    self.variants[variant].add(word)
+
+    def _lookup(self, word: str) -> list[tuple[str, bool]]:
+        """Сөзге сәйкес индекс сөздері: (сөз, дәл сәйкестік пе)."""
+        if word in self.postings:
+            return [(word, True)]
+        if len(word) < CERT_FUZZY_MIN_LENGTH - 1:
+            return []
+        candidates = set(self.variants.get(word, ()))
+        for variant in _deletes(word):
+            candidates |= self.variants.get(variant, set())
+        return [(candidate, False) for candidate in candidates if _within_one_edit(word, candidate)]
+
+    def match(self, text: str, min_score: float = CERT_MIN_SCORE) -> list[RegistryMatch]:
+        """OCR мәтінінде аталған тізілімдегі ұйымдарды (ұпайы бойынша) қайтарады."""
+        matched: dict[int, dict[str, bool]] = defaultdict(dict)
+        for word in set(normalize(text).split()):
+            for token, exact in self._lookup(word):
+                for org_id in self.postings[token]:
+                    matched[org_id][token] = matched[org_id].get(token, False) or exact
+        results = []
+        for org_id, tokens in matched.items():
+            score = len(tokens) / len(self.tokens[org_id])
+            if score >= min_score:
+                org = self.records[org_id]
+                results.append(RegistryMatch(
+                    title=org["title"],
+                    category=(org.get("category") or {}).get("title", ""),
+                    sert_date=org.get("sert_date", ""),
+                    score=score,
+                    # Бір сөзді атау кездейсоқ сөзбен сәйкес келуі мүмкін, сондықтан ол тек контекст ретінде беріледі
+                    exact=score == 1 and all(tokens.values()) and len(self.tokens[org_id]) > 1,
+                ))
+        results.sort(key=lambda item: (item.score, item.exact), reverse=True)
+        return results[:CERT_MAX_MATCHES]
+
+
+def has_halal_marker(text: str) -> bool:
+    """Суретте халал белгісі/жазуы бар ма (OCR мәтіні бойынша).
+
+    Кез келген терістеу ("не халал", "halal emes", "без", "0%") болса, белгі
+    жоқ деп есептеледі — бұл жағдайды модель шешеді.
+    """
+    if is_negated(text):
+        return False
+    words = normalize(text).split()
+    found = False
+    for position, word in enumerate(words):
+        if word in _HALAL_MARKERS:
+            if position and words[position - 1] in _NEGATING_PREFIXES:
+                return False
+            found = True
+    return found
+
+
+def parse_sert_date(value) -> date | None:
+    """Сертификаттың жарамдылық мерзімін оқиды (белгісіз форматта None)."""
+    if not value:
+        return None
+    text = str(value).strip()
+    for fmt in _SERT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:19], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def is_valid_certificate(sert_date, today: date | None = None) -> bool:
+    """Сертификат мерзімі белгілі әрі өтпеген бе."""
+    expires = parse_sert_date(sert_date)
+    return expires is not None and expires >= (today or date.today())
+
+
+_index: CertificateIndex | None = None
+
+
+def rebuild_index(data: dict):
+    """Мекемелер базасы жүктелгенде индексті қайта құрады (бір меншіктеумен ауыстырылады)."""
+    global _index
+    index = CertificateIndex(data)
+    _index = index
+    logger.info(f"Сертификаттар тізілімі жүктелді: {len(index.records)} ұйым, {len(index.postings)} сөз.")
+
+
+if CERT_FAST_PATH:
+    store.add_listener(rebuild_index)
+
+
+def match_registry(text: str) -> list[RegistryMatch]:
+    """OCR мәтінін тізіліммен салыстырады (тізілім жоқ болса — бос тізім)."""
+    if _index is None or not text:
+        return []
+    return _index.match(text)
+
+
+def registry_answer(matches: list[RegistryMatch], text: str, lang_code: str = 'kk',
+                    today: date | None = None) -> str | None:
+    """Сенімді сәйкестік, жарамды сертификат пен халал белгісі болса, OpenAI-сыз берілетін жауап."""
+    # Мерзімі өткен не белгісіз сертификат тек контекст ретінде модельге беріледі
+    confident = [match for match in matches if match.exact and is_valid_certificate(match.sert_date, today)]
+    if not confident or not has_halal_marker(text):
+        return None
+    lines = [get_text('registry_verdict_certified', lang_code)]
+    for match in confident:
+        details = ", ".join(part for part in (match.category, match.sert_date and
+                                              f"{get_text('registry_certificate_date', lang_code)}: {match.sert_date}") if part)
+        lines.append(f"• {match.title}" + (f" ({details})" if details else ""))
+    return "\n".join(lines)
+
+
+def is_suspicious(matches: list[RegistryMatch], text: str, today: date | None = None) -> bool:
+    """Суретте халал белгісі бар, бірақ тізілімде жарамды сертификаты бар ұйым табылмады ма."""
+    if _index is None or not has_halal_marker(text):
+        return False
+    return not any(is_valid_certificate(match.sert_date, today) for match in matches)
+
+
+def prompt_context(matches: list[RegistryMatch]) -> str | None:
+    """Ассистент сұрағына қосылатын құрылымдық контекст."""
+    if not matches:
+        return None
+    records = [{"title": match.title, "category": match.category, "sert_date": match.sert_date,
+                "certificate_valid": is_valid_certificate(match.sert_date), "score": round(match.score, 2)}
+               for match in matches]
+    return (
+        "Жергілікті халал сертификаттар тізілімінен табылған сәйкестіктер (JSON): "
+        f"{json.dumps(records, ensure_ascii=False)}. "
+        "Сертификат мәліметін осы жазбалардан ал, жауапты қысқа бер."
+    )
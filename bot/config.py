@@ -28,4 +28,23 @@ WAITING_FOR_UPDATE_FILE = 1
 
 # Тегін қолданушылар үшін күнделікті лимиттер
 FREE_TEXT_LIMIT = int(os.getenv('FREE_TEXT_LIMIT', 3))
-FREE_PHOTO_LIMIT = int(os.getenv('FREE_PHOTO_LIMIT', 2))
\ No newline at end of file
+FREE_PHOTO_LIMIT = int(os.getenv('FREE_PHOTO_LIMIT', 2))
+
+# Премиум қолданушылар үшін күнделікті лимиттер (бос қалса — шектеусіз)
+PREMIUM_TEXT_LIMIT = int(os.getenv('PREMIUM_TEXT_LIMIT')) if os.getenv('PREMIUM_TEXT_LIMIT') else None
+PREMIUM_PHOTO_LIMIT = int(os.getenv('PREMIUM_PHOTO_LIMIT')) if os.getenv('PREMIUM_PHOTO_LIMIT') else None
+
+# Деңгейлер бойынша лимиттер: None — шектеусіз
+QUOTA_TIERS = {
+    'free': {'text': FREE_TEXT_LIMIT, 'photo': FREE_PHOTO_LIMIT},
+    'premium': {'text': PREMIUM_TEXT_LIMIT, 'photo': PREMIUM_PHOTO_LIMIT},
+    'admin': {'text': None, 'photo': None},
+}
+
+# OpenAI Assistant жауабын stream арқылы алу және хабарламаны біртіндеп жаңарту
+OPENAI_STREAMING = os.getenv('OPENAI_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+# Telegram хабарламаны өңдеу жиілігіне шектеу қояды, сондықтан жаңартулар арасындағы ең аз уақыт (сек)
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.0))
+
+# Бір уақытта өңделетін жаңартулар саны; бір қолданушының run-дары bot.run_queue арқылы ретке келтіріледі
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 64))
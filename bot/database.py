@@ -1,40 +1,121 @@
+import csv
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 import logging
 
+from bot.cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
 DATA_DIR = os.getenv("RENDER_DISK_MOUNT_PATH", ".")
 DB_FILE = os.path.join(DATA_DIR, "bot_users.db")
 
-def _run_migrations(conn):
-    """Дерекқор кестесіне жетіспейтін бағандарды қосады."""
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [info[1] for info in cursor.fetchall()]
+# --- Қосылымдарды басқару ---
+# Әр ағынның (thread) өз ұзақ өмір сүретін қосылымы болады: sqlite3.Connection
+# ағындар арасында бөлісуге жарамайды, ал әр шақыруда қайта ашу қымбат.
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 8192))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 64 * 1024 * 1024))
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", 256))
 
-    new_columns = {
-        "text_requests_count": "INTEGER DEFAULT 0",
-        "photo_requests_count": "INTEGER DEFAULT 0",
-        "last_request_date": "TEXT",
-        "openai_thread_id": "TEXT",
-        "last_question": "TEXT",
-        "last_answer": "TEXT"
-    }
+# Қолданушы профилінің кэші: тіл, премиум, thread_id және бүгінгі лимит санауыштары
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 10000))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 600))
 
-    for col_name, col_type in new_columns.items():
-        if col_name not in columns:
-            cursor.execute(f"ALTER TABLE users ADD COLUMN {col_name} {col_type}")
-            logger.info(f"`{col_name}` бағаны қосылды.")
-    conn.commit()
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_profile_cache = LRUCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
 
-def init_db():
-    """Дерекқорды және 'users' кестесін жасайды."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
+
+def _connect(db_file: str) -> sqlite3.Connection:
+    """Жаңа қосылым ашып, WAL режимі мен өнімділік pragma-ларын орнатады."""
+    conn = sqlite3.connect(
+        db_file,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL режимінде NORMAL қауіпсіз: қуат өшсе соңғы транзакция ғана жоғалуы мүмкін
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Ағымдағы ағынның ұзақ өмір сүретін қосылымын қайтарады (қажет болса ашады)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.db_file != DB_FILE:
+        conn = _connect(DB_FILE)
+        _local.conn = conn
+        _local.db_file = DB_FILE
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_connections():
+    """Барлық ағындардың қосылымдарын жабады (тоқтау кезінде немесе тесттерде)."""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Басқа ағында ашылған қосылымды жабуға болмайды, ол сол ағынмен бірге жойылады
+                pass
+        _connections.clear()
+    _local.__dict__.clear()
+    _profile_cache.invalidate()
+
+
+def get_user_profile(user_id: int) -> dict | None:
+    """Қолданушының жиі оқылатын өрістерін кэштен немесе бір SELECT арқылы алады."""
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+    generation = _profile_cache.generation
+    row = get_connection().execute(
+        """SELECT u.language_code, u.is_premium, u.subscription_end_date, u.openai_thread_id,
+                  u.thread_started_at, u.thread_turns,
+                  COALESCE(g.text_count, 0), COALESCE(g.photo_count, 0), g.usage_date
+           FROM users u LEFT JOIN user_usage g ON g.user_id = u.user_id
+           WHERE u.user_id = ?""",
+        (user_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    profile = dict(zip(
+        ("language_code", "is_premium", "subscription_end_date", "openai_thread_id",
+         "thread_started_at", "thread_turns", "text_requests_count", "photo_requests_count", "last_request_date"),
+        row
+    ))
+    _profile_cache.set(user_id, profile, generation=generation)
+    return profile
+
+
+def update_cached_profile(user_id: int, **fields):
+    """Өзгерген өрістерді кэштегі профильге енгізеді (профиль кэште болса)."""
+    _profile_cache.write_through(user_id, lambda profile: {**profile, **fields})
+
+
+def get_profile_cache_stats() -> dict:
+    """Профиль кэшінің hit/miss статистикасын қайтарады."""
+    return _profile_cache.stats()
+
+
+# --- Схема миграциялары ---
+# Әр миграция бір рет, өз транзакциясында орындалады; қолданылған нұсқа
+# PRAGMA user_version-да сақталады. Жаңа өзгеріс — тізімнің соңына жаңа функция.
+
+def _migration_1_legacy_users(conn):
+    """Нұсқаланбаған кезеңдегі 'users' кестесі (жетіспейтін бағандарымен қоса)."""
+    conn.execute('''
     CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY,
         full_name TEXT,
@@ -45,111 +126,292 @@ def init_db():
         created_at TEXT NOT NULL
     )
     ''')
-    conn.commit()
-    _run_migrations(conn)
-    conn.close()
+    columns = [info[1] for info in conn.execute("PRAGMA table_info(users)")]
+    legacy_columns = {
+        "text_requests_count": "INTEGER DEFAULT 0",
+        "photo_requests_count": "INTEGER DEFAULT 0",
+        "last_request_date": "TEXT",
+        "openai_thread_id": "TEXT",
+        "last_question": "TEXT",
+        "last_answer": "TEXT"
+    }
+    for col_name, col_type in legacy_columns.items():
+        if col_name not in columns:
+            conn.execute(f"ALTER TABLE users ADD COLUMN {col_name} {col_type}")
+
+def _migration_2_split_usage_and_last_qa(conn):
+    """Жиі жазылатын санауыштар мен соңғы сұрақ-жауапты бөлек кестелерге шығарады.
+
+    'users' ішіндегі ескі бағандар ескі SQLite нұсқаларымен үйлесімділік үшін
+    қалдырылады, бірақ енді оларға жазылмайды.
+    """
+    conn.execute('''
+    CREATE TABLE user_usage (
+        user_id INTEGER PRIMARY KEY,
+        usage_date TEXT NOT NULL,
+        text_count INTEGER NOT NULL DEFAULT 0,
+        photo_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE last_qa (
+        user_id INTEGER PRIMARY KEY,
+        question TEXT,
+        answer TEXT,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO user_usage (user_id, usage_date, text_count, photo_count)
+    SELECT user_id, last_request_date, COALESCE(text_requests_count, 0), COALESCE(photo_requests_count, 0)
+    FROM users WHERE last_request_date IS NOT NULL
+    ''')
+    conn.execute('''
+    INSERT INTO last_qa (user_id, question, answer, updated_at)
+    SELECT user_id, last_question, last_answer, ?
+    FROM users WHERE last_question IS NOT NULL OR last_answer IS NOT NULL
+    ''', (datetime.now().isoformat(),))
+    conn.execute("CREATE INDEX idx_users_subscription_end_date ON users (subscription_end_date)")
+
+def _migration_3_broadcast_jobs(conn):
+    """Тарату тапсырмаларының кестесі және ботты блоктаған қолданушылар белгісі."""
+    conn.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+    CREATE TABLE broadcast_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        admin_chat_id INTEGER NOT NULL,
+        message_text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        cursor_user_id INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        sent_count INTEGER NOT NULL DEFAULT 0,
+        failed_count INTEGER NOT NULL DEFAULT 0,
+        blocked_count INTEGER NOT NULL DEFAULT 0,
+        progress_message_id INTEGER,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute("CREATE INDEX idx_broadcast_jobs_status ON broadcast_jobs (status)")
+
+def _migration_4_feedback(conn):
+    """Пікірлер кестесі және insert кезінде жаңартылатын жиынтық санауыштар."""
+    conn.execute('''
+    CREATE TABLE feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        question TEXT,
+        answer TEXT,
+        vote TEXT NOT NULL
+    )
+    ''')
+    conn.execute("CREATE TABLE feedback_totals (vote TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute('''
+    CREATE TABLE feedback_daily (
+        day TEXT NOT NULL,
+        vote TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (day, vote)
+    ) WITHOUT ROWID
+    ''')
+    # Санауыштар триггермен жаңартылады: кез келген insert (импорт та) жиынтықты бұзбайды
+    conn.execute('''
+    CREATE TRIGGER feedback_counters AFTER INSERT ON feedback
+    BEGIN
+        INSERT INTO feedback_totals (vote, count) VALUES (NEW.vote, 1)
+            ON CONFLICT(vote) DO UPDATE SET count = count + 1;
+        INSERT INTO feedback_daily (day, vote, count) VALUES (substr(NEW.created_at, 1, 10), NEW.vote, 1)
+            ON CONFLICT(day, vote) DO UPDATE SET count = count + 1;
+    END
+    ''')
+
+def _migration_5_suspicious_products(conn):
+    """Күдікті өнімдердің тек толықтырылатын журналы."""
+    conn.execute('''
+    CREATE TABLE suspicious_products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        description TEXT,
+        image_path TEXT
+    )
+    ''')
+    conn.execute("CREATE INDEX idx_suspicious_user ON suspicious_products (user_id, id)")
+    conn.execute("CREATE INDEX idx_suspicious_created_at ON suspicious_products (created_at)")
+
+def _migration_6_answer_cache(conn):
+    """Қайталанатын сұрақтарға жауаптар кэші және білім қорының нұсқасы."""
+    conn.execute("CREATE TABLE app_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute("INSERT INTO app_state (key, value) VALUES ('kb_version', 1)")
+    conn.execute('''
+    CREATE TABLE answer_cache (
+        key TEXT PRIMARY KEY,
+        lang TEXT NOT NULL,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        kb_version INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute("CREATE INDEX idx_answer_cache_last_used ON answer_cache (last_used_at)")
+
+def _migration_7_thread_lifecycle(conn):
+    """Thread-тің басталған уақыты мен run саны (ұзын thread-терді ауыстыру үшін)."""
+    conn.execute("ALTER TABLE users ADD COLUMN thread_started_at REAL")
+    conn.execute("ALTER TABLE users ADD COLUMN thread_turns INTEGER NOT NULL DEFAULT 0")
+    # Бұрынғы thread-тердің жасы белгісіз (thread_started_at бос) — олар келесі сұрақта ауыстырылады
+
+def _migration_8_photo_cache(conn):
+    """Қайталанатын өнім суреттерінің OCR нәтижесі (file_unique_id және перцептивті хэш бойынша)."""
+    conn.execute('''
+    CREATE TABLE photo_cache (
+        file_unique_id TEXT PRIMARY KEY,
+        phash BLOB,
+        ocr_text TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute("CREATE INDEX idx_photo_cache_phash ON photo_cache (phash)")
+    conn.execute("CREATE INDEX idx_photo_cache_last_used ON photo_cache (last_used_at)")
+
+MIGRATIONS = [
+    _migration_1_legacy_users,
+    _migration_2_split_usage_and_last_qa,
+    _migration_3_broadcast_jobs,
+    _migration_4_feedback,
+    _migration_5_suspicious_products,
+    _migration_6_answer_cache,
+    _migration_7_thread_lifecycle,
+    _migration_8_photo_cache,
+]
+
+def _run_migrations(conn):
+    """Қолданылмаған миграцияларды ретімен орындайды."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return
+    while True:
+        # IMMEDIATE құлпы бірнеше воркер бір уақытта іске қосылғанда миграцияны қайталатпайды
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.commit()
+                return
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Дерекқор схемасы {version + 1}-нұсқаға жаңартылды.")
+
+def init_db():
+    """Дерекқорды дайындап, схеманы соңғы нұсқаға дейін жаңартады."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _run_migrations(get_connection())
 
 def add_or_update_user(user_id, full_name, username, language_code):
     """Жаңа қолданушыны қосады немесе ескісінің мәліметін жаңартады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-        if cursor.fetchone():
-            cursor.execute("UPDATE users SET full_name = ?, username = ? WHERE user_id = ?", (full_name, username, user_id))
-        else:
-            cursor.execute(
-                "INSERT INTO users (user_id, full_name, username, language_code, created_at) VALUES (?, ?, ?, ?, ?)",
-                (user_id, full_name, username, language_code, datetime.now().isoformat())
-            )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            # /start басқан қолданушы ботты қайта ашқан, сондықтан блок белгісі алынады
+            cursor = conn.execute("UPDATE users SET full_name = ?, username = ?, is_blocked = 0 WHERE user_id = ?", (full_name, username, user_id))
+            if cursor.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO users (user_id, full_name, username, language_code, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, full_name, username, language_code, datetime.now().isoformat())
+                )
+        _profile_cache.invalidate(user_id)
     except Exception as e:
         logger.error(f"Қолданушыны қосу/жаңарту кезінде қате: {e}")
 
 def get_user_language(user_id: int) -> str:
     """Қолданушының сақталған тіл кодын қайтарады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT language_code FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result and result[0] else 'kk'
+        profile = get_user_profile(user_id)
+        return profile["language_code"] if profile and profile["language_code"] else 'kk'
     except Exception:
         return 'kk'
-        
+
+_USAGE_COLUMNS = {'text': "text_count", 'photo': "photo_count"}
+
 def check_and_increment_usage(user_id: int, request_type: str, limit: int) -> bool:
-    """Лимитті тексереді және жетпесе, санауышты арттырады. Лимиттен асса, False қайтарады."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    """Лимитті тексереді және жетпесе, санауышты арттырады. Лимиттен асса, False қайтарады.
+
+    Күн ауысуын тексеру, лимитпен салыстыру және арттыру бір атомарлы
+    UPSERT ... RETURNING сұранысында орындалады, сондықтан бір қолданушының
+    қатар келген сұраныстары лимиттен аса алмайды.
+    """
+    field_to_update = _USAGE_COLUMNS.get(request_type)
+    if field_to_update is None or limit <= 0:
+        return False
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    text_inc, photo_inc = (1, 0) if request_type == 'text' else (0, 1)
+    conn = get_connection()
     try:
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("SELECT text_requests_count, photo_requests_count, last_request_date FROM users WHERE user_id = ?", (user_id,))
-        usage = cursor.fetchone()
-
-        text_count, photo_count, last_date = usage if usage else (0, 0, None)
-
-        if last_date != today_str:
-            cursor.execute("UPDATE users SET text_requests_count = 0, photo_requests_count = 0, last_request_date = ? WHERE user_id = ?", (today_str, user_id))
-            text_count, photo_count = 0, 0
-
-        can_proceed = False
-        field_to_update = None
-        if request_type == 'text' and text_count < limit:
-            can_proceed = True
-            field_to_update = "text_requests_count"
-        elif request_type == 'photo' and photo_count < limit:
-            can_proceed = True
-            field_to_update = "photo_requests_count"
-
-        if can_proceed:
-            cursor.execute(f"UPDATE users SET {field_to_update} = {field_to_update} + 1 WHERE user_id = ?", (user_id,))
-        
-        conn.commit()
-        return can_proceed
+        with conn:
+            row = conn.execute(
+                f"""
+                INSERT INTO user_usage (user_id, usage_date, text_count, photo_count)
+                VALUES (:user_id, :today, :text_inc, :photo_inc)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    text_count = (CASE WHEN usage_date = :today THEN text_count ELSE 0 END) + :text_inc,
+                    photo_count = (CASE WHEN usage_date = :today THEN photo_count ELSE 0 END) + :photo_inc,
+                    usage_date = :today
+                WHERE (CASE WHEN usage_date = :today THEN {field_to_update} ELSE 0 END) < :limit
+                RETURNING text_count, photo_count
+                """,
+                {"user_id": user_id, "today": today_str,
+                 "text_inc": text_inc, "photo_inc": photo_inc, "limit": limit}
+            ).fetchone()
+        if row is None:
+            return False
+        update_cached_profile(user_id, text_requests_count=row[0], photo_requests_count=row[1], last_request_date=today_str)
+        return True
     except Exception as e:
         logger.error(f"Лимитті тексеру/арттыру кезінде қате: {e}")
         return False
-    finally:
-        conn.close()
+
+def _write_last_q_and_a(conn, user_id: int, question: str, answer: str, updated_at: str):
+    conn.execute(
+        """INSERT INTO last_qa (user_id, question, answer, updated_at) VALUES (?, ?, ?, ?)
+           ON CONFLICT(user_id) DO UPDATE SET
+               question = excluded.question, answer = excluded.answer, updated_at = excluded.updated_at""",
+        (user_id, question, answer, updated_at)
+    )
 
 def set_last_q_and_a(user_id: int, question: str, answer: str):
     """Қолданушының соңғы сұрағы мен жауабын дерекқорға сақтайды."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET last_question = ?, last_answer = ? WHERE user_id = ?", (question, answer, user_id))
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            _write_last_q_and_a(conn, user_id, question, answer, datetime.now().isoformat())
     except Exception as e:
         logger.error(f"Соңғы сұрақ-жауапты сақтауда қате: {e}")
 
 def get_last_q_and_a(user_id: int) -> tuple[str, str]:
     """Қолданушының соңғы сұрағы мен жауабын дерекқордан алады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT last_question, last_answer FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
+        result = get_connection().execute("SELECT question, answer FROM last_qa WHERE user_id = ?", (user_id,)).fetchone()
         return result if result else ("Сұрақ табылмады", "Жауап табылмады")
     except Exception as e:
         logger.error(f"Соңғы сұрақ-жауапты алуда қате: {e}")
         return ("Сұрақ табылмады", "Жауап табылмады")
 
 
-def get_user_count():
+def get_user_count(include_blocked: bool = True):
     """Дерекқордағы жалпы қолданушылар санын қайтарады."""
     if not os.path.exists(DB_FILE):
         return 0
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        sql = "SELECT COUNT(*) FROM users" if include_blocked else "SELECT COUNT(*) FROM users WHERE is_blocked = 0"
+        return get_connection().execute(sql).fetchone()[0]
     except Exception as e:
         logger.error(f"Қолданушылар санын алу кезінде қате: {e}")
         return 0
@@ -159,38 +421,69 @@ def get_all_user_ids():
     if not os.path.exists(DB_FILE):
         return []
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return user_ids
+        return [row[0] for row in get_connection().execute("SELECT user_id FROM users")]
     except Exception as e:
         logger.error(f"Барлық қолданушы ID-ларын алу кезінде қате: {e}")
         return []
 
+USER_PAGE_SIZE = int(os.getenv("USER_PAGE_SIZE", 1000))
+
+def get_user_id_page(after_user_id: int = 0, page_size: int = USER_PAGE_SIZE, language: str | None = None,
+                     premium: bool | None = None, active_since: str | None = None,
+                     blocked: bool | None = None) -> list[int]:
+    """user_id бойынша keyset пагинациясымен қолданушылардың келесі бетін қайтарады.
+
+    active_since — 'YYYY-MM-DD' пішіміндегі күн: сол күннен бері сұраныс жіберген қолданушылар.
+    """
+    conditions = ["u.user_id > ?"]
+    params: list = [after_user_id]
+    if language is not None:
+        conditions.append("u.language_code = ?")
+        params.append(language)
+    if premium is not None:
+        premium_condition = "(u.is_premium = 1 AND u.subscription_end_date > ?)"
+        conditions.append(premium_condition if premium else f"NOT {premium_condition}")
+        params.append(datetime.now().isoformat())
+    if blocked is not None:
+        conditions.append("u.is_blocked = ?")
+        params.append(1 if blocked else 0)
+    if active_since is not None:
+        conditions.append("EXISTS (SELECT 1 FROM user_usage g WHERE g.user_id = u.user_id AND g.usage_date >= ?)")
+        params.append(active_since)
+    params.append(page_size)
+    rows = get_connection().execute(
+        f"SELECT u.user_id FROM users u WHERE {' AND '.join(conditions)} ORDER BY u.user_id LIMIT ?",
+        params
+    )
+    return [row[0] for row in rows]
+
+def iter_user_ids(page_size: int = USER_PAGE_SIZE, **filters):
+    """Қолданушы ID-ларын беттеп оқитын генератор: жадта бір беттен артық сақталмайды."""
+    after_user_id = 0
+    while True:
+        page = get_user_id_page(after_user_id, page_size, **filters)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_user_id = page[-1]
+
 def is_user_premium(user_id: int) -> bool:
     """Қолданушының жарамды премиум жазылымы бар-жоғын тексереді."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT is_premium, subscription_end_date FROM users WHERE user_id = ?", (user_id,))
-        user_data = cursor.fetchone()
-        conn.close()
-        
-        if not user_data:
+        profile = get_user_profile(user_id)
+
+        if not profile:
             return False
-            
-        is_premium, end_date_str = user_data
-        
+
+        is_premium, end_date_str = profile["is_premium"], profile["subscription_end_date"]
+
         if not is_premium or not end_date_str:
             return False
-            
+
         end_date = datetime.fromisoformat(end_date_str)
         if end_date > datetime.now():
             return True
-            
+
     except Exception as e:
         logger.error(f"Премиум статусын тексеру кезінде қате (user_id: {user_id}): {e}")
     return False
@@ -199,14 +492,13 @@ def grant_premium_access(user_id: int, days: int):
     """Қолданушыға белгілі бір күнге премиум жазылым береді."""
     end_date = datetime.now() + timedelta(days=days)
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET is_premium = 1, subscription_end_date = ? WHERE user_id = ?",
-            (end_date.isoformat(), user_id)
-        )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE users SET is_premium = 1, subscription_end_date = ? WHERE user_id = ?",
+                (end_date.isoformat(), user_id)
+            )
+        update_cached_profile(user_id, is_premium=1, subscription_end_date=end_date.isoformat())
         logger.info(f"{user_id} қолданушысына {days} күнге премиум берілді.")
     except Exception as e:
         logger.error(f"Премиум беру кезінде қате (user_id: {user_id}): {e}")
@@ -214,45 +506,53 @@ def grant_premium_access(user_id: int, days: int):
 def revoke_premium_access(user_id: int):
     """Қолданушының премиум жазылымын тоқтатады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET is_premium = 0, subscription_end_date = NULL WHERE user_id = ?",
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE users SET is_premium = 0, subscription_end_date = NULL WHERE user_id = ?",
+                (user_id,)
+            )
+        update_cached_profile(user_id, is_premium=0, subscription_end_date=None)
         logger.info(f"{user_id} қолданушысының премиум жазылымы тоқтатылды.")
     except Exception as e:
         logger.error(f"Премиумды тоқтату кезінде қате (user_id: {user_id}): {e}")
 
+def get_expiring_premium_user_ids(within_days: int) -> list[int]:
+    """Премиум жазылымы алдағы күндер ішінде аяқталатын қолданушыларды қайтарады."""
+    now = datetime.now()
+    try:
+        rows = get_connection().execute(
+            """SELECT user_id FROM users
+               WHERE subscription_end_date > ? AND subscription_end_date <= ? AND is_premium = 1
+               ORDER BY subscription_end_date""",
+            (now.isoformat(), (now + timedelta(days=within_days)).isoformat())
+        )
+        return [row[0] for row in rows]
+    except Exception as e:
+        logger.error(f"Аяқталатын премиум жазылымдарды алуда қате: {e}")
+        return []
+
 def update_user_language(user_id: int, lang_code: str):
     """Қолданушының тіл кодын дерекқорда жаңартады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET language_code = ? WHERE user_id = ?",
-            (lang_code, user_id)
-        )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE users SET language_code = ? WHERE user_id = ?",
+                (lang_code, user_id)
+            )
+        update_cached_profile(user_id, language_code=lang_code)
         logger.info(f"{user_id} қолданушысы тілді '{lang_code}' деп өзгертті.")
     except Exception as e:
         logger.error(f"Тілді жаңарту кезінде қате (user_id: {user_id}): {e}")
-       
+
 def get_user_usage(user_id: int):
     """Қолданушының сұраныс санын және соңғы сұраныс күнін қайтарады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT text_requests_count, photo_requests_count, last_request_date FROM users WHERE user_id = ?",
-            (user_id,)
-        )
-        usage = cursor.fetchone()
-        conn.close()
-        return usage if usage else (0, 0, None)
+        profile = get_user_profile(user_id)
+        if not profile:
+            return (0, 0, None)
+        return (profile["text_requests_count"], profile["photo_requests_count"], profile["last_request_date"])
     except Exception as e:
         logger.error(f"Қолданушының сұраныс санын алуда қате: {e}")
         return (0, 0, None)
@@ -261,67 +561,388 @@ def reset_user_limits(user_id: int):
     """Қолданушының лимиттерін жаңартады (күн ауысқанда)."""
     today_str = datetime.now().strftime("%Y-%m-%d")
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET text_requests_count = 0, photo_requests_count = 0, last_request_date = ? WHERE user_id = ?",
-            (today_str, user_id)
-        )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                """INSERT INTO user_usage (user_id, usage_date, text_count, photo_count) VALUES (?, ?, 0, 0)
+                   ON CONFLICT(user_id) DO UPDATE SET usage_date = excluded.usage_date, text_count = 0, photo_count = 0""",
+                (user_id, today_str)
+            )
+        update_cached_profile(user_id, text_requests_count=0, photo_requests_count=0, last_request_date=today_str)
     except Exception as e:
         logger.error(f"Қолданушы лимитін жаңартуда қате: {e}")
 
 def increment_request_count(user_id: int, request_type: str):
     """Сұраныс санауышын біреуге арттырады ('text' немесе 'photo')."""
-    field_to_update = "text_requests_count" if request_type == "text" else "photo_requests_count"
+    field_to_update = "text_count" if request_type == "text" else "photo_count"
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            f"UPDATE users SET {field_to_update} = {field_to_update} + 1 WHERE user_id = ?",
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                f"UPDATE user_usage SET {field_to_update} = {field_to_update} + 1 WHERE user_id = ?",
+                (user_id,)
+            )
+        _profile_cache.invalidate(user_id)
     except Exception as e:
         logger.error(f"Сұраныс санын арттыруда қате: {e}")
 
-def get_user_language(user_id: int) -> str:
-    """Қолданушының сақталған тіл кодын қайтарады."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT language_code FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result and result[0] else 'kk'
-    except Exception:
-        return 'kk'
-    
+def _write_thread_id(conn, user_id: int, thread_id: str | None, started_at: float | None = None, turns: int = 0):
+    conn.execute(
+        "UPDATE users SET openai_thread_id = ?, thread_started_at = ?, thread_turns = ? WHERE user_id = ?",
+        (thread_id, started_at, turns, user_id)
+    )
+
 def set_thread_id(user_id: int, thread_id: str | None):
-    """Қолданушының OpenAI thread_id-ын сақтайды немесе тазалайды."""
+    """Қолданушының OpenAI thread_id-ын сақтайды немесе тазалайды (жаңа thread-тің санауыштары нөлден басталады)."""
+    started_at = time.time() if thread_id else None
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET openai_thread_id = ? WHERE user_id = ?", (thread_id, user_id))
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            _write_thread_id(conn, user_id, thread_id, started_at)
+        update_cached_profile(user_id, openai_thread_id=thread_id, thread_started_at=started_at, thread_turns=0)
     except Exception as e:
         logger.error(f"Thread ID сақтауда қате: {e}")
 
 def get_thread_id(user_id: int) -> str | None:
     """Қолданушының OpenAI thread_id-ын дерекқордан алады."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT openai_thread_id FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
+        profile = get_user_profile(user_id)
+        return profile["openai_thread_id"] if profile else None
     except Exception as e:
         logger.error(f"Thread ID алуда қате: {e}")
         return None
 
+def get_thread_state(user_id: int) -> tuple[str | None, float | None, int]:
+    """(thread_id, басталған уақыты, run саны) үштігін қайтарады."""
+    try:
+        profile = get_user_profile(user_id)
+        if profile is None:
+            return None, None, 0
+        return profile["openai_thread_id"], profile["thread_started_at"], profile["thread_turns"]
+    except Exception as e:
+        logger.error(f"Thread күйін алуда қате: {e}")
+        return None, None, 0
+
+# --- Хабарлама тарату тапсырмалары ---
+
+_BROADCAST_JOB_FIELDS = ("id", "admin_chat_id", "message_text", "status", "cursor_user_id", "total",
+                         "sent_count", "failed_count", "blocked_count", "progress_message_id")
+
+def create_broadcast_job(admin_chat_id: int, message_text: str, total: int) -> int:
+    """Жаңа тарату тапсырмасын жасап, оның ID-ын қайтарады."""
+    now = datetime.now().isoformat()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO broadcast_jobs (admin_chat_id, message_text, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (admin_chat_id, message_text, total, now, now)
+        )
+    return cursor.lastrowid
+
+def get_broadcast_job(job_id: int) -> dict | None:
+    """Тарату тапсырмасының күйін қайтарады."""
+    row = get_connection().execute(
+        f"SELECT {', '.join(_BROADCAST_JOB_FIELDS)} FROM broadcast_jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    return dict(zip(_BROADCAST_JOB_FIELDS, row)) if row else None
+
+def get_unfinished_broadcast_jobs() -> list[dict]:
+    """Қайта іске қосылғаннан кейін жалғастыру керек тапсырмаларды қайтарады."""
+    rows = get_connection().execute(
+        f"SELECT {', '.join(_BROADCAST_JOB_FIELDS)} FROM broadcast_jobs WHERE status = 'running' ORDER BY id"
+    )
+    return [dict(zip(_BROADCAST_JOB_FIELDS, row)) for row in rows]
+
+def set_broadcast_progress_message(job_id: int, message_id: int):
+    """Прогресс көрсетілетін хабарламаның ID-ын сақтайды."""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE broadcast_jobs SET progress_message_id = ? WHERE id = ?", (message_id, job_id))
+
+def save_broadcast_page(job_id: int, cursor_user_id: int, sent: int, failed: int, blocked_user_ids: list[int]):
+    """Бір бет өңделгеннен кейінгі прогресті және блоктаған қолданушыларды бір транзакцияда сақтайды."""
+    conn = get_connection()
+    with conn:
+        if blocked_user_ids:
+            conn.executemany("UPDATE users SET is_blocked = 1 WHERE user_id = ?", [(uid,) for uid in blocked_user_ids])
+        conn.execute(
+            """UPDATE broadcast_jobs SET cursor_user_id = ?, sent_count = sent_count + ?,
+                   failed_count = failed_count + ?, blocked_count = blocked_count + ?, updated_at = ?
+               WHERE id = ?""",
+            (cursor_user_id, sent, failed, len(blocked_user_ids), datetime.now().isoformat(), job_id)
+        )
+
+def finish_broadcast_job(job_id: int, status: str = 'done'):
+    """Тапсырманы аяқталды деп белгілейді."""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE broadcast_jobs SET status = ?, updated_at = ? WHERE id = ?",
+                     (status, datetime.now().isoformat(), job_id))
+
+# --- Пікірлер (лайк/дизлайк) ---
+
+def _write_feedback(conn, user_id: int, question: str, answer: str, vote: str, created_at: str):
+    conn.execute(
+        "INSERT INTO feedback (created_at, user_id, question, answer, vote) VALUES (?, ?, ?, ?, ?)",
+        (created_at, user_id, question, answer, vote)
+    )
+
+def add_feedback(user_id: int, question: str, answer: str, vote: str):
+    """Пікірді сақтайды; жиынтық санауыштарды триггер жаңартады."""
+    conn = get_connection()
+    with conn:
+        _write_feedback(conn, user_id, question, answer, vote, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+def get_feedback_stats() -> dict:
+    """Пікірлердің жалпы санын, лайк пен дизлайк санын O(1) уақытта қайтарады."""
+    totals = dict(get_connection().execute("SELECT vote, count FROM feedback_totals").fetchall())
+    return {"total": sum(totals.values()), "like": totals.get("like", 0), "dislike": totals.get("dislike", 0)}
+
+def get_feedback_daily(days: int = 7) -> list[tuple[str, int, int]]:
+    """Соңғы күндер бойынша (күн, лайк, дизлайк) тізімін қайтарады, жаңасы бірінші."""
+    rows = get_connection().execute(
+        """SELECT day,
+                  SUM(CASE WHEN vote = 'like' THEN count ELSE 0 END),
+                  SUM(CASE WHEN vote = 'dislike' THEN count ELSE 0 END)
+           FROM feedback_daily GROUP BY day ORDER BY day DESC LIMIT ?""",
+        (days,)
+    )
+    return rows.fetchall()
+
+def import_feedback_csv(csv_path: str) -> int:
+    """Ескі feedback.csv файлын бір рет кестеге көшіреді және файлды '.imported' деп өзгертеді."""
+    if not os.path.exists(csv_path):
+        return 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = [
+            (row.get('timestamp') or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), int(row['user_id']),
+             row.get('question'), row.get('bot_answer'), row['vote'])
+            for row in csv.DictReader(f) if row.get('user_id') and row.get('vote')
+        ]
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO feedback (created_at, user_id, question, answer, vote) VALUES (?, ?, ?, ?, ?)", rows
+        )
+    os.replace(csv_path, csv_path + ".imported")
+    logger.info(f"{len(rows)} пікір {csv_path} файлынан импортталды.")
+    return len(rows)
+
+# --- Күдікті өнімдер журналы ---
+
+_SUSPICIOUS_FIELDS = ("id", "created_at", "user_id", "description", "image_path")
+
+def _write_suspicious_product(conn, created_at: str, user_id: int, description: str | None, image_path: str | None):
+    return conn.execute(
+        "INSERT INTO suspicious_products (created_at, user_id, description, image_path) VALUES (?, ?, ?, ?)",
+        (created_at, user_id, description, image_path)
+    ).lastrowid
+
+def log_suspicious_product(user_id: int, description: str, image_path: str | None = None) -> int:
+    """Күдікті өнімді журналдың соңына қосады."""
+    conn = get_connection()
+    with conn:
+        return _write_suspicious_product(
+            conn, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id, description, image_path
+        )
+
+def get_suspicious_products(limit: int = 5, before_id: int | None = None, user_id: int | None = None,
+                            day: str | None = None) -> list[dict]:
+    """Журналдың соңғы жазбаларын жаңасынан бастап қайтарады.
+
+    before_id — алдыңғы беттің ең кіші id-ы (ескірек жазбаларға өту үшін),
+    day — 'YYYY-MM-DD' пішіміндегі күн. Әр бет журнал көлеміне тәуелсіз,
+    индекс бойынша оқылады.
+    """
+    conditions, params = [], []
+    if before_id is not None:
+        conditions.append("id < ?")
+        params.append(before_id)
+    if user_id is not None:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    if day is not None:
+        next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        conditions.append("created_at >= ? AND created_at < ?")
+        params.extend([day, next_day])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit)
+    rows = get_connection().execute(
+        f"SELECT {', '.join(_SUSPICIOUS_FIELDS)} FROM suspicious_products {where} ORDER BY id DESC LIMIT ?",
+        params
+    )
+    return [dict(zip(_SUSPICIOUS_FIELDS, row)) for row in rows]
+
+def import_suspicious_csv(csv_path: str) -> int:
+    """Ескі suspicious_products.csv журналының әлі көшірілмеген жолдарын кестеге қосады.
+
+    Файл өзгертілмейді (ол репозиторийде сақталуы мүмкін): көшірілген жолдар
+    саны app_state кестесінде сақталады, сондықтан қайта іске қосқанда тек
+    файлдың соңына қосылған жаңа жолдар импортталады.
+    """
+    if not os.path.exists(csv_path):
+        return 0
+    rows = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('user_id'):
+                continue
+            description, image_path = row.get('claude_description'), row.get('image_path')
+            # Кейбір ескі жолдарда сипаттама жоқ, сурет жолы оның орнына жазылған
+            if image_path is None and description and description.startswith('suspicious_images/'):
+                description, image_path = None, description
+            rows.append((row.get('timestamp'), int(row['user_id']), description, image_path))
+    conn = get_connection()
+    with conn:
+        state = conn.execute("SELECT value FROM app_state WHERE key = 'suspicious_csv_rows'").fetchone()
+        imported = state[0] if state else 0
+        # Файл қысқарса (ауыстырылса), ол басынан бастап қайта оқылады
+        new_rows = rows[imported:] if imported <= len(rows) else rows
+        conn.executemany(
+            "INSERT INTO suspicious_products (created_at, user_id, description, image_path) VALUES (?, ?, ?, ?)",
+            new_rows
+        )
+        conn.execute(
+            "INSERT INTO app_state (key, value) VALUES ('suspicious_csv_rows', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (len(rows),)
+        )
+    if new_rows:
+        logger.info(f"{len(new_rows)} күдікті өнім {csv_path} файлынан импортталды.")
+    return len(new_rows)
+
+# --- Жауаптар кэші ---
+
+def get_kb_version() -> int:
+    """Білім қорының ағымдағы нұсқасы (файл қосылған сайын өседі)."""
+    return get_connection().execute("SELECT value FROM app_state WHERE key = 'kb_version'").fetchone()[0]
+
+def bump_kb_version() -> int:
+    """Білім қоры өзгергенде нұсқаны арттырып, барлық сақталған жауаптарды өшіреді."""
+    conn = get_connection()
+    with conn:
+        version = conn.execute(
+            "UPDATE app_state SET value = value + 1 WHERE key = 'kb_version' RETURNING value"
+        ).fetchone()[0]
+        conn.execute("DELETE FROM answer_cache")
+    return version
+
+def get_cached_answer(key: str, max_age: float | None = None) -> tuple[str, int] | None:
+    """Білім қорының ағымдағы нұсқасына сай, мерзімі өтпеген жауапты (жауап, нұсқа) түрінде қайтарады."""
+    row = get_connection().execute(
+        """SELECT c.answer, c.kb_version, c.created_at FROM answer_cache c
+           JOIN app_state s ON s.key = 'kb_version' AND s.value = c.kb_version
+           WHERE c.key = ?""",
+        (key,)
+    ).fetchone()
+    if row is None or (max_age is not None and row[2] < time.time() - max_age):
+        return None
+    return row[0], row[1]
+
+def put_cached_answer(key: str, lang: str, question: str, answer: str, kb_version: int, max_rows: int) -> bool:
+    """Жауапты сақтайды; аралықта білім қоры жаңарса (нұсқа ауысса), ештеңе жазбайды."""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            """INSERT INTO answer_cache (key, lang, question, answer, kb_version, created_at, last_used_at)
+               SELECT ?, ?, ?, ?, ?, ?, ? WHERE (SELECT value FROM app_state WHERE key = 'kb_version') = ?
+               ON CONFLICT(key) DO UPDATE SET
+                   answer = excluded.answer, kb_version = excluded.kb_version,
+                   created_at = excluded.created_at, last_used_at = excluded.last_used_at""",
+            (key, lang, question, answer, kb_version, now, now, kb_version)
+        )
+        # Ең ұзақ қолданылмаған жазбаларды шектен тыс болса өшіреміз
+        conn.execute(
+            """DELETE FROM answer_cache WHERE key IN (
+                   SELECT key FROM answer_cache ORDER BY last_used_at DESC, rowid DESC LIMIT -1 OFFSET ?)""",
+            (max_rows,)
+        )
+    return cursor.rowcount > 0
+
+def _write_answer_hit(conn, key: str, used_at: float):
+    conn.execute("UPDATE answer_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?", (used_at, key))
+
+def get_answer_cache_stats() -> dict:
+    """Дерекқордағы жауаптар кэшінің көлемі мен жалпы hit саны."""
+    rows, hits = get_connection().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answer_cache").fetchone()
+    return {"rows": rows, "hits": hits, "kb_version": get_kb_version()}
+
+# --- Суреттер кэші ---
+
+def get_photo_ocr(file_unique_id: str) -> str | None:
+    """Telegram file_unique_id бойынша сақталған OCR мәтінін қайтарады."""
+    row = get_connection().execute(
+        "SELECT ocr_text FROM photo_cache WHERE file_unique_id = ?", (file_unique_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+def find_photo_ocr_by_hash(phash: bytes, max_distance: int) -> str | None:
+    """Перцептивті хэші max_distance биттен аспай ерекшеленетін суреттің OCR мәтінін қайтарады."""
+    conn = get_connection()
+    row = conn.execute("SELECT ocr_text FROM photo_cache WHERE phash = ? LIMIT 1", (phash,)).fetchone()
+    if row or max_distance <= 0:
+        return row[0] if row else None
+    target = int.from_bytes(phash, "big")
+    best = None
+    for ocr_text, candidate in conn.execute(
+        "SELECT ocr_text, phash FROM photo_cache WHERE phash IS NOT NULL AND length(phash) = ?", (len(phash),)
+    ):
+        distance = (target ^ int.from_bytes(candidate, "big")).bit_count()
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, ocr_text)
+    return best[1] if best else None
+
+def put_photo_ocr(file_unique_id: str, phash: bytes | None, ocr_text: str, max_rows: int):
+    """Суреттің OCR мәтінін сақтайды және ең ұзақ қолданылмаған жазбаларды шектен тыс болса өшіреді."""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """INSERT INTO photo_cache (file_unique_id, phash, ocr_text, created_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(file_unique_id) DO UPDATE SET
+                   phash = excluded.phash, ocr_text = excluded.ocr_text, last_used_at = excluded.last_used_at""",
+            (file_unique_id, phash, ocr_text, now, now)
+        )
+        conn.execute(
+            """DELETE FROM photo_cache WHERE file_unique_id IN (
+                   SELECT file_unique_id FROM photo_cache ORDER BY last_used_at DESC, rowid DESC LIMIT -1 OFFSET ?)""",
+            (max_rows,)
+        )
+
+def _write_photo_hit(conn, file_unique_id: str, used_at: float):
+    conn.execute(
+        "UPDATE photo_cache SET hits = hits + 1, last_used_at = ? WHERE file_unique_id = ?", (used_at, file_unique_id)
+    )
+
+def get_photo_cache_stats() -> dict:
+    """Дерекқордағы суреттер кэшінің көлемі мен жалпы hit саны."""
+    rows, hits = get_connection().execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM photo_cache").fetchone()
+    return {"rows": rows, "hits": hits}
+
+# --- Кешіктірілген жазулар (write-behind журналы үшін) ---
+
+BATCH_WRITERS = {
+    "last_qa": _write_last_q_and_a,
+    "thread_id": _write_thread_id,
+    "feedback": _write_feedback,
+    "answer_hit": _write_answer_hit,
+    "photo_hit": _write_photo_hit,
+    "suspicious": _write_suspicious_product,
+}
+
+def apply_write_batch(ops: list[tuple[str, tuple]]):
+    """Журналдағы жазуларды бір транзакцияда орындайды; ops — (операция аты, аргументтер) тізімі."""
+    conn = get_connection()
+    with conn:
+        for op_name, args in ops:
+            BATCH_WRITERS[op_name](conn, *args)
+    # Кэшті commit-тен кейін қайта жаңартамыз: аралықта дерекқордан оқылған ескі мән қалмауы үшін
+    for op_name, args in ops:
+        if op_name == "thread_id":
+            user_id, thread_id, started_at, turns = args
+            update_cached_profile(user_id, openai_thread_id=thread_id, thread_started_at=started_at, thread_turns=turns)
+
 # Ең бірінші рет импортталғанда дерекқорды дайындау
-init_db()
\ No newline at end of file
+init_db()
@@ -0,0 +1,218 @@
+# bot/establishments.py
+"""Халал мекемелер базасы (qmdb_data_json.json) жадта.
+
+Файл іске қосылғанда бір рет оқылады: әр мекеменің координаттары 2GIS
+сілтемесінен алдын ала алынып, өзгермейтін жазбалар ендік бойынша
+сұрыпталған кортежге салынады. Сұрау тек ендігі жақын жолақты (bisect)
+қарап, қашықтықты сол мекемелер үшін ғана есептейді; ортақ жазбалар
+өзгертілмейді.
+
+Фондық тапсырма файлдың өзгергенін (mtime, өлшем) ESTABLISHMENTS_RELOAD_INTERVAL
+сайын тексереді. Жаңа нұсқа бөлек ағында толық оқылып, содан кейін ғана
+бір меншіктеумен ауыстырылады — сұраулар не ескі, не жаңа нұсқаны көреді.
+Жаңа файл бұзылған болса, ескі нұсқа қала береді. Сол файлдан құрылатын
+басқа индекстер (мысалы, сертификаттар тізілімі) add_listener арқылы әр
+жүктеуде қайта құрылады.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from math import atan2, cos, radians, sin, sqrt
+
+from bot import metrics
+
+logger = logging.getLogger(__name__)
+
+ESTABLISHMENTS_FILE = os.getenv("ESTABLISHMENTS_FILE", "qmdb_data_json.json")
+ESTABLISHMENTS_RELOAD_INTERVAL = float(os.getenv("ESTABLISHMENTS_RELOAD_INTERVAL", 30))
+# Осы қашықтықтан (км) алыс мекемелер көрсетілмейді
+NEARBY_MAX_KM = float(os.getenv("NEARBY_MAX_KM", 100))
+NEARBY_LIMIT = int(os.getenv("NEARBY_LIMIT", 5))
+
+EARTH_RADIUS_KM = 6371.0
+# Бір градус ендіктің ұзындығы (км)
+_KM_PER_LAT_DEGREE = 111.2
+_2GIS_COORDS_RE = re.compile(r'm=(-?[\d.]+),(-?[\d.]+)')
+
+
+# Гаверсин формуласы арқылы екі нүкте арасындағы қашықтықты есептеу (км)
+def calculate_distance(lat1, lon1, lat2, lon2):
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+    a = sin(dlat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+# 2GIS сілтемесінен координаттарды алу
+def extract_coords_from_2gis_link(link):
+    match = _2GIS_COORDS_RE.search(link)
+    if match:
+        # 2GIS сілтемесінде бірінші longitude, сосын latitude келеді
+        lon, lat = map(float, match.groups())
+        return lat, lon
+    return None, None
+
+
+@dataclass(frozen=True, slots=True)
+class Establishment:
+    title: str
+    category: str
+    sert_date: str
+    address: str | None
+    link: str
+    lat: float
+    lon: float
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    establishments: tuple[Establishment, ...]  # ендік бойынша сұрыпталған
+    latitudes: tuple[float, ...]
+    signature: tuple | None  # (mtime_ns, өлшем)
+    loaded_at: float
+
+
+class StoreUnavailable(Exception):
+    """Мекемелер базасы жүктелмеген (файл жоқ не форматы дұрыс емес)."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # 'missing' | 'invalid'
+
+
+def parse_establishments(data: dict) -> list[Establishment]:
+    """JSON деректерінен координаттары бар мекемелерді алады."""
+    establishments = []
+    for org in data['data']['organizations']:
+        # `maplink` массивіндегі бірінші сілтемені аламыз
+        maplinks = org.get('maplink') or []
+        if not maplinks or 'link' not in maplinks[0]:
+            continue
+        lat, lon = extract_coords_from_2gis_link(maplinks[0]['link'])
+        if lat is None or lon is None:
+            continue
+        establishments.append(Establishment(
+            title=org.get('title', 'Аты жоқ'),
+            category=(org.get('category') or {}).get('title', 'Белгісіз'),
+            sert_date=org.get('sert_date', 'Белгісіз'),
+            address=maplinks[0].get('address'),
+            link=maplinks[0]['link'],
+            lat=lat,
+            lon=lon,
+        ))
+    return establishments
+
+
+class EstablishmentStore:
+    def __init__(self, path: str = ESTABLISHMENTS_FILE, reload_interval: float = ESTABLISHMENTS_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._snapshot: _Snapshot | None = None
+        self._error: str | None = None
+        self._task: asyncio.Task | None = None
+        self._listeners = []
+        self.reloads = 0
+
+    def add_listener(self, callback):
+        """Әр сәтті жүктеуден кейін JSON деректерімен шақырылатын функцияны тіркейді."""
+        self._listeners.append(callback)
+
+    def _signature(self) -> tuple | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self, signature: tuple) -> tuple[_Snapshot, dict]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        establishments = tuple(sorted(parse_establishments(data), key=lambda item: item.lat))
+        return _Snapshot(establishments, tuple(item.lat for item in establishments), signature, time.time()), data
+
+    def reload(self) -> bool:
+        """Файл өзгерсе, базаны қайта жүктейді; жаңа нұсқа жүктелсе True."""
+        signature = self._signature()
+        if signature is None:
+            if self._snapshot is None and self._error != 'missing':
+                logger.warning(f"Мекемелер базасы табылмады ({self.path}), файл пайда болғанша күтеміз.")
+                self._error = 'missing'
+            return False
+        if self._snapshot is not None and self._snapshot.signature == signature:
+            return False
+        start = time.perf_counter()
+        try:
+            snapshot, data = self._build(signature)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Мекемелер базасын жүктеу мүмкін болмады ({self.path}): {e}")
+            if self._snapshot is None:
+                self._error = 'invalid'
+            return False
+        # Бір меншіктеу — сұраулар жартылай жүктелген нұсқаны ешқашан көрмейді
+        self._snapshot = snapshot
+        self._error = None
+        self.reloads += 1
+        for listener in self._listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f"Мекемелер базасының тыңдаушысы қате берді: {e}")
+        metrics.observe('establishments_reload', time.perf_counter() - start)
+        logger.info(f"Мекемелер базасы жүктелді: {len(snapshot.establishments)} мекеме.")
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Мекемелер базасын тексеру кезінде қате: {e}")
+
+    async def start(self):
+        """Базаны жүктеп, файлды бақылайтын фондық тапсырманы іске қосады."""
+        await asyncio.to_thread(self.reload)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def nearest(self, lat: float, lon: float, limit: int = NEARBY_LIMIT,
+                max_km: float = NEARBY_MAX_KM) -> list[tuple[Establishment, float]]:
+        """Ең жақын мекемелер мен олардың қашықтығы (км), жақыннан алысқа қарай."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Файлды қайта оқуды фондық бақылаушы жасайды — сұрау event loop-ты бұғаттамайды
+            raise StoreUnavailable(self._error or 'missing')
+        # Ендігі max_km-ден алыс мекемелер қашықтық есептелмей-ақ өткізіледі
+        band = max_km / _KM_PER_LAT_DEGREE
+        low = bisect_left(snapshot.latitudes, lat - band)
+        high = bisect_right(snapshot.latitudes, lat + band)
+        candidates = (
+            (item, calculate_distance(lat, lon, item.lat, item.lon))
+            for item in snapshot.establishments[low:high]
+        )
+        return heapq.nsmallest(limit, (pair for pair in candidates if pair[1] < max_km), key=lambda pair: pair[1])
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "establishments": len(snapshot.establishments) if snapshot else 0,
+            "reloads": self.reloads,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "error": self._error,
+        }
+
+
+store = EstablishmentStore()
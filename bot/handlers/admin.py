@@ -1,83 +1,149 @@
 # bot/handlers/admin.py
-import os
 import logging
-import pandas as pd
 import asyncio
 import csv
+import tempfile
 from datetime import datetime
-from bot.database import get_user_count, grant_premium_access, revoke_premium_access, update_user_language
-from bot.database import get_user_language
+from bot.repository import get_user_count, grant_premium_access, revoke_premium_access, update_user_language
+from bot.repository import get_user_language, iter_user_ids
+from bot.repository import add_feedback, get_feedback_daily, get_feedback_stats, get_last_q_and_a
+from bot.repository import get_suspicious_products, journal
+from bot.database import get_profile_cache_stats
+from bot import answer_cache, photo_cache
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from bot.database import get_user_count
-from bot.config import ADMIN_USER_IDS, FEEDBACK_FILE, SUSPICIOUS_LOG_FILE
+from bot.config import ADMIN_USER_IDS
 from bot.utils import get_text
-from bot.database import get_user_count, grant_premium_access, revoke_premium_access # импорттарды жаңарту
+from bot.pipeline import openai_scheduler, run_supervisor
+from bot.vision_ocr import ocr
+from bot.establishments import store as establishments_store
+from bot import metrics
 
 logger = logging.getLogger(__name__)
 
+async def build_stats_text() -> str:
+    """Админ панеліндегі статистика мәтіні (Markdown)."""
+    user_count = await get_user_count()
+    cache_stats = get_profile_cache_stats()
+    journal_stats = journal.stats()
+    run_stats = run_supervisor.stats()
+    answers = answer_cache.stats()
+    scheduler_stats = openai_scheduler.stats()
+    ocr_stats = ocr.stats()
+    photos = photo_cache.stats()
+    places = establishments_store.stats()
+    snapshot = metrics.snapshot()
+    queue_wait = snapshot["latency"].get("openai_queue_wait", {"p95_ms": 0.0})
+    empty_latency = {"count": 0, "p50_ms": 0.0}
+    fresh_runs = snapshot["latency"].get("assistant_run_fresh_thread", empty_latency)
+    long_runs = snapshot["latency"].get("assistant_run_long_thread", empty_latency)
+    ocr_latency = snapshot["latency"].get("vision_ocr", empty_latency)
+    feedback = await get_feedback_stats()
+    daily = await get_feedback_daily(7)
+    daily_lines = "".join(f"`{day}`: 👍 {day_likes} / 👎 {day_dislikes}\n" for day, day_likes, day_dislikes in daily)
+    stats_text = (f"📊 **Бот Статистикасы**\n\n"
+                  f"👥 **Жалпы қолданушылар:** {user_count}\n"
+                  f"📝 **Барлық пікірлер:** {feedback['total']}\n"
+                  f"👍 **Лайктар:** {feedback['like']}\n"
+                  f"👎 **Дизлайктар:** {feedback['dislike']}\n\n"
+                  f"📅 **Соңғы 7 күн:**\n{daily_lines or '—'}\n"
+                  f"🗄 **Профиль кэші:** {cache_stats['size']}/{cache_stats['maxsize']}, "
+                  f"hit {cache_stats['hits']} / miss {cache_stats['misses']} "
+                  f"({cache_stats['hit_rate']:.0%})\n"
+                  f"📝 **Жазу журналы:** кезекте {journal_stats['queue_depth']}, "
+                  f"flush {journal_stats['flushes']} (орт. {journal_stats['avg_flush_ms']:.1f} мс, "
+                  f"макс. {journal_stats['max_flush_ms']:.1f} мс), өткізілген {journal_stats['dead_lettered']}\n"
+                  f"🤖 **Assistant run-дары:** орындалуда {run_stats['in_flight']}, "
+                  f"сұрау {run_stats['polls']}, мерзімі өткен {run_stats['timeouts']}\n"
+                  f"💬 **Жауаптар кэші:** {answers['size']}/{answers['maxsize']}, "
+                  f"hit {answers['hits']} / miss {answers['misses']} ({answers['hit_rate']:.0%})\n"
+                  f"🚦 **OpenAI кезегі:** белсенді {scheduler_stats['active']}/{scheduler_stats['max_concurrency']}, "
+                  f"күтуде {scheduler_stats['waiting']}, күту p95 {queue_wait['p95_ms']:.0f} мс, "
+                  f"қайталау {scheduler_stats['retries']}\n"
+                  f"🧵 **Run кешігуі (p50):** жаңа thread {fresh_runs['p50_ms']:.0f} мс ({fresh_runs['count']}), "
+                  f"ұзын thread {long_runs['p50_ms']:.0f} мс ({long_runs['count']}), "
+                  f"ауыстырылған {snapshot['counters'].get('thread_rotations', 0)}\n"
+                  f"🖼 **Vision OCR:** {ocr_stats['images']} сурет / {ocr_stats['batches']} сұраныс "
+                  f"(орт. топ {ocr_stats['avg_batch']:.1f}), p50 {ocr_latency['p50_ms']:.0f} мс, "
+                  f"қате {ocr_stats['errors']}\n"
+                  f"📷 **Суреттер кэші:** файл ID {photos['file_hits']} / хэш {photos['hash_hits']} / "
+                  f"miss {photos['misses']} ({photos['hit_rate']:.0%}), "
+                  f"дайын жауап {snapshot['counters'].get('answer_cache_hit_photo', 0)}\n"
+                  f"📍 **Мекемелер базасы:** {places['establishments']} мекеме, "
+                  f"қайта жүктеу {places['reloads']}")
+    return stats_text
+
+
 async def feedback_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        user_count = get_user_count()
-        feedback_count, likes, dislikes = 0, 0, 0
-        if os.path.exists(FEEDBACK_FILE):
-            df = pd.read_csv(FEEDBACK_FILE)
-            feedback_count = len(df)
-            if 'vote' in df.columns:
-                likes = df['vote'].value_counts().get('like', 0)
-                dislikes = df['vote'].value_counts().get('dislike', 0)
-        stats_text = (f"📊 **Бот Статистикасы**\n\n"
-                      f"👥 **Жалпы қолданушылар:** {user_count}\n"
-                      f"📝 **Барлық пікірлер:** {feedback_count}\n"
-                      f"👍 **Лайктар:** {likes}\n"
-                      f"👎 **Дизлайктар:** {dislikes}")
-        await query.message.reply_text(stats_text, parse_mode='Markdown')
+        await query.message.reply_text(await build_stats_text(), parse_mode='Markdown')
     except Exception as e:
         await query.message.reply_text(f"❌ Статистиканы алу кезінде қате пайда болды: {e}")
 
+SUSPICIOUS_PAGE_SIZE = 5
+
+async def send_suspicious_page(message, before_id: int | None = None, user_id: int | None = None, day: str | None = None):
+    """Күдікті өнімдердің бір бетін жібереді, жалғасы болса "Ескілері" батырмасын қосады."""
+    rows = await get_suspicious_products(SUSPICIOUS_PAGE_SIZE, before_id, user_id, day)
+    if not rows:
+        await message.reply_text("ℹ️ Күдікті өнімдер тізімі бос." if before_id is None else "ℹ️ Ескірек жазбалар жоқ.")
+        return
+    title = "Соңғы" if before_id is None else "Ескірек"
+    await message.reply_text(f"🧐 **{title} {len(rows)} күдікті өнім:**", parse_mode='Markdown')
+    for row in rows:
+        caption = (f"🗓 **Уақыты:** `{row['created_at']}`\n"
+                   f"👤 **Қолданушы ID:** `{row['user_id']}`\n"
+                   f"📝 **Сипаттама:**\n{row['description'] or 'N/A'}")
+        await message.reply_text(caption, parse_mode='Markdown')
+        await asyncio.sleep(0.5)
+    if len(rows) == SUSPICIOUS_PAGE_SIZE:
+        callback_data = f"suspicious_older:{rows[-1]['id']}:{user_id or ''}:{day or ''}"
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Ескілері", callback_data=callback_data)]])
+        await message.reply_text("Ескірек жазбаларды көру:", reply_markup=keyboard)
+
 async def suspicious_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        if not os.path.exists(SUSPICIOUS_LOG_FILE) or os.path.getsize(SUSPICIOUS_LOG_FILE) == 0:
-            await query.message.reply_text("ℹ️ Күдікті өнімдер тізімі бос.")
-            return
-        df = pd.read_csv(SUSPICIOUS_LOG_FILE)
-        if df.empty:
-            await query.message.reply_text("ℹ️ Күдікті өнімдер тізімі бос.")
-            return
-        last_5 = df.tail(5)
-        await query.message.reply_text(f"🧐 **Соңғы {len(last_5)} күдікті өнім:**")
-        for _, row in last_5.iterrows():
-            caption = (f"🗓 **Уақыты:** `{row.get('timestamp', 'N/A')}`\n"
-                       f"👤 **Қолданушы ID:** `{row.get('user_id', 'N/A')}`\n"
-                       f"📝 **Сипаттама:**\n{row.get('claude_description', 'N/A')}")
-            await query.message.reply_text(caption, parse_mode='Markdown')
-            await asyncio.sleep(0.5)
+        if query.data.startswith('suspicious_older:'):
+            _, before_id, user_id, day = query.data.split(':')
+            await query.edit_message_reply_markup(reply_markup=None)
+            await send_suspicious_page(query.message, int(before_id), int(user_id) if user_id else None, day or None)
+        else:
+            await send_suspicious_page(query.message)
     except Exception as e:
         await query.message.reply_text(f"❌ Күдікті тізімді алу кезінде қате: {e}")
 
+async def suspicious_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/suspicious [user_id] [YYYY-MM-DD] — күдікті өнімдерді сүзгімен көрсетеді."""
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        return
+    user_id, day = None, None
+    try:
+        for arg in context.args or []:
+            if arg.isdigit():
+                user_id = int(arg)
+            else:
+                datetime.strptime(arg, "%Y-%m-%d")
+                day = arg
+        await send_suspicious_page(update.message, user_id=user_id, day=day)
+    except ValueError:
+        await update.message.reply_text("❌ Қате қолданыс. Мысал: /suspicious 12345678 2025-09-16")
+    except Exception as e:
+        await update.message.reply_text(f"❌ Күдікті тізімді алу кезінде қате: {e}")
+
 async def feedback_button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer("Кері байланыс үшін рахмет!")
     await query.edit_message_reply_markup(reply_markup=None)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     user_id = query.from_user.id
     vote = query.data
-    message_id = query.message.message_id
-    question = context.user_data.get(f'last_question_{message_id}', 'Сұрақ табылмады')
-    bot_answer = context.user_data.get(f'last_answer_{message_id}', 'Жауап табылмады')
-    
-    os.makedirs(os.path.dirname(FEEDBACK_FILE), exist_ok=True)
-    file_exists = os.path.isfile(FEEDBACK_FILE)
-    with open(FEEDBACK_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['timestamp', 'user_id', 'question', 'bot_answer', 'vote'])
-        if not file_exists: writer.writeheader()
-        writer.writerow({'timestamp': timestamp, 'user_id': user_id, 'question': question, 'bot_answer': bot_answer, 'vote': vote})
+    question, bot_answer = await get_last_q_and_a(user_id)
+    await add_feedback(user_id, question, bot_answer, vote)
     logger.info(f"Кері байланыс сақталды: User {user_id} '{vote}' деп басты.")
 
 def get_main_menu(lang_code: str, user_id: int) -> InlineKeyboardMarkup:
@@ -95,7 +161,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     user = query.from_user
-    lang_code = get_user_language(user.id)
+    lang_code = await get_user_language(user.id)
 
     # Негізгі мәзірге оралу
     if query.data == 'back_to_main':
@@ -109,7 +175,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if new_lang_code == 'start':
             new_lang_code = query.data.split('_')[-2]
 
-        update_user_language(user.id, new_lang_code)
+        await update_user_language(user.id, new_lang_code)
         confirmation_text = get_text(f'language_set_{new_lang_code}', new_lang_code)
         await query.edit_message_text(confirmation_text)
 
@@ -168,7 +234,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == 'feedback_stats':
         if user.id in ADMIN_USER_IDS: await feedback_stats(update, context)
     
-    elif query.data == 'suspicious_list':
+    elif query.data == 'suspicious_list' or query.data.startswith('suspicious_older:'):
         if user.id in ADMIN_USER_IDS: await suspicious_list(update, context)
 
     # Лайк/Дизлайк
@@ -186,7 +252,7 @@ async def grant_premium(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id_to_grant = int(context.args[0])
         days = int(context.args[1])
         
-        grant_premium_access(user_id_to_grant, days)
+        await grant_premium_access(user_id_to_grant, days)
         await update.message.reply_text(f"✅ {user_id_to_grant} қолданушысына {days} күнге премиум сәтті берілді.")
     except (IndexError, ValueError):
         await update.message.reply_text("❌ Қате қолданыс. Мысал: /grant_premium 12345678 30")
@@ -202,9 +268,37 @@ async def revoke_premium(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Команда аргументін алу: /revoke_premium user_id
         user_id_to_revoke = int(context.args[0])
         
-        revoke_premium_access(user_id_to_revoke)
+        await revoke_premium_access(user_id_to_revoke)
         await update.message.reply_text(f"✅ {user_id_to_revoke} қолданушысының премиум жазылымы тоқтатылды.")
     except (IndexError, ValueError):
         await update.message.reply_text("❌ Қате қолданыс. Мысал: /revoke_premium 12345678")
     except Exception as e:
-        await update.message.reply_text(f"❌ Қате: {e}")
\ No newline at end of file
+        await update.message.reply_text(f"❌ Қате: {e}")
+
+async def export_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export_users [kk|ru] [premium] — қолданушылар тізімін CSV файлмен жібереді."""
+    user = update.effective_user
+    if user.id not in ADMIN_USER_IDS:
+        return
+
+    filters = {}
+    for arg in context.args or []:
+        if arg in ('kk', 'ru'):
+            filters['language'] = arg
+        elif arg == 'premium':
+            filters['premium'] = True
+
+    try:
+        # Тізім жадқа толық жүктелмейді: беттеп оқылып, бірден файлға жазылады
+        with tempfile.NamedTemporaryFile('w+', suffix='.csv', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['user_id'])
+            exported = 0
+            async for user_id in iter_user_ids(**filters):
+                writer.writerow([user_id])
+                exported += 1
+            f.flush()
+            with open(f.name, 'rb') as document:
+                await update.message.reply_document(document, filename='user_ids.csv', caption=f"👥 {exported} қолданушы")
+    except Exception as e:
+        await update.message.reply_text(f"❌ Қате: {e}")
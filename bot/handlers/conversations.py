@@ -1,15 +1,11 @@
 # bot/handlers/conversations.py
 import logging
-import asyncio
-import os
-import csv
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters, CommandHandler
-from telegram.error import Forbidden
 
 from bot.config import ADMIN_USER_IDS, VECTOR_STORE_ID, BROADCAST_MESSAGE, WAITING_FOR_UPDATE_FILE
-from bot.utils import client_openai
-from bot.database import get_all_user_ids
+from bot.broadcast import start_broadcast
+from bot.kb_ingest import IngestSession, start_ingestion
 
 logger = logging.getLogger(__name__)
 
@@ -23,34 +19,10 @@ async def broadcast_start_handler(update: Update, context: ContextTypes.DEFAULT_
     return ConversationHandler.END
 
 async def broadcast_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    message_text = update.message.text
-    user_ids = get_all_user_ids()
-    sent_count = 0
-    failed_count = 0
-
-    if not user_ids:
+    # Тарату фонда жүреді, сондықтан админнің диалогы бірден босайды
+    job_id = await start_broadcast(context.bot, update.effective_chat.id, update.message.text)
+    if job_id is None:
         await update.message.reply_text("Хабарлама жіберетін қолданушылар табылмады.")
-        return ConversationHandler.END
-
-    await update.message.reply_text(f"Хабарламаны {len(user_ids)} қолданушыға жіберу басталды...")
-
-    for user_id in user_ids:
-        try:
-            await context.bot.send_message(chat_id=user_id, text=message_text, parse_mode='HTML')
-            sent_count += 1
-            await asyncio.sleep(0.1)  # Telegram лимиттеріне түспес үшін кідіріс
-        except Forbidden:
-            logger.warning(f"Қолданушы {user_id} ботты блоктаған, хабарлама жіберілмеді.")
-            failed_count += 1
-        except Exception as e:
-            logger.error(f"Қолданушы {user_id} үшін хабарлама жіберуде қате: {e}")
-            failed_count += 1
-
-    await update.message.reply_text(
-        f"✅ Хабарлама тарату аяқталды.\n"
-        f"👍 Сәтті жіберілді: {sent_count}\n"
-        f"👎 Қатемен аяқталды (немесе ботты блоктаған): {failed_count}"
-    )
     return ConversationHandler.END
 
 async def cancel_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -62,41 +34,55 @@ async def update_db_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     query = update.callback_query
     await query.answer()
     if query.from_user.id in ADMIN_USER_IDS:
-        await query.message.reply_text("Білім қорын жаңарту үшін файлды жіберіңіз.\nТоқтату үшін: /cancel")
+        _discard_session(context)
+        context.user_data['kb_session'] = IngestSession()
+        await query.message.reply_text(
+            "Білім қорын жаңарту үшін файлдарды (немесе zip архивті) жіберіңіз.\n"
+            "Барлығын жіберіп болған соң: /done\nТоқтату үшін: /cancel"
+        )
         return WAITING_FOR_UPDATE_FILE
     return ConversationHandler.END
 
+def _discard_session(context: ContextTypes.DEFAULT_TYPE):
+    session = context.user_data.pop('kb_session', None)
+    if session:
+        session.cleanup()
+
 async def update_db_receive_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     message = update.message
     if not VECTOR_STORE_ID:
+        _discard_session(context)
         await message.reply_text("Қате: .env файлында VECTOR_STORE_ID орнатылмаған!")
         return ConversationHandler.END
 
-    waiting_message = await message.reply_text("Файлды өңдеуде...")
+    session = context.user_data.setdefault('kb_session', IngestSession())
+    doc = message.document
     try:
-        doc = message.document
-        if not doc:
-            await waiting_message.edit_text("Файлды документ ретінде жіберіңіз.")
-            return ConversationHandler.END
-
-        doc_file = await doc.get_file()
-        file_content = await doc_file.download_as_bytearray()
-
-        await waiting_message.edit_text("Файл жүктелді. OpenAI-ға жіберілуде...")
-        
-        openai_file = await client_openai.files.create(file=(doc.file_name, file_content), purpose="assistants")
-        
-        await waiting_message.edit_text(f"Файл OpenAI-ға жүктелді (ID: {openai_file.id}). Білім қорына қосылуда...")
-
-        await client_openai.beta.vector_stores.files.create(vector_store_id=VECTOR_STORE_ID, file_id=openai_file.id)
-        
-        await waiting_message.edit_text(f"🎉 '{doc.file_name}' файлы білім қорына сәтті қосылды.")
+        added = await session.add_document(doc)
     except Exception as e:
-        logger.error(f"Базаны жаңарту қатесі: {e}")
-        await waiting_message.edit_text(f"❌ Файлды өңдеу кезінде қате пайда болды: {e}")
+        logger.error(f"Файлды қабылдау қатесі: {e}")
+        await message.reply_text(f"❌ '{doc.file_name}' файлын өңдеу кезінде қате пайда болды: {e}")
+        return WAITING_FOR_UPDATE_FILE
+
+    await message.reply_text(
+        f"📥 '{doc.file_name}' қабылданды ({len(added)} файл). Барлығы: {len(session.paths)} файл.\n"
+        "Тағы жіберіңіз немесе жаңартуды бастау үшін: /done"
+    )
+    return WAITING_FOR_UPDATE_FILE
+
+async def update_db_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    session = context.user_data.pop('kb_session', None)
+    if not session or not session.paths:
+        if session:
+            session.cleanup()
+        await update.message.reply_text("Бірде-бір файл жіберілмеді. Базаны жаңарту тоқтатылды.")
+        return ConversationHandler.END
+    # Жүктеу мен индекстеу фонда жүреді, сондықтан админнің диалогы бірден босайды
+    start_ingestion(context.bot, update.effective_chat.id, session)
     return ConversationHandler.END
 
 async def update_db_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    _discard_session(context)
     await update.message.reply_text("Базаны жаңарту тоқтатылды.")
     return ConversationHandler.END
 
@@ -114,7 +100,10 @@ broadcast_conv_handler = ConversationHandler(
 update_db_conv_handler = ConversationHandler(
     entry_points=[CallbackQueryHandler(update_db_start, pattern='^update_db_placeholder$')],
     states={
-        WAITING_FOR_UPDATE_FILE: [MessageHandler(filters.Document.ALL, update_db_receive_file)]
+        WAITING_FOR_UPDATE_FILE: [
+            MessageHandler(filters.Document.ALL, update_db_receive_file),
+            CommandHandler('done', update_db_done),
+        ]
     },
     fallbacks=[CommandHandler('cancel', update_db_cancel)],
     per_user=True
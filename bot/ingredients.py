@@ -0,0 +1,188 @@
+# bot/ingredients.py
+"""Құрамдас бөліктер мен E-қоспалардың жергілікті білім қоры.
+
+Сұрақ немесе суреттен оқылған құрам мәтіні Aho-Corasick автоматымен бір
+рет өтіп тексеріледі. Нәтиже мәтіндегі барлық сөздер білім қорынан немесе
+көмекші сөздер тізімінен табылса ғана OpenAI-сыз беріледі. Терістеу
+("шошқа жоқ", "без спирта", "alcohol-free", "0%") шешімді керісінше
+өзгертетіндіктен, ондай мәтін әрқашан ассистентке жіберіледі. Орысша "не"
+және компоненттің алдындағы "не"/"халал" ("не свинина", "халал ветчина") да
+солай өңделеді.
+"""
+import json
+import logging
+import os
+import re
+from collections import deque
+
+from bot.utils import get_text
+
+logger = logging.getLogger(__name__)
+
+INGREDIENTS_FILE = os.getenv("INGREDIENTS_FILE", "ingredients.json")
+INGREDIENT_FAST_PATH = os.getenv("INGREDIENT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+_STATUS_ORDER = {"halal": 0, "doubtful": 1, "haram": 2}
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+# "Е 120", "e-120", "Е120" (кирилл Е) — бәрі "e120"; кирилл әріп жұрнақтары латынға ауысады
+_E_CODE_RE = re.compile(r"(?<!\w)[eе]\s*(\d{3,4})(ii|[a-zа-в])?(?!\w)")
+_SUFFIX_MAP = str.maketrans("абв", "abc")
+# Компоненттің жоқ екенін білдіретін сөздер (көмекші сөздер тізімінде болса да)
+_NEGATIONS = {"жоқ", "емес", "нет", "без", "no", "not", "non", "free", "without", "emes", "zhoq"}
+_ZERO_PERCENT_RE = re.compile(r"(?<![\d.,])0\s*%")
+# Орысша "не" — терістеу; қазақша ол "не?" (сұрау есімдігі), сондықтан тек компонент алдында терістеу саналады
+_RU_NEGATIONS = {"не", "ни"}
+# Компоненттің алдында тұрса, оның мағынасын өзгертетін сөздер ("не свинина", "халал ветчина")
+_TERM_QUALIFIERS = {"не", "ни", "халал", "halal", "حلال"}
+
+
+def normalize(text: str) -> str:
+    """Мәтінді іздеуге дайындайды: кіші әріп, E-кодтар бір түрде, тыныс белгілерінің орнына бос орын."""
+    text = text.casefold().replace("ё", "е")
+    text = _E_CODE_RE.sub(lambda m: "e" + m.group(1) + (m.group(2) or "").translate(_SUFFIX_MAP), text.replace("-", " "))
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+class AhoCorasick:
+    """Көп үлгіні мәтіннен бір өтумен іздейтін автомат (тек толық сөздер сәйкес келеді)."""
+
+    def __init__(self, patterns: dict[str, object]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, object]]] = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), value))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def iter_matches(self, text: str):
+        """(басы, соңы, мән) үштіктерін береді; text бұрын normalize() арқылы өткен болуы керек."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        length = len(text)
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            # Сөз ортасындағы сәйкестіктерді ("фасоль" ішіндегі "соль") өткізіп жібереміз
+            if end < length and text[end] != " ":
+                continue
+            for size, value in out[state]:
+                start = end - size
+                if start == 0 or text[start - 1] == " ":
+                    yield start, end, value
+
+    def find(self, text: str) -> list[tuple[int, int, object]]:
+        """Қабаттаспайтын ең ұзын сәйкестіктерді солдан оңға қарай қайтарады."""
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], -(m[1] - m[0])))
+        result, covered_until = [], 0
+        for start, end, value in matches:
+            if start >= covered_until:
+                result.append((start, end, value))
+                covered_until = end
+        return result
+
+
+def is_negated(text: str, lang_code: str = 'kk') -> bool:
+    """Мәтінде компоненттің жоқтығы айтылған ба ("жоқ", "без", "-free", "0%", орысша "не")."""
+    words = set(normalize(text).split())
+    if lang_code == 'ru' and not _RU_NEGATIONS.isdisjoint(words):
+        return True
+    return bool(_ZERO_PERCENT_RE.search(text)) or not _NEGATIONS.isdisjoint(words)
+
+
+class IngredientIndex:
+    """Білім қоры мен көмекші сөздерден құрастырылған іздеу индексі."""
+
+    def __init__(self, data: dict):
+        self.ingredients = {item["id"]: item for item in data.get("ingredients", [])}
+        self.fillers = {normalize(word) for word in data.get("fillers", [])}
+        patterns = {}
+        for item in self.ingredients.values():
+            for term in item["terms"]:
+                patterns[normalize(term)] = item["id"]
+        self.matcher = AhoCorasick(patterns)
+
+    def analyze(self, text: str) -> tuple[list[dict], list[str]]:
+        """Мәтіндегі белгілі компоненттерді (кездесу ретімен) және танылмаған сөздерді қайтарады."""
+        found, unknown, _ = self._scan(text)
+        return found, unknown
+
+    def _scan(self, text: str) -> tuple[list[dict], list[str], bool]:
+        """analyze() нәтижесі және қандай да бір компоненттің алдында "не"/"халал" тұрғаны."""
+        normalized = normalize(text)
+        found, unknown, position, qualified = {}, [], 0, False
+        for start, end, ingredient_id in self.matcher.find(normalized):
+            gap = normalized[position:start].split()
+            unknown.extend(word for word in gap if word not in self.fillers and not word.isdigit())
+            # Алдыңғы компонент пен осы компонент арасындағы соңғы сөз
+            qualified = qualified or bool(gap) and gap[-1] in _TERM_QUALIFIERS
+            found.setdefault(ingredient_id, self.ingredients[ingredient_id])
+            position = end
+        unknown.extend(self._unknown_words(normalized[position:]))
+        return list(found.values()), unknown, qualified
+
+    def _unknown_words(self, chunk: str) -> list[str]:
+        return [word for word in chunk.split() if word not in self.fillers and not word.isdigit()]
+
+    def verdict(self, text: str, lang_code: str = 'kk') -> str | None:
+        """Жергілікті білім қоры жеткілікті болса, дайын жауап мәтінін қайтарады, әйтпесе None."""
+        found, unknown, qualified = self._scan(text)
+        # "не свинина", "халал ветчина" — сөздің мағынасын модель шешеді
+        if not found or unknown or qualified or is_negated(text, lang_code):
+            return None
+        worst = max(found, key=lambda item: _STATUS_ORDER[item["status"]])["status"]
+        lang = 'ru' if lang_code == 'ru' else 'kk'
+        # Харам/күмәнді шешімде тек сол шешімге себеп болған компоненттер көрсетіледі
+        shown = found if worst == "halal" else [item for item in found if item["status"] == worst]
+        lines = [get_text(f"ingredient_verdict_{worst}", lang_code)]
+        lines += [f"• {item['name'][lang]} — {get_text('ingredient_status_' + item['status'], lang_code)}" for item in shown]
+        return "\n".join(lines)
+
+
+def load_index(path: str = INGREDIENTS_FILE) -> IngredientIndex | None:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = IngredientIndex(json.load(f))
+        logger.info(f"Құрамдас бөліктер базасы жүктелді: {len(index.ingredients)} жазба.")
+        return index
+    except Exception as e:
+        logger.error(f"Құрамдас бөліктер базасын жүктеу кезінде қате: {e}")
+        return None
+
+
+_index = load_index() if INGREDIENT_FAST_PATH else None
+
+
+def local_verdict(text: str, lang_code: str = 'kk') -> str | None:
+    """Сұрақ немесе OCR мәтіні үшін OpenAI-сыз жауап (мүмкін болса)."""
+    if _index is None:
+        return None
+    return _index.verdict(text, lang_code)
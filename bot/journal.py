@@ -0,0 +1,166 @@
+# bot/journal.py
+"""Жауаптан кейінгі міндетті емес жазулар үшін write-behind журналы.
+
+Жазулар жадтағы кезекке түседі және көлем (JOURNAL_MAX_BATCH) немесе уақыт
+(JOURNAL_FLUSH_INTERVAL) шарты орындалғанда бір транзакциямен жазылады.
+Кілті бар жазулар (мысалы, бір қолданушының thread_id-ы) біріктіріледі:
+кезекте тек соңғы мәні қалады, ал оқу кезінде ``lookup`` арқылы әлі
+жазылмаған мән қайтарылады.
+
+Топ жазылмаса, ол кезекке қайтарылады. Бір жазу JOURNAL_MAX_ATTEMPTS рет
+сәтсіз болса, топ жазулары бір-бірден қолданылады: қате беретін жазу
+журналға (лог) жазылып, dead_letters тізіміне шығарылады да, қалғандарын
+бұғаттамайды.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from itertools import count
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MAX_BATCH = int(os.getenv("JOURNAL_MAX_BATCH", 200))
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", 1.0))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", 3))
+# Жадта сақталатын өткізілген жазулардың ең көп саны
+JOURNAL_DEAD_LETTERS = 100
+
+_MISSING = object()
+
+
+class WriteBehindJournal:
+    """Жазуларды жинап, ``flush_func(ops)`` арқылы топтап жазатын журнал.
+
+    ``flush_func`` — ops тізімін бір транзакцияда орындайтын корутина.
+    """
+
+    def __init__(self, flush_func, max_batch: int = JOURNAL_MAX_BATCH, flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 max_attempts: int = JOURNAL_MAX_ATTEMPTS):
+        self._flush_func = flush_func
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._pending: OrderedDict = OrderedDict()
+        self._flushing: OrderedDict = OrderedDict()
+        self._attempts: dict = {}
+        # Қолданылмай өткізілген жазулар: (op_name, args, қате)
+        self.dead_letters: deque = deque(maxlen=JOURNAL_DEAD_LETTERS)
+        self._seq = count()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._size_flush: asyncio.Task | None = None
+        # Метрикалар
+        self.flushes = 0
+        self.flushed_ops = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def put(self, op_name: str, args: tuple, key=None):
+        """Жазуды кезекке қояды; key берілсе, сол кілттің ескі жазуын алмастырады."""
+        key = key if key is not None else ('_seq', next(self._seq))
+        self._pending[key] = (op_name, args)
+        # Жаңа мәннің әрекеттері қайтадан саналады
+        self._attempts.pop(key, None)
+        if len(self._pending) >= self.max_batch and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.get_running_loop().create_task(self.flush())
+
+    def lookup(self, key, default=_MISSING):
+        """Кілт бойынша әлі дерекқорға жетпеген жазудың аргументтерін қайтарады."""
+        for source in (self._pending, self._flushing):
+            if key in source:
+                return source[key][1]
+        return default
+
+    async def flush(self):
+        """Кезектегі барлық жазуларды бір транзакциямен жазады."""
+        async with self._lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, OrderedDict()
+            batch = list(self._flushing.items())
+            start = time.perf_counter()
+            try:
+                try:
+                    await self._flush_func([op for _, op in batch])
+                    written = len(batch)
+                    for key, _ in batch:
+                        self._attempts.pop(key, None)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    if max(self._attempts.get(key, 0) for key, _ in batch) + 1 < self.max_attempts:
+                        logger.error(f"Журналды жазу кезінде қате ({len(batch)} жазу), кейін қайталанады: {e}")
+                        for key, op in batch:
+                            self._requeue(key, op)
+                        return
+                    logger.error(f"Журнал топпен жазылмады ({len(batch)} жазу), жазулар бір-бірден қолданылады: {e}")
+                    written = await self._apply_separately(batch)
+            finally:
+                self._flushing = OrderedDict()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.flushed_ops += written
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def _requeue(self, key, op):
+        """Жаңа мән келмеген жазуды кезекке қайтарады (әрекет саны артады)."""
+        if key not in self._pending:
+            self._attempts[key] = self._attempts.get(key, 0) + 1
+            self._pending[key] = op
+
+    async def _apply_separately(self, batch: list) -> int:
+        """Жазуларды бір-бірден қолданады; әрекеттері біткен қате жазулар өткізіледі."""
+        written = 0
+        for key, op in batch:
+            try:
+                await self._flush_func([op])
+            except Exception as e:
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts < self.max_attempts:
+                    self._requeue(key, op)
+                    continue
+                self._attempts.pop(key, None)
+                self.dead_letters.append((*op, repr(e)))
+                self.dead_lettered += 1
+                logger.error(f"Журнал жазуы {attempts} әрекеттен кейін өткізілді: {op[0]}{op[1]}: {e}")
+            else:
+                written += 1
+                self._attempts.pop(key, None)
+        return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Уақыт бойынша жазатын фондық тапсырманы іске қосады."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Фондық тапсырманы тоқтатып, қалған жазуларды жазады."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Кезек тереңдігі мен жазу уақытының метрикалары."""
+        return {
+            "queue_depth": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_ops": self.flushed_ops,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
@@ -0,0 +1,249 @@
+# bot/kb_ingest.py
+"""Білім қорын бірнеше файлмен (немесе zip архивпен) фонда жаңарту.
+
+Админ бір сессияда бірнеше құжат не архив жібереді. Файлдар уақытша
+бумаға дискке жазылып, OpenAI-ға файл дескрипторы арқылы ағынмен (толық
+көшірмесін жадта ұстамай) жүктеледі. Содан кейін бәрі vector store-ға бір
+file batch ретінде қосылады, ал batch күйі фонда сұралып, админге әр
+файлдың прогресі мен жалпы жылдамдық көрсетіледі.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from telegram.error import BadRequest
+
+from bot import answer_cache, pipeline
+from bot.config import VECTOR_STORE_ID
+
+logger = logging.getLogger(__name__)
+
+KB_UPLOAD_CONCURRENCY = int(os.getenv("KB_UPLOAD_CONCURRENCY", 4))
+KB_POLL_INTERVAL = float(os.getenv("KB_POLL_INTERVAL", 3))
+KB_PROGRESS_INTERVAL = float(os.getenv("KB_PROGRESS_INTERVAL", 5))
+# Архивтен шығарылатын файлдардың жалпы көлеміне шек (zip-бомбадан қорғаныс)
+KB_MAX_EXTRACT_BYTES = int(os.getenv("KB_MAX_EXTRACT_MB", 512)) * 1024 * 1024
+
+# .docx/.xlsx/.epub сияқты пішімдер де zip-архив, сондықтан тек нағыз .zip ашылады
+_ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+_job_ids = itertools.count(1)
+_tasks: dict[int, asyncio.Task] = {}
+
+
+def _unique_path(directory: Path, name: str) -> Path:
+    """Бумадағы бос файл атын қайтарады (аты бірдей файлдар бірін-бірі басып кетпеуі үшін)."""
+    name = Path(name).name or "file"
+    path = directory / name
+    stem, suffix = path.stem, path.suffix
+    for index in itertools.count(1):
+        if not path.exists():
+            return path
+        path = directory / f"{stem}_{index}{suffix}"
+
+
+def extract_zip(archive: Path, destination: Path, max_bytes: int = KB_MAX_EXTRACT_BYTES) -> list[Path]:
+    """Архивтегі файлдарды ағынмен шығарады; бумалар, жасырын/жүйелік файлдар және ".." бар жолдар өткізіледі."""
+    paths = []
+    with zipfile.ZipFile(archive) as zf:
+        members = [
+            info for info in zf.infolist()
+            if not info.is_dir() and not any(part.startswith(('.', '__MACOSX')) for part in Path(info.filename).parts)
+        ]
+        if sum(info.file_size for info in members) > max_bytes:
+            raise ValueError(f"Архив тым үлкен: {max_bytes // (1024 * 1024)} МБ-тан асады.")
+        for info in members:
+            # Архивтегі жолдар ескерілмейді: тек файл аты (бумадан тыс жазуға жол бермейміз)
+            path = _unique_path(destination, info.filename)
+            with zf.open(info) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            paths.append(path)
+    return paths
+
+
+def is_archive(document) -> bool:
+    """Құжат ашылуы керек zip-архив пе (Office құжаттары өзгертусіз жүктеледі)."""
+    name = (document.file_name or "").lower()
+    return name.endswith(".zip") or document.mime_type in _ZIP_MIME_TYPES
+
+
+class IngestSession:
+    """Бір админнің жаңарту сессиясы: жіберілген файлдар уақытша бумада жиналады."""
+
+    def __init__(self):
+        self.workdir = Path(tempfile.mkdtemp(prefix="kb_ingest_"))
+        self.paths: list[Path] = []
+
+    async def add_document(self, document) -> list[Path]:
+        """Telegram құжатын дискке жүктейді; zip болса, ішіндегі файлдарды шығарады."""
+        path = _unique_path(self.workdir, document.file_name or document.file_unique_id)
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(custom_path=path)
+        if is_archive(document) and zipfile.is_zipfile(path):
+            try:
+                added = await asyncio.to_thread(extract_zip, path, self.workdir)
+            finally:
+                path.unlink(missing_ok=True)
+        else:
+            added = [path]
+        self.paths.extend(added)
+        return added
+
+    def cleanup(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} МБ"
+
+
+class IngestProgress:
+    """Жүктеу мен индекстеу прогресі және админге көрсетілетін мәтін."""
+
+    def __init__(self, paths: list[Path]):
+        self.total = len(paths)
+        self.total_bytes = sum(path.stat().st_size for path in paths)
+        self.started = time.monotonic()
+        self.uploaded: dict[str, Path] = {}  # OpenAI file_id → жергілікті файл
+        self.uploaded_bytes = 0
+        self.upload_failed: list[str] = []
+        self.batch_counts = None
+        self.index_failed: list[str] = []
+        self.last_file = None
+
+    def throughput(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return f"{self.uploaded_bytes / (1024 * 1024) / elapsed:.2f} МБ/с, {len(self.uploaded) * 60 / elapsed:.1f} файл/мин"
+
+    def text(self, finished: bool = False) -> str:
+        lines = []
+        if finished:
+            lines.append("🎉 Білім қорын жаңарту аяқталды.")
+        elif self.batch_counts is None:
+            lines.append(f"⬆️ OpenAI-ға жүктелуде: {len(self.uploaded) + len(self.upload_failed)}/{self.total} "
+                         f"({_megabytes(self.uploaded_bytes)} / {_megabytes(self.total_bytes)})")
+            if self.last_file:
+                lines.append(f"Соңғы файл: {self.last_file}")
+        else:
+            lines.append("🔄 Файлдар білім қорына қосылуда...")
+        if self.batch_counts is not None:
+            counts = self.batch_counts
+            lines.append(f"✅ Дайын: {counts.completed}/{counts.total}, ⏳ өңделуде: {counts.in_progress}, "
+                         f"❌ қате: {counts.failed + counts.cancelled}")
+        failed = self.upload_failed + self.index_failed
+        if failed:
+            lines.append("Қосылмаған файлдар: " + ", ".join(failed))
+        lines.append(f"Жылдамдық: {self.throughput()}")
+        return "\n".join(lines)
+
+
+async def _upload_file(client, path: Path):
+    # Файл әр әрекетте қайта ашылады: қайталау кезінде дескриптор басынан оқылуы керек
+    with open(path, "rb") as f:
+        return await client.files.create(file=(path.name, f), purpose="assistants")
+
+
+async def run_ingestion(paths: list[Path], report, client=None, vector_store_id: str | None = VECTOR_STORE_ID) -> IngestProgress:
+    """Файлдарды жүктеп, бір file batch-пен vector store-ға қосады және аяқталғанша күтеді.
+
+    ``report(мәтін)`` прогресті көрсету үшін KB_PROGRESS_INTERVAL сайын шақырылады.
+    """
+    client = client or pipeline.client_openai
+    progress = IngestProgress(paths)
+    semaphore = asyncio.Semaphore(KB_UPLOAD_CONCURRENCY)
+    last_report = 0.0
+
+    async def maybe_report():
+        nonlocal last_report
+        if time.monotonic() - last_report >= KB_PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await report(progress.text())
+
+    async def upload(path: Path):
+        async with semaphore:
+            try:
+                openai_file = await pipeline.openai_scheduler.call(_upload_file, client, path)
+            except Exception as e:
+                logger.error(f"'{path.name}' файлын OpenAI-ға жүктеу қатесі: {e}")
+                progress.upload_failed.append(path.name)
+            else:
+                progress.uploaded[openai_file.id] = path
+                progress.uploaded_bytes += path.stat().st_size
+                progress.last_file = path.name
+        await maybe_report()
+
+    await asyncio.gather(*(upload(path) for path in paths))
+    if not progress.uploaded:
+        return progress
+
+    batch = await pipeline.openai_scheduler.call(
+        client.vector_stores.file_batches.create, vector_store_id=vector_store_id, file_ids=list(progress.uploaded)
+    )
+    progress.batch_counts = batch.file_counts
+    await report(progress.text())
+    while batch.status == "in_progress":
+        await asyncio.sleep(KB_POLL_INTERVAL)
+        batch = await pipeline.openai_scheduler.call(
+            client.vector_stores.file_batches.retrieve, batch.id, vector_store_id=vector_store_id
+        )
+        progress.batch_counts = batch.file_counts
+        await maybe_report()
+
+    if batch.file_counts.failed or batch.file_counts.cancelled:
+        async for vs_file in client.vector_stores.file_batches.list_files(
+            batch.id, vector_store_id=vector_store_id, filter="failed"
+        ):
+            path = progress.uploaded.get(vs_file.id)
+            progress.index_failed.append(path.name if path else vs_file.id)
+    return progress
+
+
+async def _run_job(bot, job_id: int, chat_id: int, session: IngestSession):
+    progress_message = await bot.send_message(
+        chat_id=chat_id, text=f"📚 {len(session.paths)} файлды білім қорына қосу фонда басталды..."
+    )
+
+    async def report(text: str):
+        try:
+            await progress_message.edit_text(text)
+        except BadRequest as e:
+            # "Message is not modified" — маңызды емес
+            logger.debug(f"Прогресті жаңарту мүмкін болмады: {e}")
+
+    try:
+        progress = await run_ingestion(session.paths, report)
+        if progress.batch_counts is not None and progress.batch_counts.completed:
+            # Білім қоры өзгерді: бұрын сақталған жауаптар ескіруі мүмкін
+            await answer_cache.invalidate()
+        await report(progress.text(finished=True))
+        logger.info(f"Білім қорын жаңарту #{job_id} аяқталды: {len(progress.uploaded)}/{progress.total} файл, {progress.throughput()}")
+    except asyncio.CancelledError:
+        logger.info(f"Білім қорын жаңарту #{job_id} тоқтатылды.")
+        raise
+    except Exception as e:
+        logger.error(f"Білім қорын жаңарту #{job_id} қатесі: {e}", exc_info=True)
+        await report(f"❌ Білім қорын жаңарту кезінде қате пайда болды: {e}")
+    finally:
+        session.cleanup()
+        _tasks.pop(job_id, None)
+
+
+def start_ingestion(bot, chat_id: int, session: IngestSession) -> int:
+    """Сессиядағы файлдарды фонда білім қорына қосады; тапсырма нөмірін қайтарады."""
+    job_id = next(_job_ids)
+    _tasks[job_id] = asyncio.create_task(_run_job(bot, job_id, chat_id, session))
+    return job_id
+
+
+async def stop_ingestions():
+    """Жүріп жатқан жаңартуларды тоқтатады (уақытша файлдар өшіріледі)."""
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
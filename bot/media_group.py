@@ -0,0 +1,49 @@
+# bot/media_group.py
+"""Альбом (media group) суреттерін бір сұраққа жинау.
+
+Telegram альбомның әр суретін жеке update ретінде жібереді. Топтың бірінші
+суреті келгенде оның хэндлері "жетекші" болады: соңғы суреттен кейін
+MEDIA_GROUP_WINDOW өткенше (бірақ MEDIA_GROUP_MAX_WAIT-тан аспай) күтіп,
+топтың барлық хабарламасын алады. Қалған суреттердің хэндлерлері бірден
+None алады да, ештеңе істемейді — лимит, OCR және run бүкіл альбомға бір рет.
+"""
+import asyncio
+import os
+
+MEDIA_GROUP_WINDOW = float(os.getenv("MEDIA_GROUP_WINDOW", 0.8))
+MEDIA_GROUP_MAX_WAIT = float(os.getenv("MEDIA_GROUP_MAX_WAIT", 3))
+# Telegram альбомында ең көбі 10 элемент болады
+MEDIA_GROUP_MAX_SIZE = 10
+
+
+class MediaGroupCollector:
+    def __init__(self, window: float = MEDIA_GROUP_WINDOW, max_wait: float = MEDIA_GROUP_MAX_WAIT,
+                 max_size: int = MEDIA_GROUP_MAX_SIZE):
+        self.window = window
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self._groups: dict[tuple[int, str], dict] = {}
+
+    async def collect(self, message) -> list | None:
+        """Жетекшіге топтың хабарламаларын (message_id ретімен), қалғандарына None қайтарады."""
+        loop = asyncio.get_running_loop()
+        key = (message.chat_id, message.media_group_id)
+        group = self._groups.get(key)
+        if group is not None:
+            group["messages"].append(message)
+            group["last"] = loop.time()
+            return None
+
+        group = {"messages": [message], "last": loop.time()}
+        self._groups[key] = group
+        deadline = group["last"] + self.max_wait
+        try:
+            while len(group["messages"]) < self.max_size:
+                wait = min(group["last"] + self.window, deadline) - loop.time()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            # Осыдан кейін келген сурет жаңа топ бастайды
+            self._groups.pop(key, None)
+        return sorted(group["messages"], key=lambda item: item.message_id)
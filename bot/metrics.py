@@ -0,0 +1,64 @@
+# bot/metrics.py
+"""Жадтағы қарапайым өнімділік метрикалары (кешігу уақыттары мен санауыштар)."""
+import threading
+from collections import deque
+
+METRICS_WINDOW = 500
+
+
+class LatencyStats:
+    """Соңғы өлшемдер терезесі бойынша кешігу статистикасы (секундпен)."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._recent)
+        if not recent:
+            return {"count": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000,
+            "p50_ms": recent[len(recent) // 2] * 1000,
+            "p95_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000,
+        }
+
+
+_lock = threading.Lock()
+_latencies: dict[str, LatencyStats] = {}
+_counters: dict[str, int] = {}
+
+
+def observe(name: str, seconds: float):
+    """Аталған метрикаға бір өлшем қосады."""
+    with _lock:
+        _latencies.setdefault(name, LatencyStats()).observe(seconds)
+
+
+def increment(name: str, amount: int = 1):
+    """Аталған санауышты арттырады."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot() -> dict:
+    """Барлық метрикалардың ағымдағы күйін қайтарады."""
+    with _lock:
+        return {
+            "latency": {name: stats.snapshot() for name, stats in _latencies.items()},
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    """Барлық метрикаларды тазалайды (тесттер үшін)."""
+    with _lock:
+        _latencies.clear()
+        _counters.clear()
@@ -0,0 +1,135 @@
+# bot/openai_scheduler.py
+"""OpenAI шақыруларына арналған басымдықты шектегіш және қайталау жоспарлағышы.
+
+Бір уақытта орындалатын run саны OPENAI_MAX_CONCURRENCY-мен шектеледі.
+Бос орын күтіп тұрған сұраныстар басымдық бойынша (admin → premium → free),
+ал бір деңгей ішінде келу реті бойынша өтеді. Уақытша қателер (429, 5xx,
+желі) retry-after тақырыбын ескеретін, jitter қосылған экспоненциалды
+кідіріспен қайталанады.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import openai
+
+from bot import metrics
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 16))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 4))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", 0.5))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", 20))
+
+PRIORITIES = {'admin': 0, 'premium': 1, 'free': 2}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError,
+)
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Жауаптың retry-after-ms / retry-after тақырыбынан күту уақытын алады."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        return None
+    return None
+
+
+class OpenAIScheduler:
+    """Басымдық кезегі бар семафор және қайталау саясаты."""
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, max_retries: int = OPENAI_MAX_RETRIES,
+                 base_delay: float = OPENAI_RETRY_BASE_DELAY, max_delay: float = OPENAI_RETRY_MAX_DELAY):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # Метрикалар
+        self.retries = 0
+        self.gave_up = 0
+
+    @asynccontextmanager
+    async def slot(self, tier: str = 'free'):
+        """Бос орын босағанша (басымдық бойынша) күтеді; күту уақыты метрикаға жазылады."""
+        start = time.perf_counter()
+        await self._acquire(PRIORITIES.get(tier, PRIORITIES['free']))
+        metrics.observe('openai_queue_wait', time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def call(self, func, *args, **kwargs):
+        """``await func(*args, **kwargs)``-ты уақытша қателерде қайталап орындайды."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await func(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                # Аккаунт квотасы біткенде қайталаудың мағынасы жоқ
+                if attempt == self.max_retries or getattr(e, 'code', None) == 'insufficient_quota':
+                    self.gave_up += 1
+                    raise
+                delay = self.retry_delay(e, attempt)
+                self.retries += 1
+                metrics.increment('openai_retries')
+                logger.warning(f"OpenAI уақытша қатесі ({type(e).__name__}), {delay:.1f} с кейін қайталаймыз: {e}")
+                await asyncio.sleep(delay)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Сервер айтқан уақытқа аздап jitter қосамыз: барлық сұраныс бір сәтте оралмауы үшін
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "gave_up": self.gave_up,
+        }
+
+    async def _acquire(self, priority: int):
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Орын бізге берілгеннен кейін бас тартсақ, оны келесі күтушіге қайтарамыз
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Орын тікелей келесі күтушіге беріледі, _active өзгермейді
+                future.set_result(None)
+                return
+        self._active -= 1
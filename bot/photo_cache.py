@@ -0,0 +1,97 @@
+# bot/photo_cache.py
+"""Қайталанатын өнім суреттерінің OCR кэші.
+
+Бір өнімнің қаптамасын көп қолданушы суретке түсіреді. Алдымен Telegram
+``file_unique_id`` бойынша іздейміз: табылса, сурет жүктелмейді де, OCR
+жасалмайды. Табылмаса, жүктелген суреттің перцептивті хэші (dHash) бойынша
+ұқсас сурет ізделеді. OCR мәтіні photo_cache кестесінде сақталады, ал
+соңғы жауап сол мәтінге байланған кілтпен жауаптар кэшінде (answer_cache)
+тіл бойынша сақталады, сондықтан білім қоры жаңарғанда ол да жарамсыз болады.
+
+Pillow орнатылмаса, тек file_unique_id бойынша іздеу жұмыс істейді.
+"""
+import asyncio
+import io
+import logging
+import os
+import time
+
+from bot import database
+from bot.repository import journal, run_read, run_write
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow — қосымша тәуелділік
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PHOTO_CACHE_ENABLED = os.getenv("PHOTO_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PHOTO_CACHE_MAX_ROWS = int(os.getenv("PHOTO_CACHE_MAX_ROWS", 10000))
+# dHash өлшемі: 16 → 256 биттік хэш (бір брендтің ұқсас қаптамаларын ажырату үшін 64 бит аз)
+PHOTO_HASH_SIZE = int(os.getenv("PHOTO_HASH_SIZE", 16))
+# Ұқсас сурет деп есептелетін ең көп айырмашылық (бит)
+PHOTO_HASH_MAX_DISTANCE = int(os.getenv("PHOTO_HASH_MAX_DISTANCE", 10))
+
+_stats = {"file_hits": 0, "hash_hits": 0, "misses": 0}
+
+
+def perceptual_hash(data: bytes, hash_size: int = PHOTO_HASH_SIZE) -> bytes | None:
+    """Суреттің dHash-ін қайтарады: көрші пикселдердің жарықтығы салыстырылады."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (hash_size * 4, hash_size * 4))  # JPEG-ті кішірейтіп декодтау
+            pixels = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS).tobytes()
+    except Exception as e:
+        logger.warning(f"Суреттің хэшін есептеу мүмкін болмады: {e}")
+        return None
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits.to_bytes(hash_size * hash_size // 8, "big")
+
+
+def answer_key(ocr_text: str) -> str:
+    """Сурет жауабы жауаптар кэшінде сақталатын "сұрақ" (мәтіндік сұрақтармен қақтығыспайды)."""
+    return f"[photo] {ocr_text}"
+
+
+async def lookup_file(file_unique_id: str) -> str | None:
+    """file_unique_id бойынша OCR мәтіні (жүктеусіз); табылмаса None."""
+    if not PHOTO_CACHE_ENABLED:
+        return None
+    text = await run_read(database.get_photo_ocr, file_unique_id)
+    if text is not None:
+        _stats["file_hits"] += 1
+        journal.put("photo_hit", (file_unique_id, time.time()))
+    return text
+
+
+async def lookup_image(file_unique_id: str, data: bytes) -> tuple[str | None, bytes | None]:
+    """Жүктелген суретке ұқсас суреттің OCR мәтінін іздейді: (мәтін немесе None, хэш)."""
+    if not PHOTO_CACHE_ENABLED:
+        return None, None
+    phash = await asyncio.to_thread(perceptual_hash, data)
+    text = await run_read(database.find_photo_ocr_by_hash, phash, PHOTO_HASH_MAX_DISTANCE) if phash else None
+    if text is None:
+        _stats["misses"] += 1
+        return None, phash
+    _stats["hash_hits"] += 1
+    # Келесі жолы осы файл жүктелмей-ақ табылуы үшін оны да сақтаймыз
+    await put(file_unique_id, phash, text)
+    return text, phash
+
+
+async def put(file_unique_id: str, phash: bytes | None, ocr_text: str):
+    if PHOTO_CACHE_ENABLED:
+        await run_write(database.put_photo_ocr, file_unique_id, phash, ocr_text, PHOTO_CACHE_MAX_ROWS)
+
+
+def stats() -> dict:
+    lookups = _stats["file_hits"] + _stats["hash_hits"] + _stats["misses"]
+    hits = _stats["file_hits"] + _stats["hash_hits"]
+    return {**_stats, "hit_rate": hits / lookups if lookups else 0.0}
@@ -0,0 +1,85 @@
+# bot/photo_prep.py
+"""OCR алдында суретті таңдау, жүктеу және дайындау.
+
+Telegram бір суретті бірнеше өлшемде (PhotoSize) береді. Ең үлкенін емес,
+қысқа жағы PHOTO_MIN_SIDE-тан кем емес ең кішісін аламыз: этикетка мәтінін
+оқуға жетеді, ал жүктелетін және Vision-ға жіберілетін байт әлдеқайда аз.
+Сурет бір рет жадқа (BytesIO) жүктеледі, қалған кезеңдер оның көшірмесін
+жасамай оқиды. Қаласаңыз (PHOTO_PREPROCESS), Vision-ға жіберер алдында
+сурет сұр түске айналдырылып, біркелкі жиектері кесіліп, кішірейтіліп
+қайта сығылады (Pillow қажет).
+"""
+import io
+import logging
+import os
+
+from bot import metrics
+
+try:
+    from PIL import Image, ImageChops, ImageOps
+except ImportError:  # Pillow — қосымша тәуелділік
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Қысқа жағы осыдан кем емес ең кіші өлшем таңдалады (жоқ болса — ең үлкені)
+PHOTO_MIN_SIDE = int(os.getenv("PHOTO_MIN_SIDE", 720))
+PHOTO_PREPROCESS = os.getenv("PHOTO_PREPROCESS", "true").lower() in ("1", "true", "yes")
+PHOTO_GRAYSCALE = os.getenv("PHOTO_GRAYSCALE", "true").lower() in ("1", "true", "yes")
+PHOTO_AUTOCROP = os.getenv("PHOTO_AUTOCROP", "true").lower() in ("1", "true", "yes")
+PHOTO_MAX_SIDE = int(os.getenv("PHOTO_MAX_SIDE", 1600))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", 85))
+# Жиектің фоннан осы мөлшерден аз ерекшеленетін пикселдері "біркелкі" саналады
+_CROP_THRESHOLD = 24
+
+
+def select_photo_size(sizes, min_side: int = PHOTO_MIN_SIDE):
+    """OCR-ға жететін ең кіші PhotoSize-ты таңдайды."""
+    ordered = sorted(sizes, key=lambda size: size.width * size.height)
+    for size in ordered:
+        if min(size.width, size.height) >= min_side:
+            return size
+    return ordered[-1]
+
+
+async def download(photo_size) -> bytes:
+    """Суретті бір рет жадқа жүктейді (bytearray → bytes сияқты қосымша көшірмесіз)."""
+    buffer = io.BytesIO()
+    tg_file = await photo_size.get_file()
+    await tg_file.download_to_memory(out=buffer)
+    metrics.increment('photo_bytes_downloaded', buffer.tell())
+    # Буфер басқа жерде қолданылмағандықтан, getvalue() ішкі bytes объектісін көшірмей қайтарады
+    return buffer.getvalue()
+
+
+def _autocrop(image):
+    """Сол жақ жоғарғы бұрыштың түсіне жақын біркелкі жиектерді кеседі."""
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background).point(lambda value: 255 if value > _CROP_THRESHOLD else 0)
+    box = diff.getbbox()
+    if not box:
+        return image
+    margin = max(image.size) // 50
+    left, top, right, bottom = box
+    box = (max(0, left - margin), max(0, top - margin), min(image.width, right + margin), min(image.height, bottom + margin))
+    return image.crop(box) if box != (0, 0, image.width, image.height) else image
+
+
+def preprocess(data: bytes) -> bytes:
+    """Vision-ға жіберілетін суретті дайындайды; нәтиже кішірейтпесе, түпнұсқа қайтарылады."""
+    if not PHOTO_PREPROCESS or Image is None:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original)
+            image = image.convert("L") if PHOTO_GRAYSCALE else image.convert("RGB")
+            if PHOTO_AUTOCROP:
+                image = _autocrop(image)
+            if max(image.size) > PHOTO_MAX_SIDE:
+                image.thumbnail((PHOTO_MAX_SIDE, PHOTO_MAX_SIDE), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Суретті алдын ала өңдеу мүмкін болмады, түпнұсқа жіберіледі: {e}")
+        return data
+    return output.getvalue() if output.tell() < len(data) else data
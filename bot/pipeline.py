@@ -0,0 +1,512 @@
+# bot/pipeline.py
+"""Сұраққа ассистент арқылы жауап берудің ортақ конвейері.
+
+Мәтін мен сурет хэндлерлері бір ағынмен өтеді: лимитті тексеру → кірісті
+дайындау (мәтін немесе OCR) → жергілікті жауап / жауаптар кэші → run
+кезегі → thread таңдау → run → жауапты алу → хабарламаны өңдеу. Әр
+кезеңнің уақыты StageTimings арқылы метрикаға және логқа жазылады.
+
+Модуль барлық жерде қолданылатын жалғыз AsyncOpenAI клиентіне ие: оның
+httpx пулы keep-alive қосылымдарын қайта пайдаланады, сондықтан әр
+шақыру жаңа TLS байланысын ашпайды.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import openai
+from openai import AsyncOpenAI, DEFAULT_CONNECTION_LIMITS, DefaultAsyncHttpxClient, Timeout
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+
+from bot import answer_cache, certificates, metrics, photo_cache, photo_prep, quota, thread_policy
+from bot.config import OPENAI_API_KEY, OPENAI_ASSISTANT_ID, OPENAI_STREAMING, STREAM_EDIT_INTERVAL
+from bot.ingredients import local_verdict
+from bot.media_group import MediaGroupCollector
+from bot.openai_scheduler import OpenAIScheduler
+from bot.repository import get_user_language, log_suspicious_product, record_thread_turn, set_last_q_and_a, set_thread_id
+from bot.run_queue import UserRunQueue
+from bot.run_supervisor import RunSupervisor, RunTimeout
+from bot.utils import clean_assistant_text, get_language_instruction, get_text
+from bot.vision_ocr import ocr
+
+logger = logging.getLogger(__name__)
+
+# --- Ортақ OpenAI клиенті ---
+OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", 100))
+OPENAI_HTTP_MAX_KEEPALIVE = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", 20))
+OPENAI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", 60))
+OPENAI_HTTP_TIMEOUT = float(os.getenv("OPENAI_HTTP_TIMEOUT", 60))
+OPENAI_HTTP_CONNECT_TIMEOUT = float(os.getenv("OPENAI_HTTP_CONNECT_TIMEOUT", 5))
+
+# SDK-мен бірге келген httpx нұсқасының Limits класы (SDK-ға басқа нұсқаның объектісін беруге болмайды)
+_Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+
+def create_openai_client(api_key: str | None = OPENAI_API_KEY, **kwargs) -> AsyncOpenAI:
+    """Баптаулары реттелген пулы бар AsyncOpenAI клиентін жасайды."""
+    http_client = DefaultAsyncHttpxClient(
+        limits=_Limits(
+            max_connections=OPENAI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=Timeout(OPENAI_HTTP_TIMEOUT, connect=OPENAI_HTTP_CONNECT_TIMEOUT),
+    )
+    # Қайталауларды SDK емес, openai_scheduler басқарады (retry-after + jitter, метрикалар)
+    return AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0, **kwargs)
+
+
+client_openai = create_openai_client()
+openai_scheduler = OpenAIScheduler()
+# Барлық аяқталмаған run-дарды бір фондық цикл бақылайды
+run_supervisor = RunSupervisor(lambda: client_openai)
+
+
+# --- Кезең уақыттары ---
+
+class StageTimings:
+    """Бір сұраныстың кезеңдері бойынша уақыты (секундпен); әр кезең stage_<аты> метрикасына да жазылады."""
+
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        metrics.observe(f"stage_{name}", seconds)
+
+    def finish(self, user_id: int, request_type: str):
+        total = time.perf_counter() - self._started
+        metrics.observe("stage_total", total)
+        details = ", ".join(f"{name}={seconds * 1000:.0f}мс" for name, seconds in self.stages.items())
+        logger.info(f"Сұраныс уақыты (User {user_id}, {request_type}): барлығы {total * 1000:.0f}мс; {details}")
+
+
+# --- OpenAI Assistant-пен жұмыс ---
+
+async def run_openai_assistant(user_query: str, thread_id: str | None) -> tuple[str, str, object]:
+    if not OPENAI_ASSISTANT_ID:
+        return "Қате: OPENAI_ASSISTANT_ID .env файлында көрсетілмеген.", thread_id, None
+    try:
+        if thread_id is None:
+            run = await openai_scheduler.call(
+                client_openai.beta.threads.create_and_run,
+                assistant_id=OPENAI_ASSISTANT_ID,
+                thread={"messages": [{"role": "user", "content": user_query}]}
+            )
+            thread_id = run.thread_id
+        else:
+            await openai_scheduler.call(
+                client_openai.beta.threads.messages.create, thread_id=thread_id, role="user", content=user_query
+            )
+            run = await openai_scheduler.call(
+                client_openai.beta.threads.runs.create, thread_id=thread_id, assistant_id=OPENAI_ASSISTANT_ID
+            )
+        return "", thread_id, run
+    except openai.RateLimitError as e:
+        logger.error(f"OpenAI Rate Limit қатесі: {e}")
+        return "Сұраныстар лимитінен асып кетті. Біраз уақыттан кейін қайталаңыз.", thread_id, None
+    except openai.APIError as e:
+        logger.error(f"OpenAI API қатесі: {e}")
+        return "Кешіріңіз, OpenAI сервисінде уақытша ақау пайда болды.", thread_id, None
+    except Exception as e:
+        logger.error(f"OpenAI Assistant-ты іске қосу кезінде белгісіз қате: {e}")
+        return "Белгісіз қате пайда болды. Администраторға хабарласыңыз.", thread_id, None
+
+_RUN_FAILURE_EVENTS = {
+    'thread.run.failed': 'failed',
+    'thread.run.cancelled': 'cancelled',
+    'thread.run.expired': 'expired',
+    'thread.run.incomplete': 'incomplete',
+}
+
+async def stream_openai_assistant(user_query: str, thread_id: str | None, on_text) -> tuple[str, str | None, str | None]:
+    """Ассистент run-ын stream режимінде орындайды.
+
+    Әр жаңа token келгенде ``on_text(осы уақытқа дейінгі толық мәтін)`` шақырылады.
+    (мәтін, thread_id, run статусы) қайтарады; статус None болса, мәтін — қате хабарламасы.
+    """
+    if not OPENAI_ASSISTANT_ID:
+        return "Қате: OPENAI_ASSISTANT_ID .env файлында көрсетілмеген.", thread_id, None
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    status = 'completed'
+    try:
+        if thread_id is None:
+            stream = await openai_scheduler.call(
+                client_openai.beta.threads.create_and_run,
+                assistant_id=OPENAI_ASSISTANT_ID,
+                thread={"messages": [{"role": "user", "content": user_query}]},
+                stream=True
+            )
+        else:
+            await openai_scheduler.call(
+                client_openai.beta.threads.messages.create, thread_id=thread_id, role="user", content=user_query
+            )
+            stream = await openai_scheduler.call(
+                client_openai.beta.threads.runs.create, thread_id=thread_id, assistant_id=OPENAI_ASSISTANT_ID, stream=True
+            )
+        async for event in stream:
+            if event.event == 'thread.created':
+                thread_id = event.data.id
+            elif event.event == 'thread.run.created':
+                thread_id = event.data.thread_id
+            elif event.event == 'thread.message.delta':
+                for block in event.data.delta.content or []:
+                    if block.type == 'text' and block.text and block.text.value:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            metrics.observe('openai_ttft', first_token_at - start)
+                        parts.append(block.text.value)
+                        await on_text(''.join(parts))
+            elif event.event in _RUN_FAILURE_EVENTS:
+                status = _RUN_FAILURE_EVENTS[event.event]
+                last_error = getattr(event.data, 'last_error', None)
+                logger.error(f"OpenAI Assistant run аяқталмады, статусы: {status}, қате: {last_error.message if last_error else 'Белгісіз қате'}")
+        metrics.observe('openai_stream_total', time.perf_counter() - start)
+        return ''.join(parts), thread_id, status
+    except openai.RateLimitError as e:
+        logger.error(f"OpenAI Rate Limit қатесі: {e}")
+        return "Сұраныстар лимитінен асып кетті. Біраз уақыттан кейін қайталаңыз.", thread_id, None
+    except openai.APIError as e:
+        logger.error(f"OpenAI API қатесі: {e}")
+        return "Кешіріңіз, OpenAI сервисінде уақытша ақау пайда болды.", thread_id, None
+    except Exception as e:
+        logger.error(f"OpenAI Assistant stream кезінде белгісіз қате: {e}")
+        return "Белгісіз қате пайда болды. Администраторға хабарласыңыз.", thread_id, None
+
+
+class ProgressiveEditor:
+    """Stream кезінде күту хабарламасын Telegram-ның өңдеу жиілігіне сай жаңартып отырады."""
+
+    def __init__(self, message, interval: float = STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self._last_edit = 0.0
+        self._last_text = ''
+
+    async def update(self, text: str):
+        now = time.monotonic()
+        if now - self._last_edit < self.interval:
+            return
+        cleaned = clean_assistant_text(text)
+        if not cleaned or cleaned == self._last_text:
+            return
+        self._last_edit = now
+        self._last_text = cleaned
+        try:
+            # Аралық мәтін Markdown-сыз жіберіледі: жартылай келген белгілеу қате тудыруы мүмкін
+            await self.message.edit_text(cleaned + " ▌")
+        except TelegramError as e:
+            logger.debug(f"Аралық жауапты көрсету мүмкін болмады: {e}")
+
+
+async def _poll_assistant(query_for_ai: str, thread_id: str | None, user_id: int,
+                          timings: StageTimings) -> tuple[str, str | None, str | None]:
+    """Stream өшірулі болғанда: run-ды бастап, аяқталғанша сұрап тұрады."""
+    response_text, new_thread_id, run = await run_openai_assistant(query_for_ai, thread_id)
+    if run is None:
+        return response_text, thread_id, None
+
+    if new_thread_id != thread_id:
+        await set_thread_id(user_id, new_thread_id)
+
+    try:
+        run = await run_supervisor.wait(run)
+    except RunTimeout:
+        return '', new_thread_id, 'expired'
+
+    if run.status != 'completed':
+        error_message = run.last_error.message if run.last_error else 'Белгісіз қате'
+        logger.error(f"OpenAI Assistant run аяқталмады, статусы: {run.status}, қате: {error_message}")
+        return '', new_thread_id, run.status
+
+    with timings.stage('fetch'):
+        messages = await openai_scheduler.call(client_openai.beta.threads.messages.list, thread_id=new_thread_id, limit=1)
+    return messages.data[0].content[0].text.value, new_thread_id, run.status
+
+
+async def answer_with_assistant(user_id: int, waiting_message, query_for_ai: str, question_for_log: str, reply_markup,
+                                timings: StageTimings | None = None) -> str | None:
+    """Ассистенттен жауап алып, күту хабарламасын соңғы жауаппен алмастырады.
+
+    Сәтті болса тазаланған жауапты, әйтпесе None қайтарады.
+    """
+    timings = timings or StageTimings()
+    # Тым ұзарған thread орнына жаңасы ашылады (қажет болса, алдыңғы сұхбат мазмұнымен)
+    with timings.stage('thread_lookup'):
+        thread_id, turns, carry_over = await thread_policy.prepare_thread(user_id)
+        tier = await quota.get_user_tier(user_id)
+    if carry_over:
+        query_for_ai = f"{carry_over}\n\n{query_for_ai}"
+    # Бір уақыттағы run саны шектеулі: бос орынды алдымен админдер мен премиум қолданушылар алады
+    queued_at = time.perf_counter()
+    async with openai_scheduler.slot(tier):
+        timings.add('queue_wait', time.perf_counter() - queued_at)
+        started = time.perf_counter()
+        if OPENAI_STREAMING:
+            editor = ProgressiveEditor(waiting_message)
+            final_response, new_thread_id, status = await stream_openai_assistant(query_for_ai, thread_id, editor.update)
+            if new_thread_id and new_thread_id != thread_id:
+                await set_thread_id(user_id, new_thread_id)
+        else:
+            final_response, new_thread_id, status = await _poll_assistant(query_for_ai, thread_id, user_id, timings)
+        elapsed = time.perf_counter() - started
+        timings.add('run', elapsed - timings.stages.get('fetch', 0.0))
+
+    if status is None:
+        await waiting_message.edit_text(final_response)
+        return None
+    if status != 'completed':
+        await waiting_message.edit_text(f"Ассистент жұмысында қате: {status}")
+        return None
+
+    metrics.observe(thread_policy.latency_metric(turns), elapsed)
+    await record_thread_turn(user_id, new_thread_id)
+
+    cleaned_response = clean_assistant_text(final_response)
+    with timings.stage('edit'):
+        await waiting_message.edit_text(cleaned_response, reply_markup=reply_markup, parse_mode='Markdown')
+
+    # ТҮЗЕТІЛДІ: Кері байланыс үшін дерекқорды қолдану
+    await set_last_q_and_a(user_id, question_for_log, cleaned_response)
+    return cleaned_response
+
+
+# Бір қолданушының thread-інде бір уақытта бір run: қатар келген хабарламалар біріктіріледі
+run_queue = UserRunQueue(answer_with_assistant)
+# Альбомның суреттері бір сұрақ ретінде өңделеді
+media_groups = MediaGroupCollector()
+
+
+# --- Кіріс кезеңдері ---
+
+@dataclass
+class PreparedQuery:
+    lookup_text: str | None    # жергілікті базадан іздейтін мәтін (болмаса None)
+    query_for_ai: str
+    question_for_log: str
+    cache_key: str | None = None  # жауаптар кэшіндегі кілт (болмаса жауап кэштелмейді)
+    direct_answer: str | None = None  # ассистентсіз берілетін жауап (мысалы, сертификаттар тізілімінен)
+
+
+class Reply:
+    """Қолданушыға жауапты бір хабарлама арқылы береді: алдымен күту мәтіні, кейін нәтиже."""
+
+    def __init__(self, message):
+        self.message = message
+        self.waiting_message = None
+
+    async def wait(self, text: str):
+        if self.waiting_message is None:
+            self.waiting_message = await self.message.reply_text(text)
+        else:
+            await self.waiting_message.edit_text(text)
+        return self.waiting_message
+
+    async def final(self, text: str, reply_markup=None):
+        if self.waiting_message is None:
+            await self.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+        else:
+            await self.waiting_message.edit_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+
+
+class TextInput:
+    """Мәтіндік сұрақ: дайындау қарапайым, жауап сұрақ мәтіні бойынша кэштеледі."""
+    request_type = 'text'
+    error_log = "Хабарламаны өңдеу кезінде күтпеген қате"
+    error_text = "Кешіріңіз, күтпеген техникалық ақау пайда болды. Администраторға хабарласыңыз."
+
+    async def prepare(self, update, lang_code: str, reply: Reply, timings: StageTimings) -> PreparedQuery:
+        user = update.effective_user
+        question = update.message.text.strip()
+        logger.info(f"User {user.id} ({user.full_name}) sent text: '{question}'")
+        return PreparedQuery(question, get_language_instruction(lang_code) + question, question, cache_key=question)
+
+    def waiting_text(self, lang_code: str) -> str:
+        return random.choice(get_text('waiting_messages', lang_code))
+
+
+class PhotoInput:
+    """Сурет (немесе альбом): Google Vision арқылы мәтінін оқып (не кэштен алып), сол мәтін бойынша сұрақ құрастырады."""
+    request_type = 'photo'
+    error_log = "Суретті өңдеу қатесі"
+    error_text = "Кешіріңіз, суретті өңдеу кезінде күтпеген техникалық ақау пайда болды."
+
+    def __init__(self, messages=None):
+        # Альбом болса — оның барлық хабарламалары, әйтпесе update-тің өз хабарламасы
+        self.messages = messages
+
+    async def _recognize(self, photo, timings: StageTimings) -> str:
+        """Кэште жоқ суретті жүктеп, мәтінін оқиды (ұқсас сурет табылса — OCR-сыз)."""
+        with timings.stage('download'):
+            photo_bytes = await photo_prep.download(photo)
+        with timings.stage('photo_cache'):
+            text, phash = await photo_cache.lookup_image(photo.file_unique_id, photo_bytes)
+        if text is not None:
+            return text
+        with timings.stage('image_prep'):
+            ocr_bytes = await asyncio.to_thread(photo_prep.preprocess, photo_bytes)
+        metrics.increment('photo_bytes_uploaded', len(ocr_bytes))
+        # OCR event loop-ты бөгемейді: қатар келген суреттер бір Vision сұранысымен жіберіледі
+        with timings.stage('ocr'):
+            response = await ocr.text_detection(ocr_bytes)
+        texts = response.text_annotations
+
+        if response.error.message and not texts:
+            raise Exception(f"Google Vision API қатесі: {response.error.message}")
+
+        text = texts[0].description.replace('\n', ' ') if texts else ''
+        await photo_cache.put(photo.file_unique_id, phash, text)
+        return text
+
+    async def prepare(self, update, lang_code: str, reply: Reply, timings: StageTimings) -> PreparedQuery:
+        user = update.effective_user
+        messages = self.messages or [update.message]
+        logger.info(f"User {user.id} ({user.full_name}) sent {len(messages)} photo(s).")
+        # Ең үлкен өлшем емес, мәтінді оқуға жететін ең кішісі
+        photos = [photo_prep.select_photo_size(message.photo) for message in messages]
+
+        # Бұрын жіберілген файлдар болса, суретті жүктемей-ақ сақталған OCR мәтінін аламыз
+        with timings.stage('photo_cache'):
+            texts = list(await asyncio.gather(*(photo_cache.lookup_file(photo.file_unique_id) for photo in photos)))
+        missing = [index for index, text in enumerate(texts) if text is None]
+        if missing:
+            await reply.wait(random.choice(get_text('waiting_messages', lang_code)))
+            # Альбом суреттері қатар жүктеліп, бір Vision сұранысына түседі
+            results = await asyncio.gather(*(self._recognize(photos[index], timings) for index in missing),
+                                           return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if len(errors) == len(results) and not any(text is not None for text in texts):
+                raise errors[0]
+            for index, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Альбомдағы суретті оқу мүмкін болмады (User ID: {user.id}): {result}")
+                else:
+                    texts[index] = result
+
+        recognized = [text for text in texts if text]
+        if len(messages) > 1:
+            metrics.increment('media_group_photos_merged', len(messages) - 1)
+            text = " / ".join(f"{number}-сурет: {text}" for number, text in enumerate(texts, 1) if text)
+            intro = f"Пайдаланушы маған бір өнімнің {len(messages)} суретін жіберді. Google Vision суреттерден мынадай мәтінді оқыды"
+        else:
+            text = recognized[0] if recognized else ''
+            intro = "Пайдаланушы маған сурет жіберді. Google Vision суреттен мынадай мәтінді оқыды"
+
+        # Тізілімдегі сертификатталған өндірушілерді жергілікті индекстен іздейміз
+        with timings.stage('registry'):
+            matches = certificates.match_registry(text)
+        registry_context = certificates.prompt_context(matches)
+        # Халал белгісі бар, бірақ тізілімде жоқ өнімдер админдердің "күдікті өнімдер" тізіміне түседі
+        if certificates.is_suspicious(matches, text):
+            metrics.increment('suspicious_products')
+            await log_suspicious_product(update.effective_user.id, text[:1000])
+
+        image_description = text or "Суреттен мәтін табылмады."
+        language_instruction = get_language_instruction(lang_code)
+        query_for_ai = (
+            f"{language_instruction} "
+            f"{intro}: '{image_description}'.\n\n"
+            "Осы мәтінге сүйеніп, өнімнің халал статусы туралы толық жауап бер."
+        )
+        if registry_context:
+            query_for_ai += f"\n\n{registry_context}"
+        return PreparedQuery(
+            " ".join(recognized) or None, query_for_ai, f"Image Query: {image_description[:100]}...",
+            cache_key=photo_cache.answer_key(text) if text else None,
+            direct_answer=certificates.registry_answer(matches, text, lang_code)
+        )
+
+    def waiting_text(self, lang_code: str) -> str:
+        return get_text('photo_analyzed_prompt', lang_code)
+
+
+async def check_user_limits(user, request_type: str, lang_code: str) -> str | None:
+    """Қолданушының лимиттерін тексереді және қажет болса жаңартады."""
+    can_proceed, limit = await quota.consume(user.id, request_type)
+
+    if not can_proceed:
+        key = 'limit_reached_text' if request_type == 'text' else 'limit_reached_photo'
+        limit_message = get_text(key, lang_code).format(limit=limit)
+        return limit_message + "\n" + get_text('limit_reset_info', lang_code)
+
+    return None
+
+
+async def handle_request(update, source):
+    """Мәтін не сурет сұрағын (source — TextInput/PhotoInput) толық конвейер арқылы өңдейді."""
+    user = update.effective_user
+    timings = StageTimings()
+    lang_code = await get_user_language(user.id)
+
+    with timings.stage('limit_check'):
+        limit_error = await check_user_limits(user, source.request_type, lang_code)
+    if limit_error:
+        await update.message.reply_text(limit_error)
+        return
+
+    keyboard = [[InlineKeyboardButton("👍", callback_data='like'), InlineKeyboardButton("👎", callback_data='dislike')]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply = Reply(update.message)
+
+    try:
+        prepared = await source.prepare(update, lang_code, reply, timings)
+
+        # Белгілі E-код/компонент туралы сұрақтарға жергілікті базадан бірден жауап береміз
+        if prepared.lookup_text:
+            with timings.stage('local_answer'):
+                verdict = local_verdict(prepared.lookup_text, lang_code)
+            if verdict:
+                metrics.increment('ingredient_fast_path')
+                await reply.final(verdict, reply_markup)
+                await set_last_q_and_a(user.id, prepared.question_for_log, verdict)
+                return
+
+        if prepared.direct_answer:
+            metrics.increment('registry_fast_path')
+            await reply.final(prepared.direct_answer, reply_markup)
+            await set_last_q_and_a(user.id, prepared.question_for_log, prepared.direct_answer)
+            return
+
+        # Бұрын қойылған сұрақ (не бұрын жіберілген сурет) болса, ассистентке жүгінбей кэштен жауап береміз
+        kb_version = None
+        if prepared.cache_key:
+            with timings.stage('answer_cache'):
+                cached_answer = await answer_cache.get(prepared.cache_key, lang_code)
+            if cached_answer:
+                metrics.increment(f'answer_cache_hit_{source.request_type}')
+                await reply.final(cached_answer, reply_markup)
+                await set_last_q_and_a(user.id, prepared.question_for_log, cached_answer)
+                return
+            kb_version = await answer_cache.get_kb_version()
+
+        waiting_message = await reply.wait(source.waiting_text(lang_code))
+        answer = await run_queue.submit(
+            user.id, waiting_message, prepared.query_for_ai, prepared.question_for_log, reply_markup,
+            merged_text=get_text('request_merged', lang_code), timings=timings
+        )
+        # Алдыңғы сұхбатқа сілтейтін сұрақтарды answer_cache.is_cacheable() өзі өткізеді,
+        # сондықтан өзіндік сұрақтың жауабы thread-тің ұзындығына қарамай сақталады
+        if answer and kb_version is not None:
+            await answer_cache.put(prepared.cache_key, lang_code, answer, kb_version)
+
+    except Exception as e:
+        logger.error(f"{source.error_log} (User ID: {user.id}): {e}", exc_info=True)
+        await update.message.reply_text(source.error_text)
+    finally:
+        timings.finish(user.id, source.request_type)
@@ -0,0 +1,29 @@
+# bot/quota.py
+"""Қолданушы деңгейіне (free/premium/admin) қарай күнделікті лимиттерді басқарады."""
+from bot.config import ADMIN_USER_IDS, QUOTA_TIERS
+from bot.repository import is_user_premium, check_and_increment_usage
+
+
+async def get_user_tier(user_id: int) -> str:
+    """Қолданушының лимит деңгейін анықтайды."""
+    if user_id in ADMIN_USER_IDS:
+        return 'admin'
+    if await is_user_premium(user_id):
+        return 'premium'
+    return 'free'
+
+
+def get_limit(tier: str, request_type: str) -> int | None:
+    """Деңгей мен сұраныс түріне сәйкес күнделікті лимитті қайтарады (None — шектеусіз)."""
+    return QUOTA_TIERS.get(tier, QUOTA_TIERS['free']).get(request_type)
+
+
+async def consume(user_id: int, request_type: str) -> tuple[bool, int | None]:
+    """Бір сұранысты лимиттен атомарлы түрде шегереді.
+
+    (рұқсат етілді ме, қолданылған лимит) жұбын қайтарады.
+    """
+    limit = get_limit(await get_user_tier(user_id), request_type)
+    if limit is None:
+        return True, None
+    return await check_and_increment_usage(user_id, request_type, limit), limit
@@ -0,0 +1,155 @@
+# bot/repository.py
+"""bot.database функцияларының асинхронды (await етілетін) нұсқалары.
+
+SQLite шақырулары event loop-та емес, бөлек ағындарда орындалады:
+оқу сұраныстары шағын пулға, ал жазу сұраныстары жалғыз жазушы ағынға
+жіберіледі. Сөйтіп бір қолданушының дискідегі fsync-і басқа жаңартуларды
+өңдеуді тоқтатпайды, ал жазулар бір-біріне кедергі келтірмейді.
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bot import database
+from bot.journal import WriteBehindJournal
+
+DB_READ_THREADS = int(os.getenv("DB_READ_THREADS", 4))
+
+_read_executor = ThreadPoolExecutor(max_workers=DB_READ_THREADS, thread_name_prefix="db-read")
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+
+async def run_read(func, *args, **kwargs):
+    """Синхронды оқу функциясын оқу пулында орындайды."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_write(func, *args, **kwargs):
+    """Синхронды жазу функциясын жалғыз жазушы ағында орындайды."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_write_executor, functools.partial(func, *args, **kwargs))
+
+
+def _reader(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_read(func, *args, **kwargs)
+    return wrapper
+
+
+def _writer(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_write(func, *args, **kwargs)
+    return wrapper
+
+
+# --- Оқу ---
+get_user_language = _reader(database.get_user_language)
+is_user_premium = _reader(database.is_user_premium)
+get_user_usage = _reader(database.get_user_usage)
+get_user_count = _reader(database.get_user_count)
+get_all_user_ids = _reader(database.get_all_user_ids)
+get_expiring_premium_user_ids = _reader(database.get_expiring_premium_user_ids)
+get_broadcast_job = _reader(database.get_broadcast_job)
+get_unfinished_broadcast_jobs = _reader(database.get_unfinished_broadcast_jobs)
+get_feedback_stats = _reader(database.get_feedback_stats)
+get_feedback_daily = _reader(database.get_feedback_daily)
+get_suspicious_products = _reader(database.get_suspicious_products)
+
+# --- Жазу ---
+add_or_update_user = _writer(database.add_or_update_user)
+check_and_increment_usage = _writer(database.check_and_increment_usage)
+grant_premium_access = _writer(database.grant_premium_access)
+revoke_premium_access = _writer(database.revoke_premium_access)
+update_user_language = _writer(database.update_user_language)
+reset_user_limits = _writer(database.reset_user_limits)
+increment_request_count = _writer(database.increment_request_count)
+create_broadcast_job = _writer(database.create_broadcast_job)
+set_broadcast_progress_message = _writer(database.set_broadcast_progress_message)
+save_broadcast_page = _writer(database.save_broadcast_page)
+finish_broadcast_job = _writer(database.finish_broadcast_job)
+import_feedback_csv = _writer(database.import_feedback_csv)
+import_suspicious_csv = _writer(database.import_suspicious_csv)
+
+
+# --- Кешіктірілген жазулар ---
+# Жауаптан кейінгі есеп жазулары пайдаланушыға жауап жіберуді күтпейді:
+# олар журналға түседі де, топтап бір транзакциямен жазылады.
+journal = WriteBehindJournal(lambda ops: run_write(database.apply_write_batch, ops))
+
+
+def _put_thread_state(user_id: int, thread_id: str | None, started_at: float | None, turns: int):
+    # Thread күйі толық мәнмен жазылады: бір кілтпен біріктірілгенде ретке тәуелді болмайды
+    database.update_cached_profile(user_id, openai_thread_id=thread_id, thread_started_at=started_at, thread_turns=turns)
+    journal.put("thread_id", (user_id, thread_id, started_at, turns), key=("thread_id", user_id))
+
+
+async def set_thread_id(user_id: int, thread_id: str | None):
+    """Қолданушының thread_id-ын журнал арқылы сақтайды; кэш бірден жаңарады."""
+    _put_thread_state(user_id, thread_id, time.time() if thread_id else None, 0)
+
+
+async def get_thread_state(user_id: int) -> tuple[str | None, float | None, int]:
+    """(thread_id, басталған уақыты, run саны) — журналдағы жазылмаған мәнді ескеріп."""
+    pending = journal.lookup(("thread_id", user_id), None)
+    if pending is not None:
+        return pending[1], pending[2], pending[3]
+    return await run_read(database.get_thread_state, user_id)
+
+
+async def get_thread_id(user_id: int) -> str | None:
+    """Қолданушының thread_id-ын қайтарады (журналдағы жазылмаған мәнді ескеріп)."""
+    return (await get_thread_state(user_id))[0]
+
+
+async def record_thread_turn(user_id: int, thread_id: str):
+    """Thread-те тағы бір run аяқталғанын белгілейді (thread ауыспаған болса)."""
+    current_id, started_at, turns = await get_thread_state(user_id)
+    if current_id == thread_id:
+        _put_thread_state(user_id, thread_id, started_at, turns + 1)
+
+
+async def set_last_q_and_a(user_id: int, question: str, answer: str):
+    """Соңғы сұрақ-жауапты журнал арқылы сақтайды."""
+    journal.put("last_qa", (user_id, question, answer, datetime.now().isoformat()), key=("last_qa", user_id))
+
+
+async def get_last_q_and_a(user_id: int) -> tuple[str, str]:
+    """Соңғы сұрақ-жауапты қайтарады (журналдағы жазылмаған мәнді ескеріп)."""
+    pending = journal.lookup(("last_qa", user_id), None)
+    if pending is not None:
+        return pending[1], pending[2]
+    return await run_read(database.get_last_q_and_a, user_id)
+
+
+async def add_feedback(user_id: int, question: str, answer: str, vote: str):
+    """Пікірді журнал арқылы сақтайды."""
+    journal.put("feedback", (user_id, question, answer, vote, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+async def log_suspicious_product(user_id: int, description: str, image_path: str | None = None):
+    """Күдікті өнімді журнал арқылы сақтайды."""
+    journal.put("suspicious", (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id, description, image_path))
+
+
+async def iter_user_ids(page_size: int = database.USER_PAGE_SIZE, **filters):
+    """database.iter_user_ids-тің асинхронды нұсқасы: әр бет оқу пулында алынады."""
+    after_user_id = 0
+    while True:
+        page = await run_read(database.get_user_id_page, after_user_id, page_size, **filters)
+        for user_id in page:
+            yield user_id
+        if len(page) < page_size:
+            return
+        after_user_id = page[-1]
+
+
+def shutdown():
+    """Кезектегі барлық шақыруларды аяқтап, ағындарды тоқтатады."""
+    _write_executor.shutdown(wait=True)
+    _read_executor.shutdown(wait=True)
@@ -0,0 +1,110 @@
+# bot/run_queue.py
+"""Бір қолданушының thread-інде бір уақытта тек бір run жүруін қамтамасыз ететін кезек.
+
+Run жүріп жатқанда келген хабарламалар кезекте жиналады да, run аяқталған соң
+бір хабарламаға біріктіріліп, келесі бір run-мен өңделеді. Сөйтіп белсенді
+run-ы бар thread-ке хабарлама қосу қатесі де, thread_id үшін жарыс та болмайды,
+ал қатарынан жіберілген хабарламалар бір API шақыруына айналады.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+
+from bot import metrics
+
+logger = logging.getLogger(__name__)
+
+RUN_COALESCE_MAX = int(os.getenv("RUN_COALESCE_MAX", 5))
+
+
+@dataclass
+class QueuedRequest:
+    waiting_message: object
+    query_for_ai: str
+    question_for_log: str
+    reply_markup: object
+    merged_text: str | None = None
+    timings: object = None
+    future: asyncio.Future | None = None
+
+
+class UserRunQueue:
+    """Қолданушылар бойынша run кезегі.
+
+    ``runner(user_id, waiting_message, query_for_ai, question_for_log, reply_markup, timings)``
+    бір run-ды орындап, жауапты (немесе None) қайтаратын корутина.
+    """
+
+    def __init__(self, runner, max_batch: int = RUN_COALESCE_MAX):
+        self._runner = runner
+        self.max_batch = max_batch
+        self._pending: dict[int, list[QueuedRequest]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        # Метрикалар
+        self.runs = 0
+        self.merged = 0
+
+    async def submit(self, user_id: int, waiting_message, query_for_ai: str, question_for_log: str, reply_markup,
+                     merged_text: str | None = None, timings=None) -> str | None:
+        """Сұрақты кезекке қойып, оған жауап берген run аяқталғанша күтеді.
+
+        Сұрақ келесісімен біріктірілсе, оның күту хабарламасы merged_text-ке ауысады.
+        timings (StageTimings) берілсе, run кезеңдерінің уақыты соған жазылады.
+        Сұрақ жеке өңделсе жауапты, басқа сұрақтармен біріктірілсе немесе қате болса None қайтарады.
+        """
+        request = QueuedRequest(
+            waiting_message, query_for_ai, question_for_log, reply_markup, merged_text, timings,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._pending.setdefault(user_id, []).append(request)
+        if user_id not in self._workers:
+            self._workers[user_id] = asyncio.create_task(self._drain(user_id))
+        return await asyncio.shield(request.future)
+
+    def is_busy(self, user_id: int) -> bool:
+        return user_id in self._workers
+
+    def stats(self) -> dict:
+        return {
+            "active_users": len(self._workers),
+            "queued": sum(len(requests) for requests in self._pending.values()),
+            "runs": self.runs,
+            "merged": self.merged,
+        }
+
+    async def _drain(self, user_id: int):
+        try:
+            while self._pending.get(user_id):
+                batch = self._pending[user_id][:self.max_batch]
+                del self._pending[user_id][:len(batch)]
+                await self._run_batch(user_id, batch)
+        finally:
+            self._pending.pop(user_id, None)
+            self._workers.pop(user_id, None)
+
+    async def _run_batch(self, user_id: int, batch: list[QueuedRequest]):
+        last = batch[-1]
+        if len(batch) > 1:
+            self.merged += len(batch) - 1
+            metrics.increment('coalesced_messages', len(batch) - 1)
+            for request in batch[:-1]:
+                if request.merged_text:
+                    try:
+                        await request.waiting_message.edit_text(request.merged_text)
+                    except Exception as e:
+                        logger.debug(f"Біріктірілген сұрақтың хабарламасын жаңарту мүмкін болмады: {e}")
+        query = "\n\n".join(request.query_for_ai for request in batch)
+        question = "\n".join(request.question_for_log for request in batch)
+        self.runs += 1
+        try:
+            answer = await self._runner(user_id, last.waiting_message, query, question, last.reply_markup, last.timings)
+        except Exception as e:
+            # Қатені әр сұрақтың өз хэндлері өңдейді
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(answer if len(batch) == 1 else None)
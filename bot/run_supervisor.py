@@ -0,0 +1,158 @@
+# bot/run_supervisor.py
+"""Барлық аяқталмаған Assistant run-дарын бір фондық тапсырмамен бақылау.
+
+Әр хэндлер өз циклінде ұйықтап, run күйін сұрап тұрудың орнына run-ды
+супервизорға тіркейді және future арқылы нәтижесін күтеді. Супервизор
+run-дарды бейімделгіш аралықпен сұрайды (алдымен жиі, кейін сиректеу),
+ал мерзімі өткен run-дарды ``runs.cancel`` арқылы тоқтатады.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+RUN_POLL_INITIAL_INTERVAL = float(os.getenv("RUN_POLL_INITIAL_INTERVAL", 0.5))
+RUN_POLL_MAX_INTERVAL = float(os.getenv("RUN_POLL_MAX_INTERVAL", 4.0))
+RUN_POLL_BACKOFF = float(os.getenv("RUN_POLL_BACKOFF", 1.5))
+RUN_TIMEOUT = float(os.getenv("RUN_TIMEOUT", 120))
+RUN_POLL_CONCURRENCY = int(os.getenv("RUN_POLL_CONCURRENCY", 20))
+
+PENDING_STATUSES = ('queued', 'in_progress')
+
+
+class RunTimeout(Exception):
+    """Run белгіленген мерзімде аяқталмады және тоқтатылды."""
+
+
+@dataclass
+class _TrackedRun:
+    thread_id: str
+    run_id: str
+    future: asyncio.Future
+    deadline: float
+    interval: float
+    next_poll: float = field(default=0.0)
+
+
+class RunSupervisor:
+    """Аяқталмаған run-дарды ортақ циклмен сұрайтын супервизор.
+
+    ``client_getter`` — AsyncOpenAI клиентін қайтаратын функция (тесттерде ауыстыру үшін).
+    """
+
+    def __init__(self, client_getter, initial_interval: float = RUN_POLL_INITIAL_INTERVAL,
+                 max_interval: float = RUN_POLL_MAX_INTERVAL, backoff: float = RUN_POLL_BACKOFF,
+                 timeout: float = RUN_TIMEOUT, concurrency: int = RUN_POLL_CONCURRENCY):
+        self._client_getter = client_getter
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._runs: dict[str, _TrackedRun] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Метрикалар
+        self.polls = 0
+        self.poll_errors = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    async def wait(self, run, timeout: float | None = None):
+        """Run-ды тіркеп, ол аяқталғанша күтеді және соңғы run объектісін қайтарады.
+
+        Мерзім өтсе, run тоқтатылады және RunTimeout көтеріледі.
+        """
+        if run.status not in PENDING_STATUSES:
+            return run
+        now = time.monotonic()
+        tracked = _TrackedRun(
+            thread_id=run.thread_id, run_id=run.id, future=asyncio.get_running_loop().create_future(),
+            deadline=now + (timeout or self.timeout), interval=self.initial_interval,
+            next_poll=now + self.initial_interval,
+        )
+        self._runs[run.id] = tracked
+        self._ensure_running()
+        self._wakeup.set()
+        try:
+            return await tracked.future
+        finally:
+            self._runs.pop(run.id, None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._runs),
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+
+    async def stop(self):
+        """Фондық циклді тоқтатады; күтіп тұрған хэндлерлер CancelledError алады."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for tracked in self._runs.values():
+            if not tracked.future.done():
+                tracked.future.cancel()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def _loop(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while self._runs:
+            now = time.monotonic()
+            due = [tracked for tracked in self._runs.values() if min(tracked.next_poll, tracked.deadline) <= now]
+            if due:
+                await asyncio.gather(*(self._check(tracked, semaphore) for tracked in due))
+                continue
+            soonest = min(min(tracked.next_poll, tracked.deadline) for tracked in self._runs.values())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, soonest - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check(self, tracked: _TrackedRun, semaphore: asyncio.Semaphore):
+        if tracked.future.done():
+            self._runs.pop(tracked.run_id, None)
+            return
+        client = self._client_getter()
+        if time.monotonic() >= tracked.deadline:
+            await self._expire(client, tracked)
+            return
+        async with semaphore:
+            try:
+                self.polls += 1
+                run = await client.beta.threads.runs.retrieve(thread_id=tracked.thread_id, run_id=tracked.run_id)
+            except Exception as e:
+                # Уақытша желі қатесі: мерзім біткенше қайта сұраймыз
+                self.poll_errors += 1
+                run = None
+                logger.warning(f"Run {tracked.run_id} күйін алу мүмкін болмады: {e}")
+        if run is not None and run.status not in PENDING_STATUSES:
+            self.completed += 1
+            self._runs.pop(tracked.run_id, None)
+            if not tracked.future.done():
+                tracked.future.set_result(run)
+            return
+        tracked.interval = min(self.max_interval, tracked.interval * self.backoff)
+        tracked.next_poll = time.monotonic() + tracked.interval
+
+    async def _expire(self, client, tracked: _TrackedRun):
+        self.timeouts += 1
+        self._runs.pop(tracked.run_id, None)
+        logger.warning(f"Run {tracked.run_id} мерзімінде аяқталмады, тоқтатылады.")
+        try:
+            await client.beta.threads.runs.cancel(thread_id=tracked.thread_id, run_id=tracked.run_id)
+        except Exception as e:
+            logger.error(f"Run {tracked.run_id} тоқтату мүмкін болмады: {e}")
+        if not tracked.future.done():
+            tracked.future.set_exception(RunTimeout(tracked.run_id))
@@ -0,0 +1,63 @@
+# bot/thread_policy.py
+"""OpenAI thread-терінің өмірлік циклі.
+
+Thread ұзарған сайын әр run-ның кешігуі мен token құны өседі, сондықтан
+run саны (THREAD_MAX_TURNS) немесе жасы (THREAD_MAX_AGE_HOURS) шектен
+асқан thread жаңасымен ауыстырылады. Қаласаңыз, жаңа thread-тің бірінші
+сұрағына алдыңғы сұхбаттың қысқаша мазмұны (соңғы сұрақ-жауап) қосылады.
+"""
+import os
+import time
+
+from bot import metrics
+from bot.repository import get_last_q_and_a, get_thread_state
+
+THREAD_MAX_TURNS = int(os.getenv("THREAD_MAX_TURNS", 20))
+THREAD_MAX_AGE_HOURS = float(os.getenv("THREAD_MAX_AGE_HOURS", 72))
+THREAD_CARRY_SUMMARY = os.getenv("THREAD_CARRY_SUMMARY", "true").lower() in ("1", "true", "yes")
+THREAD_SUMMARY_CHARS = int(os.getenv("THREAD_SUMMARY_CHARS", 400))
+# Осы run санына дейінгі thread "жаңа" болып саналады (кешігуді салыстыру үшін)
+THREAD_FRESH_TURNS = int(os.getenv("THREAD_FRESH_TURNS", 5))
+
+_NO_LAST_QA = ("Сұрақ табылмады", "Жауап табылмады")
+
+
+def should_rotate(started_at: float | None, turns: int, now: float | None = None) -> bool:
+    """Thread ауыстыруды қажет ете ме: run саны не жасы шектен асты ма."""
+    if turns >= THREAD_MAX_TURNS:
+        return True
+    # Жасы белгісіз (көші-қонға дейінгі) thread-ті де ауыстырамыз
+    if started_at is None:
+        return True
+    return (now or time.time()) - started_at >= THREAD_MAX_AGE_HOURS * 3600
+
+
+def latency_metric(turns: int) -> str:
+    """Run кешігуі жазылатын метрика аты: жаңа және ұзын thread-тер бөлек өлшенеді."""
+    return "assistant_run_fresh_thread" if turns < THREAD_FRESH_TURNS else "assistant_run_long_thread"
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+async def build_summary(user_id: int) -> str | None:
+    """Жаңа thread-ке берілетін алдыңғы сұхбаттың қысқаша мазмұны."""
+    question, answer = await get_last_q_and_a(user_id)
+    if (question, answer) == _NO_LAST_QA:
+        return None
+    return (
+        "Алдыңғы сұхбаттың қысқаша мазмұны (контекст үшін): "
+        f"соңғы сұрақ — «{_truncate(question, THREAD_SUMMARY_CHARS // 2)}», "
+        f"жауап — «{_truncate(answer, THREAD_SUMMARY_CHARS)}»."
+    )
+
+
+async def prepare_thread(user_id: int) -> tuple[str | None, int, str | None]:
+    """Run үшін thread-ті таңдайды: (thread_id немесе None, run саны, жаңа thread-ке қосылатын мазмұн)."""
+    thread_id, started_at, turns = await get_thread_state(user_id)
+    if thread_id is None or not should_rotate(started_at, turns):
+        return thread_id, turns, None
+    metrics.increment("thread_rotations")
+    summary = await build_summary(user_id) if THREAD_CARRY_SUMMARY else None
+    return None, 0, summary
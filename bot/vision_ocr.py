@@ -0,0 +1,112 @@
+# bot/vision_ocr.py
+"""Google Vision OCR-ды event loop-ты бөгемей, топтап орындау.
+
+Бір уақытта келген суреттер VISION_BATCH_WAIT_MS ішінде (немесе топ
+VISION_BATCH_MAX-қа толғанша) жиналып, бір batch_annotate_images
+шақыруымен асинхронды клиент арқылы жіберіледі. Vision клиенті бірінші
+сурет келгенде ғана жасалады, сондықтан тестілерде оны жергілікті
+жалған клиентпен (fake_vision.py) алмастыруға болады.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from google.cloud import vision
+
+from bot import metrics
+
+logger = logging.getLogger(__name__)
+
+# Vision синхронды batch сұранысына ең көбі 16 сурет қабылдайды
+VISION_BATCH_MAX = int(os.getenv("VISION_BATCH_MAX", 16))
+VISION_BATCH_WAIT_MS = float(os.getenv("VISION_BATCH_WAIT_MS", 25))
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", 4))
+VISION_TIMEOUT = float(os.getenv("VISION_TIMEOUT", 30))
+
+_TEXT_DETECTION = [vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+
+
+class VisionBatcher:
+    """OCR сұраныстарын қысқа терезе ішінде жинап, топпен жіберетін кезек.
+
+    ``client_factory()`` batch_annotate_images корутинасы бар клиентті қайтарады.
+    """
+
+    def __init__(self, client_factory=None, max_batch: int = VISION_BATCH_MAX, max_wait_ms: float = VISION_BATCH_WAIT_MS,
+                 max_concurrency: int = VISION_MAX_CONCURRENCY):
+        self._client_factory = client_factory or vision.ImageAnnotatorAsyncClient
+        self._client = None
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending: list[tuple[bytes, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        # Метрикалар
+        self.images = 0
+        self.batches = 0
+        self.errors = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    async def text_detection(self, content: bytes):
+        """Суреттегі мәтінді анықтайды; AnnotateImageResponse қайтарады."""
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((content, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        try:
+            return await future
+        finally:
+            metrics.observe('vision_ocr', time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "images": self.images,
+            "batches": self.batches,
+            "avg_batch": self.images / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+            "errors": self.errors,
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.create_task(self._annotate(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _annotate(self, batch: list[tuple[bytes, asyncio.Future]]):
+        requests = [vision.AnnotateImageRequest(image=vision.Image(content=content), features=_TEXT_DETECTION)
+                    for content, _ in batch]
+        self.batches += 1
+        self.images += len(batch)
+        try:
+            async with self._semaphore:
+                start = time.perf_counter()
+                response = await self.client.batch_annotate_images(requests=requests, timeout=VISION_TIMEOUT)
+                metrics.observe('vision_batch_rpc', time.perf_counter() - start)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Google Vision batch сұранысының қатесі ({len(batch)} сурет): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, response.responses):
+            if not future.done():
+                future.set_result(result)
+
+
+ocr = VisionBatcher()
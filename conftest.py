@@ -0,0 +1,14 @@
+# conftest.py
+import pytest
+
+from bot import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Әр тестке бөлек, таза SQLite дерекқоры."""
+    database.close_connections()
+    database.DB_FILE = str(tmp_path / "test.db")
+    database.init_db()
+    yield database
+    database.close_connections()
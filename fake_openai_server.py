@@ -0,0 +1,160 @@
+# fake_openai_server.py
+"""Assistants API-ның офлайн тестілеуге арналған жергілікті жалған сервері.
+
+Тек бот қолданатын эндпоинттерді қайталайды: thread жасау, хабарлама қосу,
+run іске қосу (stream=True болса SSE оқиғаларымен), run күйін және соңғы
+хабарламаны алу. Жауап мәтіні ``reply`` параметрінен бөліктерге бөлініп,
+``chunk_delay`` аралықпен жіберіледі.
+
+Іске қосу: python fake_openai_server.py [порт]
+Клиент: AsyncOpenAI(api_key="test", base_url="http://127.0.0.1:<порт>/v1")
+"""
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+DEFAULT_REPLY = "E120 (кармин) жәндіктерден алынады, сондықтан халал емес【4:0†source】."
+
+
+class FakeOpenAIServer:
+    def __init__(self, reply: str = DEFAULT_REPLY, chunk_size: int = 8, chunk_delay: float = 0.01,
+                 first_token_delay: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.first_token_delay = first_token_delay
+        self.host = host
+        self.port = port
+        self.requests: list[tuple[str, str, dict]] = []
+        self._ids = itertools.count(1)
+        self._server: asyncio.base_events.Server | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # --- HTTP ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode()
+            if not request_line:
+                return
+            method, path, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+            body_bytes = await reader.readexactly(int(headers.get("content-length", 0)))
+            body = json.loads(body_bytes) if body_bytes else {}
+            path = path.split("?", 1)[0]
+            self.requests.append((method, path, body))
+            await self._route(method, path, body, writer)
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: dict, writer: asyncio.StreamWriter):
+        parts = path.strip("/").split("/")[1:]  # "v1"-ді алып тастаймыз
+        if method == "POST" and parts == ["threads", "runs"]:
+            thread_id = f"thread_{next(self._ids)}"
+            await self._run(thread_id, body, writer, new_thread=True)
+        elif method == "POST" and len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+            await self._json(writer, self._message(parts[1], body.get("content", "")))
+        elif method == "POST" and len(parts) == 3 and parts[0] == "threads" and parts[2] == "runs":
+            await self._run(parts[1], body, writer)
+        elif method == "POST" and len(parts) == 5 and parts[2] == "runs" and parts[4] == "cancel":
+            await self._json(writer, self._run_object(parts[1], parts[3], "cancelled"))
+        elif method == "GET" and len(parts) == 4 and parts[2] == "runs":
+            await self._json(writer, self._run_object(parts[1], parts[3], "completed"))
+        elif method == "GET" and len(parts) == 3 and parts[2] == "messages":
+            message = self._message(parts[1], self.reply, role="assistant")
+            await self._json(writer, {"object": "list", "data": [message], "has_more": False})
+        else:
+            await self._json(writer, {"error": {"message": f"not found: {method} {path}"}}, status="404 Not Found")
+
+    async def _json(self, writer, payload: dict, status: str = "200 OK"):
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    async def _run(self, thread_id: str, body: dict, writer, new_thread: bool = False):
+        run_id = f"run_{next(self._ids)}"
+        if not body.get("stream"):
+            await self._json(writer, self._run_object(thread_id, run_id, "queued"))
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        if new_thread:
+            await self._event(writer, "thread.created", {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+        await self._event(writer, "thread.run.created", self._run_object(thread_id, run_id, "queued"))
+        await self._event(writer, "thread.run.in_progress", self._run_object(thread_id, run_id, "in_progress"))
+        message_id = f"msg_{next(self._ids)}"
+        await asyncio.sleep(self.first_token_delay)
+        for start in range(0, len(self.reply), self.chunk_size):
+            chunk = self.reply[start:start + self.chunk_size]
+            await self._event(writer, "thread.message.delta", {
+                "id": message_id, "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": chunk, "annotations": []}}]},
+            })
+            await asyncio.sleep(self.chunk_delay)
+        await self._event(writer, "thread.message.completed", self._message(thread_id, self.reply, role="assistant", message_id=message_id))
+        await self._event(writer, "thread.run.completed", self._run_object(thread_id, run_id, "completed"))
+        writer.write(b"event: done\ndata: [DONE]\n\n")
+        await writer.drain()
+
+    async def _event(self, writer, event: str, data: dict):
+        writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        await writer.drain()
+
+    # --- Объектілер ---
+
+    @staticmethod
+    def _run_object(thread_id: str, run_id: str, status: str) -> dict:
+        return {
+            "id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+            "assistant_id": "asst_fake", "status": status, "model": "fake", "instructions": "", "tools": [],
+            "metadata": {}, "last_error": None, "parallel_tool_calls": True,
+        }
+
+    def _message(self, thread_id: str, text: str, role: str = "user", message_id: str | None = None) -> dict:
+        return {
+            "id": message_id or f"msg_{next(self._ids)}", "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "status": "completed", "attachments": [], "metadata": {},
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        }
+
+
+async def _main(port: int):
+    async with FakeOpenAIServer(port=port) as server:
+        print(f"Жалған OpenAI сервері: {server.base_url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
@@ -0,0 +1,31 @@
+# fake_vision.py
+"""Google Vision-ның офлайн тестілеуге арналған жергілікті жалған клиенті.
+
+Тек бот қолданатын batch_annotate_images әдісін қайталайды: әр сурет
+байттары ``texts`` сөздігі бойынша мәтінге айналады (табылмаса — бос жауап).
+
+Қолдану: VisionBatcher(client_factory=lambda: FakeVisionClient({b"...": "мәтін"}))
+"""
+import asyncio
+
+from google.cloud import vision
+
+
+class FakeVisionClient:
+    def __init__(self, texts: dict[bytes, str] | None = None, delay: float = 0.0, error: Exception | None = None):
+        self.texts = texts or {}
+        self.delay = delay
+        self.error = error
+        self.batch_sizes: list[int] = []
+
+    async def batch_annotate_images(self, requests, timeout=None):
+        self.batch_sizes.append(len(requests))
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        responses = []
+        for request in requests:
+            text = self.texts.get(request.image.content)
+            annotations = [vision.EntityAnnotation(description=text)] if text else []
+            responses.append(vision.AnnotateImageResponse(text_annotations=annotations))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
@@ -18,9 +18,14 @@ from fastapi import FastAPI, Request
 
 # Конфигурацияны импорттау
 from bot import config
+from bot import repository
+from bot import broadcast
+from bot import kb_ingest
+from bot.establishments import store as establishments_store
+from bot.pipeline import client_openai, run_supervisor
 
 # Хэндлерлерді импорттау
-from bot.handlers.admin import button_handler, grant_premium, revoke_premium
+from bot.handlers.admin import button_handler, grant_premium, revoke_premium, export_users, suspicious_command
 from bot.handlers.common import error_handle, premium_info, handle_message, handle_photo, language_command, start
 from bot.handlers.conversations import (
     broadcast_conv_handler,
@@ -46,6 +51,7 @@ application = (
     .token(config.TELEGRAM_TOKEN)
     .updater(None)  # Updater-ді өшіреміз, себебі webhook қолданамыз
     .context_types(context_types)
+    .concurrent_updates(config.CONCURRENT_UPDATES)
     .build()
 )
 
@@ -57,6 +63,8 @@ application.add_handler(CommandHandler("language", language_command))
 # 2. Админ командалары
 application.add_handler(CommandHandler("grant_premium", grant_premium))
 application.add_handler(CommandHandler("revoke_premium", revoke_premium))
+application.add_handler(CommandHandler("export_users", export_users))
+application.add_handler(CommandHandler("suspicious", suspicious_command))
 
 # 3. Түймелерді өңдеу
 application.add_handler(CallbackQueryHandler(button_handler))
@@ -79,8 +87,25 @@ async def lifespan(app: FastAPI):
     await application.bot.set_webhook(url=f"{config.WEBHOOK_URL}/telegram")
     async with application:
         await application.start()
+        # Ескі CSV журналдары SQLite-қа көшіріледі (suspicious_products.csv өзгертілмейді, тек жаңа жолдары қосылады)
+        await repository.import_feedback_csv(config.FEEDBACK_FILE)
+        await repository.import_suspicious_csv(config.SUSPICIOUS_LOG_FILE)
+        await broadcast.resume_broadcasts(application.bot)
+        # Мекемелер базасы бір рет жүктеліп, файл өзгергенде қайта жүктеледі
+        await establishments_store.start()
+        repository.journal.start()
         yield
+        await broadcast.stop_broadcasts()
+        await kb_ingest.stop_ingestions()
+        await establishments_store.stop()
         await application.stop()
+        await run_supervisor.stop()
+        # Ортақ HTTP пулының keep-alive қосылымдарын жабамыз
+        await client_openai.close()
+        # Журналда қалған жазулар тоқтамас бұрын дерекқорға жазылады
+        await repository.journal.stop()
+    # Дерекқор ағындарын кезектегі жазулар аяқталғаннан кейін тоқтатамыз
+    repository.shutdown()
 
 # FastAPI экземплярын lifespan-мен құру
 app_fastapi = FastAPI(lifespan=lifespan)
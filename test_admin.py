@@ -0,0 +1,19 @@
+# test_admin.py
+import pytest
+
+from bot import metrics
+from bot.handlers import admin
+
+
+@pytest.mark.asyncio
+async def test_stats_text_has_balanced_markdown_entities(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    db.add_feedback(1, "сұрақ", "жауап", "like")
+    metrics.increment("answer_cache_hit_photo")
+
+    text = await admin.build_stats_text()
+
+    # Telegram-ның ескі Markdown-ы жабылмаған белгі болса, бүкіл хабарламаны қабылдамайды
+    for entity in ("*", "_", "`"):
+        assert text.count(entity) % 2 == 0, entity
+    assert "Суреттер кэші" in text and "Мекемелер базасы" in text
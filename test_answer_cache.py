@@ -0,0 +1,66 @@
+# test_answer_cache.py
+import pytest
+
+from bot import answer_cache
+
+
+@pytest.fixture
+def cache(db):
+    answer_cache._memory.invalidate()
+    yield answer_cache
+    answer_cache._memory.invalidate()
+
+
+def test_normalize_question_unifies_e_codes_and_punctuation():
+    assert answer_cache.normalize_question("  Е-120 ХАЛАЛ ма?? ") == "e120 халал ма"
+    assert answer_cache.make_key("E 120 халал ма", "kk") == answer_cache.make_key("е120 халал ма?", "kk")
+    assert answer_cache.make_key("E120", "kk") != answer_cache.make_key("E120", "ru")
+
+
+def test_context_dependent_follow_ups_are_not_cacheable():
+    for question in ("ал бұл ше?", "why?", "А это?", "Неге?", "Snickers?"):
+        assert not answer_cache.is_cacheable(question), question
+    for question in ("E471?", "Желатин халал ма?", "Можно ли есть Snickers", "а Е120 ше?"):
+        assert answer_cache.is_cacheable(question), question
+
+
+@pytest.mark.asyncio
+async def test_follow_up_questions_are_never_stored_or_served(cache):
+    version = await cache.get_kb_version()
+    await cache.put("ал бұл ше?", "kk", "Басқа қолданушының жауабы.", version)
+
+    assert cache.database.get_answer_cache_stats()["rows"] == 0
+    assert await cache.get("ал бұл ше?", "kk") is None
+
+
+@pytest.mark.asyncio
+async def test_answer_is_served_from_sqlite_after_memory_is_cleared(cache):
+    version = await cache.get_kb_version()
+    await cache.put("E120 халал ма?", "kk", "Жоқ, халал емес.", version)
+    cache._memory.invalidate()
+
+    assert await cache.get("е120 халал ма", "kk") == "Жоқ, халал емес."
+    assert await cache.get("е120 халал ма", "ru") is None
+
+
+@pytest.mark.asyncio
+async def test_knowledge_base_update_invalidates_answers(cache):
+    version = await cache.get_kb_version()
+    await cache.put("E471?", "kk", "Күмәнді.", version)
+
+    await cache.invalidate()
+    assert await cache.get("E471?", "kk") is None
+
+    # Жаңарту алдында басталған run-ның жауабы сақталмайды
+    await cache.put("E471?", "kk", "Күмәнді.", version)
+    assert await cache.get("E471?", "kk") is None
+    assert cache.database.get_answer_cache_stats()["rows"] == 0
+
+
+def test_old_rows_are_pruned(db):
+    version = db.get_kb_version()
+    for i in range(5):
+        db.put_cached_answer(f"k{i}", "kk", f"q{i}", f"a{i}", version, max_rows=3)
+    assert db.get_answer_cache_stats()["rows"] == 3
+    assert db.get_cached_answer("k0") is None
+    assert db.get_cached_answer("k4") == ("a4", version)
@@ -0,0 +1,65 @@
+# test_broadcast.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import Forbidden, RetryAfter
+
+from bot import broadcast
+
+
+class FakeBot:
+    def __init__(self, blocked=(), rate_limited=()):
+        self.blocked = set(blocked)
+        self.rate_limited = set(rate_limited)
+        self.delivered = []
+        self.edits = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.rate_limited:
+            self.rate_limited.discard(chat_id)
+            raise RetryAfter(0)
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        self.delivered.append(chat_id)
+        return SimpleNamespace(message_id=len(self.delivered))
+
+    async def edit_message_text(self, chat_id, message_id, text):
+        self.edits.append(text)
+
+
+@pytest.fixture(autouse=True)
+def fast_bucket(monkeypatch):
+    monkeypatch.setattr(broadcast, "_bucket", broadcast.TokenBucket(10_000))
+    monkeypatch.setattr(broadcast, "BROADCAST_PAGE_SIZE", 3)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_flags_blocked_users_and_retries(db):
+    for user_id in range(1, 9):
+        db.add_or_update_user(user_id, "Test", "test", "kk")
+    bot = FakeBot(blocked={2, 5}, rate_limited={3})
+
+    job_id = await broadcast.start_broadcast(bot, 100, "Сәлем")
+    await asyncio.gather(*broadcast._tasks.values())
+
+    job = db.get_broadcast_job(job_id)
+    assert job["status"] == "done"
+    assert (job["sent_count"], job["blocked_count"], job["failed_count"]) == (6, 2, 0)
+    assert sorted(chat_id for chat_id in bot.delivered if chat_id != 100) == [1, 3, 4, 6, 7, 8]
+    assert db.get_user_count(include_blocked=False) == 6
+    assert "аяқталды" in bot.edits[-1]
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_cursor(db):
+    for user_id in range(1, 8):
+        db.add_or_update_user(user_id, "Test", "test", "kk")
+    job_id = db.create_broadcast_job(100, "Сәлем", 7)
+    db.save_broadcast_page(job_id, 3, 3, 0, [])
+    bot = FakeBot()
+
+    await broadcast.resume_broadcasts(bot)
+    await asyncio.gather(*broadcast._tasks.values())
+
+    assert bot.delivered == [4, 5, 6, 7]
+    assert db.get_broadcast_job(job_id)["sent_count"] == 7
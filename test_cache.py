@@ -0,0 +1,52 @@
+# test_cache.py
+from bot.cache import LRUCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry_counts_as_miss():
+    timer = FakeTimer()
+    cache = LRUCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    timer.now = 6
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_stale_fill_is_discarded_after_write():
+    cache = LRUCache()
+    generation = cache.generation
+    cache.write_through("a", lambda value: value)
+    cache.set("a", "stale", generation=generation)
+    assert cache.peek("a") is None
+
+def test_profile_write_through(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    assert db.get_user_language(1) == "kk"
+    db.update_user_language(1, "ru")
+    db.set_thread_id(1, "thread_1")
+    db.grant_premium_access(1, 3)
+    hits_before = db.get_profile_cache_stats()["hits"]
+    assert db.get_user_language(1) == "ru"
+    assert db.get_thread_id(1) == "thread_1"
+    assert db.is_user_premium(1)
+    assert db.get_profile_cache_stats()["hits"] == hits_before + 3
+    db.revoke_premium_access(1)
+    assert not db.is_user_premium(1)
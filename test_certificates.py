@@ -0,0 +1,117 @@
+# test_certificates.py
+import json
+import os
+from datetime import date
+
+from bot import certificates, establishments
+
+TODAY = date(2025, 1, 15)
+
+
+def registry(*titles: str, sert_date: str = "2025-03-01") -> dict:
+    organizations = [
+        {"title": title, "category": {"title": "Ет өнімдері"}, "sert_date": sert_date}
+        for title in titles
+    ]
+    return {"data": {"organizations": organizations}}
+
+
+INDEX = certificates.CertificateIndex(registry(
+    'ТОО "Береке Агро"', "ЖШС Сүт Әлемі", "Кафе Халал", "Баракат", "ИП Нуржанов Ерлан",
+    *(f"ТОО Продукт Трейд {number}" for number in range(20)),
+))
+
+
+def test_exact_multi_word_title_is_confident():
+    matches = INDEX.match("Өндіруші: береке агро, Алматы. HALAL")
+
+    assert [match.title for match in matches] == ['ТОО "Береке Агро"']
+    assert matches[0].exact and matches[0].score == 1
+    assert matches[0].category == "Ет өнімдері"
+
+
+def test_ocr_typo_matches_but_is_not_confident():
+    matches = INDEX.match("Берекe Агро")  # латын "e" — OCR-дың әдеттегі қатесі
+    match = next(match for match in matches if match.title == 'ТОО "Береке Агро"')
+
+    assert match.score == 1
+    assert not match.exact
+
+
+def test_legal_forms_generic_and_common_words_are_ignored():
+    assert INDEX.match("ТОО ЖШС кафе халал") == []
+    # "продукт" жиі кездеседі, сондықтан жалғыз өзі ешбір ұйымды таппайды
+    assert INDEX.match("продукт") == []
+
+
+def test_single_word_title_is_only_context():
+    matches = INDEX.match("Баракат халал")
+
+    assert matches[0].title == "Баракат"
+    assert not matches[0].exact
+    assert certificates.registry_answer(matches, "Баракат халал", today=TODAY) is None
+    assert "Баракат" in certificates.prompt_context(matches)
+
+
+def test_direct_answer_requires_halal_marker():
+    matches = INDEX.match("Нуржанов Ерлан шұжық")
+
+    assert certificates.registry_answer(matches, "Нуржанов Ерлан шұжық", today=TODAY) is None
+    answer = certificates.registry_answer(matches, "Нуржанов Ерлан шұжық ХАЛАЛ", "ru", today=TODAY)
+    assert "ИП Нуржанов Ерлан" in answer and "2025-03-01" in answer
+
+
+def test_negated_halal_word_is_not_a_marker():
+    assert certificates.has_halal_marker("Нуржанов Ерлан HALAL")
+    for text in ("Нуржанов Ерлан не халал", "halal emes", "Халал емес", "not halal", "халал жоқ"):
+        assert not certificates.has_halal_marker(text), text
+        assert certificates.registry_answer(INDEX.match(text + " Нуржанов Ерлан"), text, today=TODAY) is None
+
+
+def test_expired_or_unknown_certificate_is_only_context():
+    matches = INDEX.match("Нуржанов Ерлан халал")
+
+    assert certificates.registry_answer(matches, "Нуржанов Ерлан халал", today=date(2025, 3, 2)) is None
+    assert certificates.is_valid_certificate("01.03.2025", today=TODAY)
+    assert not certificates.is_valid_certificate("Белгісіз", today=TODAY)
+    assert not certificates.is_valid_certificate(None, today=TODAY)
+
+
+def test_prompt_context_is_json():
+    context = certificates.prompt_context(INDEX.match("Сүт әлемі айран"))
+    records = json.loads(context.split("(JSON): ", 1)[1].rsplit(". ", 1)[0])
+
+    assert records[0]["title"] == "ЖШС Сүт Әлемі"
+    assert certificates.prompt_context([]) is None
+
+
+def test_index_follows_establishment_store_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(certificates, "_index", None)
+    path = tmp_path / "qmdb.json"
+    store = establishments.EstablishmentStore(str(path))
+    store.add_listener(certificates.rebuild_index)
+
+    assert not store.reload()
+    assert certificates.match_registry("береке агро") == []
+
+    path.write_text(json.dumps(registry("Береке Агро")), encoding="utf-8")
+    assert store.reload()
+    assert certificates.match_registry("береке агро")[0].exact
+
+    path.write_text(json.dumps(registry("Сүт Әлемі", "Нуржанов Ерлан")), encoding="utf-8")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert store.reload()
+    assert certificates.match_registry("береке агро") == []
+    assert certificates.match_registry("сүт әлемі")[0].title == "Сүт Әлемі"
+
+
+def test_halal_marked_label_without_valid_certificate_is_suspicious(monkeypatch):
+    monkeypatch.setattr(certificates, "_index", INDEX)
+
+    assert certificates.is_suspicious([], "Белгісіз Өндіруші HALAL", today=TODAY)
+    assert certificates.is_suspicious(INDEX.match("Нуржанов Ерлан"), "Нуржанов Ерлан halal", today=date(2026, 1, 1))
+    assert not certificates.is_suspicious(INDEX.match("Нуржанов Ерлан"), "Нуржанов Ерлан halal", today=TODAY)
+    assert not certificates.is_suspicious([], "Белгісіз Өндіруші", today=TODAY)
+
+    monkeypatch.setattr(certificates, "_index", None)
+    assert not certificates.is_suspicious([], "Белгісіз Өндіруші HALAL", today=TODAY)
@@ -0,0 +1,108 @@
+# test_database.py
+import sqlite3
+
+from bot import database
+
+
+def test_fresh_database_is_at_latest_version(db):
+    version = db.get_connection().execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(db.MIGRATIONS)
+
+def test_legacy_database_is_migrated(tmp_path):
+    legacy_file = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(legacy_file)
+    conn.execute("""CREATE TABLE users (user_id INTEGER PRIMARY KEY, full_name TEXT, username TEXT,
+                    language_code TEXT, is_premium INTEGER DEFAULT 0, subscription_end_date TEXT,
+                    created_at TEXT NOT NULL, text_requests_count INTEGER DEFAULT 0,
+                    photo_requests_count INTEGER DEFAULT 0, last_request_date TEXT,
+                    last_question TEXT, last_answer TEXT)""")
+    conn.execute("""INSERT INTO users VALUES (7, 'A', 'a', 'ru', 0, NULL, '2024-01-01',
+                    2, 1, '2024-01-01', 'сұрақ', 'жауап')""")
+    conn.commit()
+    conn.close()
+
+    database.close_connections()
+    database.DB_FILE = legacy_file
+    try:
+        database.init_db()
+        assert database.get_thread_id(7) is None
+        assert database.get_user_usage(7) == (2, 1, '2024-01-01')
+        assert database.get_last_q_and_a(7) == ('сұрақ', 'жауап')
+    finally:
+        database.close_connections()
+
+def test_expiring_premium_uses_index(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    db.add_or_update_user(2, "Test", "test", "kk")
+    db.grant_premium_access(1, 2)
+    db.grant_premium_access(2, 30)
+    assert db.get_expiring_premium_user_ids(7) == [1]
+    plan = db.get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT user_id FROM users WHERE subscription_end_date > '2000' AND subscription_end_date <= '2001'"
+    ).fetchall()
+    assert "idx_users_subscription_end_date" in str(plan)
+
+def test_last_q_and_a_roundtrip(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    db.set_last_q_and_a(1, "q1", "a1")
+    db.set_last_q_and_a(1, "q2", "a2")
+    assert db.get_last_q_and_a(1) == ("q2", "a2")
+
+def test_iter_user_ids_pages_with_filters(db):
+    for user_id in range(1, 26):
+        db.add_or_update_user(user_id, "Test", "test", "ru" if user_id % 2 else "kk")
+    db.grant_premium_access(3, 10)
+    db.check_and_increment_usage(4, 'text', 5)
+    assert list(db.iter_user_ids(page_size=4)) == list(range(1, 26))
+    assert list(db.iter_user_ids(page_size=4, language="kk")) == list(range(2, 26, 2))
+    assert list(db.iter_user_ids(page_size=4, premium=True)) == [3]
+    assert list(db.iter_user_ids(page_size=4, active_since="2000-01-01")) == [4]
+
+def test_feedback_counters_and_csv_import(db, tmp_path):
+    csv_path = tmp_path / "feedback.csv"
+    csv_path.write_text(
+        "timestamp,user_id,question,bot_answer,vote\n"
+        "2025-01-01 10:00:00,1,q,\"көп\nжолды\",like\n"
+        "2025-01-02 11:00:00,2,q,a,dislike\n",
+        encoding="utf-8"
+    )
+    assert db.import_feedback_csv(str(csv_path)) == 2
+    assert not csv_path.exists()
+    assert db.import_feedback_csv(str(csv_path)) == 0
+
+    db.add_feedback(3, "q", "a", "like")
+    assert db.get_feedback_stats() == {"total": 3, "like": 2, "dislike": 1}
+    daily = db.get_feedback_daily(7)
+    assert daily[-2:] == [("2025-01-02", 0, 1), ("2025-01-01", 1, 0)]
+
+def test_suspicious_log_import_and_reverse_paging(db, tmp_path):
+    csv_path = tmp_path / "suspicious_products.csv"
+    csv_path.write_text(
+        "timestamp,user_id,claude_description,image_path\n"
+        "2025-09-16 10:04:18,1,\"HALAL_LOGO_DETECTED\n\nкөп жолды\",suspicious_images/a.jpg\n"
+        "2025-09-17 08:24:21,2,suspicious_images/b.jpg\n",
+        encoding="utf-8"
+    )
+    assert db.import_suspicious_csv(str(csv_path)) == 2
+    # Файл орнында қалады, қайта іске қосқанда жолдар қайталанбайды
+    assert csv_path.exists() and db.import_suspicious_csv(str(csv_path)) == 0
+    for i in range(4):
+        db.log_suspicious_product(1, f"сипаттама {i}")
+    db.apply_write_batch([("suspicious", ("2025-09-18 09:00:00", 1, "сипаттама 4", None))])
+
+    first_page = db.get_suspicious_products(limit=3)
+    assert [row["description"] for row in first_page] == ["сипаттама 4", "сипаттама 3", "сипаттама 2"]
+    older = db.get_suspicious_products(limit=3, before_id=first_page[-1]["id"])
+    assert older[-1]["image_path"] == "suspicious_images/b.jpg" and older[-1]["description"] is None
+    assert [row["user_id"] for row in db.get_suspicious_products(limit=10, user_id=2)] == [2]
+    assert db.get_suspicious_products(limit=10, day="2025-09-16")[0]["description"].endswith("көп жолды")
+
+def test_suspicious_csv_rows_appended_later_are_imported(db, tmp_path):
+    csv_path = tmp_path / "suspicious_products.csv"
+    csv_path.write_text("timestamp,user_id,claude_description,image_path\n2025-09-16 10:00:00,1,a,\n", encoding="utf-8")
+    assert db.import_suspicious_csv(str(csv_path)) == 1
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("2025-09-17 10:00:00,2,b,\n")
+    assert db.import_suspicious_csv(str(csv_path)) == 1
+    assert [row["description"] for row in db.get_suspicious_products(limit=10)] == ["b", "a"]
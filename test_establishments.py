@@ -0,0 +1,138 @@
+# test_establishments.py
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from bot import establishments
+from bot.handlers import location_handler as handler_module
+
+ALMATY = (43.2383, 76.9454)
+
+
+def org(title, lat, lon, address="Абай даңғылы, 1"):
+    return {
+        "title": title,
+        "category": {"title": "Кафе"},
+        "sert_date": "2026-01-01",
+        "maplink": [{"link": f"https://2gis.kz/almaty?m={lon},{lat}/16", "address": address}],
+    }
+
+
+def write(path, organizations, mtime=None):
+    path.write_text(json.dumps({"data": {"organizations": organizations}}), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "qmdb.json"
+    write(path, [
+        org("Алыс", 51.1694, 71.4491),  # Астана
+        org("Жақын", 43.2390, 76.9460),
+        org("Ортаңғы", 43.2500, 76.9500),
+        {"title": "Сілтемесіз", "maplink": []},
+        {"title": "Координатасыз", "maplink": [{"link": "https://2gis.kz/almaty/firm/1"}]},
+    ], mtime=1_000_000_000)
+    return path
+
+
+def test_extract_coords_from_2gis_link():
+    assert establishments.extract_coords_from_2gis_link("https://2gis.kz/almaty?m=76.9,43.2/16") == (43.2, 76.9)
+    assert establishments.extract_coords_from_2gis_link("https://2gis.kz/almaty/firm/1") == (None, None)
+
+
+def test_nearest_sorts_by_distance_and_skips_far_or_unmapped(dataset):
+    store = establishments.EstablishmentStore(str(dataset))
+    store.reload()
+
+    nearest = store.nearest(*ALMATY)
+
+    assert [item.title for item, _ in nearest] == ["Жақын", "Ортаңғы"]
+    assert nearest[0][1] < nearest[1][1] < 100
+    assert nearest[0][0].address == "Абай даңғылы, 1"
+    assert store.nearest(*ALMATY, limit=1)[0][0].title == "Жақын"
+    assert store.stats()["establishments"] == 3
+
+
+def test_reload_swaps_snapshot_only_when_file_changes(dataset):
+    store = establishments.EstablishmentStore(str(dataset))
+    assert store.reload()
+    assert not store.reload()
+
+    write(dataset, [org("Жаңа", 43.2384, 76.9455)], mtime=2_000_000_000)
+    assert store.reload()
+    assert [item.title for item, _ in store.nearest(*ALMATY)] == ["Жаңа"]
+    assert store.reloads == 2
+
+
+def test_broken_update_keeps_previous_snapshot(dataset):
+    store = establishments.EstablishmentStore(str(dataset))
+    store.reload()
+
+    dataset.write_text("{not json", encoding="utf-8")
+    assert not store.reload()
+    assert store.nearest(*ALMATY)[0][0].title == "Жақын"
+    assert store.stats()["error"] is None
+
+
+def test_unavailable_store_reports_reason(tmp_path):
+    missing_store = establishments.EstablishmentStore(str(tmp_path / "missing.json"))
+    missing_store.reload()
+    with pytest.raises(establishments.StoreUnavailable) as missing:
+        missing_store.nearest(*ALMATY)
+    assert missing.value.reason == "missing"
+
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json", encoding="utf-8")
+    broken_store = establishments.EstablishmentStore(str(broken))
+    broken_store.reload()
+    with pytest.raises(establishments.StoreUnavailable) as invalid:
+        broken_store.nearest(*ALMATY)
+    assert invalid.value.reason == "invalid"
+
+
+def test_nearest_never_reads_the_file(dataset, monkeypatch):
+    store = establishments.EstablishmentStore(str(dataset))
+    monkeypatch.setattr(store, "reload", lambda: pytest.fail("nearest() must not reload"))
+
+    with pytest.raises(establishments.StoreUnavailable):
+        store.nearest(*ALMATY)
+
+
+class FakeMessage:
+    def __init__(self, latitude, longitude):
+        self.location = SimpleNamespace(latitude=latitude, longitude=longitude)
+        self.replies = []
+
+    async def reply_text(self, text, parse_mode=None):
+        self.replies.append((text, parse_mode))
+
+
+@pytest.mark.asyncio
+async def test_location_handler_replies_once_with_nearest(dataset, monkeypatch):
+    store = establishments.EstablishmentStore(str(dataset))
+    await store.start()
+    monkeypatch.setattr(handler_module, "store", store)
+    message = FakeMessage(*ALMATY)
+
+    try:
+        await handler_module.location_handler(SimpleNamespace(message=message), None)
+    finally:
+        await store.stop()
+
+    [(text, parse_mode)] = message.replies
+    assert parse_mode == "Markdown"
+    assert text.index("Жақын") < text.index("Ортаңғы") and "Алыс" not in text
+
+
+@pytest.mark.asyncio
+async def test_location_handler_reports_missing_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(handler_module, "store", establishments.EstablishmentStore(str(tmp_path / "missing.json")))
+    message = FakeMessage(*ALMATY)
+
+    await handler_module.location_handler(SimpleNamespace(message=message), None)
+
+    assert message.replies == [("Кешіріңіз, мекемелер базасы табылмады.", None)]
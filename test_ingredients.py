@@ -0,0 +1,50 @@
+# test_ingredients.py
+from bot.ingredients import AhoCorasick, IngredientIndex, local_verdict, normalize
+
+
+def test_normalize_unifies_e_code_spellings():
+    assert normalize("Е-120, е 160а; E500ii!") == "e120 e160a e500ii"
+
+
+def test_matcher_prefers_longest_whole_word_match():
+    matcher = AhoCorasick({"шошқа": "pork", "шошқа майы": "lard", "соль": "salt"})
+    text = normalize("фасоль, шошқа майы, соль")
+    assert [value for _, _, value in matcher.find(text)] == ["lard", "salt"]
+
+
+def test_verdict_for_known_terms():
+    assert "E120" in local_verdict("Е120 халал ма?", "kk")
+    assert local_verdict("E330 халал ма?", "ru").startswith("✅")
+    assert local_verdict("Состав: сахар, мука пшеничная, какао-порошок, желатин", "ru").startswith("⚠️")
+
+
+def test_unknown_terms_fall_back_to_assistant():
+    assert local_verdict("Что такое E999?", "ru") is None
+    assert local_verdict("Состав: сахар, ароматизатор", "ru") is None
+    assert local_verdict("Snickers халал ма?", "kk") is None
+
+
+def test_haram_verdict_lists_only_haram_terms():
+    verdict = local_verdict("Құрамы: қант, шошқа майы", "kk")
+    assert verdict.startswith("⛔️")
+    assert "шошқа майы" in verdict and "қант" not in verdict
+
+
+def test_negated_or_partly_unknown_questions_fall_back_to_assistant():
+    assert local_verdict("Құрамы: қант, бидай ұны, шошқа майы, ароматизатор", "kk") is None
+    for question in ("Құрамында шошқа жоқ па?", "no pork", "алкоголь жоқ", "Alcohol-free шампунь халал ма?",
+                     "0% alcohol", "Без свинины", "шошқа емес", "халал ветчина", "Бұл не желатин ме?"):
+        assert local_verdict(question, "kk") is None, question
+    for question in ("в составе не свинина", "это не желатин", "Е120 не содержит?"):
+        assert local_verdict(question, "ru") is None, question
+    # Қазақша "не" (сұрау) компоненттен кейін тұрса, жергілікті жауапқа кедергі емес
+    assert local_verdict("Е120 не?", "kk").startswith("⛔️")
+
+
+def test_index_from_custom_data():
+    index = IngredientIndex({
+        "fillers": ["ма"],
+        "ingredients": [{"id": "x", "status": "halal", "name": {"kk": "X", "ru": "X"}, "terms": ["икс"]}],
+    })
+    found, unknown = index.analyze("Икс ма?")
+    assert [item["id"] for item in found] == ["x"] and unknown == []
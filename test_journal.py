@@ -0,0 +1,81 @@
+# test_journal.py
+import pytest
+
+from bot import repository
+from bot.journal import WriteBehindJournal
+
+
+@pytest.mark.asyncio
+async def test_writes_are_coalesced_and_flushed_in_one_batch():
+    batches = []
+
+    async def flush_func(ops):
+        batches.append(ops)
+
+    journal = WriteBehindJournal(flush_func, max_batch=100)
+    journal.put("thread_id", (1, "a"), key=("thread_id", 1))
+    journal.put("thread_id", (1, "b"), key=("thread_id", 1))
+    journal.put("feedback", (1, "q", "a", "like", "ts"))
+    assert journal.lookup(("thread_id", 1)) == (1, "b")
+    assert journal.stats()["queue_depth"] == 2
+
+    await journal.flush()
+    assert batches == [[("thread_id", (1, "b")), ("feedback", (1, "q", "a", "like", "ts"))]]
+    assert journal.lookup(("thread_id", 1), None) is None
+    assert journal.stats()["flushed_ops"] == 2
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_requeued():
+    async def failing(ops):
+        raise RuntimeError("disk full")
+
+    journal = WriteBehindJournal(failing)
+    journal.put("last_qa", (1, "q", "a", "ts"), key=("last_qa", 1))
+    await journal.flush()
+    assert journal.stats()["failed_flushes"] == 1
+    assert journal.lookup(("last_qa", 1)) == (1, "q", "a", "ts")
+
+
+@pytest.mark.asyncio
+async def test_poison_op_is_dead_lettered_and_does_not_block_others():
+    written = []
+
+    async def flush_func(ops):
+        if any(name == "bad" for name, _ in ops):
+            raise RuntimeError("constraint failed")
+        written.extend(ops)
+
+    journal = WriteBehindJournal(flush_func, max_attempts=3)
+    journal.put("bad", (1,))
+    journal.put("feedback", (2,))
+    await journal.flush()
+    await journal.flush()
+    assert written == [] and journal.stats()["queue_depth"] == 2
+
+    journal.put("feedback", (3,))
+    await journal.flush()
+    assert written == [("feedback", (2,)), ("feedback", (3,))]
+    assert list(journal.dead_letters) == [("bad", (1,), "RuntimeError('constraint failed')")]
+    assert journal.stats()["queue_depth"] == 0
+    assert journal.stats()["dead_lettered"] == 1
+
+    # Кезек енді бос: кейінгі жазулар бірден жазылады
+    journal.put("feedback", (4,))
+    await journal.flush()
+    assert written[-1] == ("feedback", (4,))
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_see_pending_writes(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    await repository.set_thread_id(1, "thread_1")
+    await repository.set_last_q_and_a(1, "сұрақ", "жауап")
+    await repository.add_feedback(1, "сұрақ", "жауап", "like")
+    assert await repository.get_thread_id(1) == "thread_1"
+    assert await repository.get_last_q_and_a(1) == ("сұрақ", "жауап")
+
+    await repository.journal.stop()
+    db.close_connections()
+    assert db.get_thread_id(1) == "thread_1"
+    assert db.get_last_q_and_a(1) == ("сұрақ", "жауап")
+    assert db.get_feedback_stats()["like"] == 1
@@ -0,0 +1,124 @@
+# test_kb_ingest.py
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from bot import kb_ingest
+
+
+def counts(completed=0, in_progress=0, failed=0, total=0):
+    return SimpleNamespace(completed=completed, in_progress=in_progress, failed=failed, cancelled=0, total=total)
+
+
+class FakeClient:
+    """files.create және vector_stores.file_batches ғана бар OpenAI клиенті."""
+
+    def __init__(self, fail_names=(), index_failed=()):
+        self.uploads = []
+        self.batch_file_ids = None
+        self.polls = 0
+        self.fail_names = set(fail_names)
+        self.index_failed = list(index_failed)
+        self.files = SimpleNamespace(create=self._create_file)
+        self.vector_stores = SimpleNamespace(file_batches=SimpleNamespace(
+            create=self._create_batch, retrieve=self._retrieve_batch, list_files=self._list_files,
+        ))
+
+    async def _create_file(self, file, purpose):
+        name, handle = file
+        if name in self.fail_names:
+            raise RuntimeError("upload failed")
+        self.uploads.append((name, handle.read()))
+        return SimpleNamespace(id=f"file_{name}")
+
+    async def _create_batch(self, vector_store_id, file_ids):
+        self.batch_file_ids = file_ids
+        return SimpleNamespace(id="vsfb_1", status="in_progress", file_counts=counts(in_progress=len(file_ids), total=len(file_ids)))
+
+    async def _retrieve_batch(self, batch_id, vector_store_id):
+        self.polls += 1
+        total = len(self.batch_file_ids)
+        if self.polls < 2:
+            return SimpleNamespace(id=batch_id, status="in_progress", file_counts=counts(1, total - 1, 0, total))
+        failed = len(self.index_failed)
+        return SimpleNamespace(id=batch_id, status="completed", file_counts=counts(total - failed, 0, failed, total))
+
+    async def _list_files(self, batch_id, vector_store_id, filter):
+        for file_id in self.index_failed:
+            yield SimpleNamespace(id=file_id)
+
+
+def test_extract_zip_flattens_paths_and_skips_hidden_files(tmp_path):
+    archive = tmp_path / "kb.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("docs/a.txt", "A")
+        zf.writestr("other/a.txt", "B")
+        zf.writestr("../../evil.md", "C")  # бумадан тыс жол — өткізіледі
+        zf.writestr("notes.md", "D")
+        zf.writestr("__MACOSX/docs/._a.txt", "x")
+        zf.writestr(".DS_Store", "x")
+    out = tmp_path / "out"
+    out.mkdir()
+
+    paths = kb_ingest.extract_zip(archive, out)
+
+    assert sorted(path.name for path in paths) == ["a.txt", "a_1.txt", "notes.md"]
+    assert all(path.parent == out for path in paths)
+    with pytest.raises(ValueError):
+        kb_ingest.extract_zip(archive, out, max_bytes=2)
+
+
+def fake_document(source, file_name, mime_type):
+    async def download_to_drive(custom_path):
+        custom_path.write_bytes(source.read_bytes())
+
+    async def get_file():
+        return SimpleNamespace(download_to_drive=download_to_drive)
+
+    return SimpleNamespace(file_name=file_name, file_unique_id="u1", mime_type=mime_type, get_file=get_file)
+
+
+@pytest.mark.asyncio
+async def test_only_zip_archives_are_extracted(tmp_path):
+    archive = tmp_path / "source.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+        zf.writestr("word/document.xml", "<document/>")
+    session = kb_ingest.IngestSession()
+    try:
+        docx = await session.add_document(fake_document(
+            archive, "rules.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"))
+        extracted = await session.add_document(fake_document(archive, "kb.zip", "application/zip"))
+        renamed = await session.add_document(fake_document(archive, "kb", "application/zip"))
+    finally:
+        session.cleanup()
+
+    assert [path.name for path in docx] == ["rules.docx"]
+    assert sorted(path.name for path in extracted) == ["[Content_Types].xml", "document.xml"]
+    assert len(renamed) == 2
+
+
+@pytest.mark.asyncio
+async def test_files_are_uploaded_and_attached_in_one_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(kb_ingest, "KB_POLL_INTERVAL", 0)
+    paths = []
+    for name in ("a.txt", "b.txt", "bad.txt", "c.txt"):
+        path = tmp_path / name
+        path.write_text(name)
+        paths.append(path)
+    client = FakeClient(fail_names={"bad.txt"}, index_failed=["file_c.txt"])
+    reports = []
+
+    async def report(text):
+        reports.append(text)
+
+    progress = await kb_ingest.run_ingestion(paths, report, client=client, vector_store_id="vs_1")
+
+    assert sorted(client.uploads) == [("a.txt", b"a.txt"), ("b.txt", b"b.txt"), ("c.txt", b"c.txt")]
+    assert sorted(client.batch_file_ids) == ["file_a.txt", "file_b.txt", "file_c.txt"]
+    assert progress.upload_failed == ["bad.txt"] and progress.index_failed == ["c.txt"]
+    assert progress.batch_counts.completed == 2
+    final = progress.text(finished=True)
+    assert "bad.txt, c.txt" in final and "МБ/с" in final
+    assert reports
@@ -0,0 +1,79 @@
+# test_media_group.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot import pipeline
+from bot.media_group import MediaGroupCollector
+
+
+def photo_message(message_id, group="album_1", chat_id=1):
+    size = SimpleNamespace(width=1280, height=960, file_unique_id=f"uniq_{message_id}")
+    return SimpleNamespace(message_id=message_id, chat_id=chat_id, media_group_id=group, photo=[size])
+
+
+@pytest.mark.asyncio
+async def test_album_is_collected_by_the_first_handler_only():
+    collector = MediaGroupCollector(window=0.02, max_wait=1)
+
+    async def arrive(message, delay):
+        await asyncio.sleep(delay)
+        return await collector.collect(message)
+
+    leader, second, third, other = await asyncio.gather(
+        arrive(photo_message(3), 0), arrive(photo_message(2), 0.005), arrive(photo_message(4), 0.01),
+        arrive(photo_message(9, group="album_2"), 0),
+    )
+
+    assert [message.message_id for message in leader] == [2, 3, 4]
+    assert second is None and third is None
+    assert [message.message_id for message in other] == [9]
+
+
+@pytest.mark.asyncio
+async def test_collection_stops_at_max_wait():
+    collector = MediaGroupCollector(window=0.05, max_wait=0.08)
+
+    async def trickle():
+        for message_id in range(2, 6):
+            await asyncio.sleep(0.03)
+            await collector.collect(photo_message(message_id))
+
+    leader, _ = await asyncio.gather(collector.collect(photo_message(1)), trickle())
+
+    assert len(leader) < 5
+
+
+@pytest.mark.asyncio
+async def test_album_photos_are_read_concurrently_and_merged(monkeypatch):
+    texts = {"uniq_1": "Состав: сахар", "uniq_2": None, "uniq_3": None}
+    recognized = []
+
+    async def lookup_file(file_unique_id):
+        return texts[file_unique_id]
+
+    async def recognize(self, photo, timings):
+        recognized.append(photo.file_unique_id)
+        await asyncio.sleep(0.01)
+        if photo.file_unique_id == "uniq_3":
+            raise RuntimeError("vision down")
+        return "E120"
+
+    class Reply:
+        waits = 0
+
+        async def wait(self, text):
+            Reply.waits += 1
+
+    monkeypatch.setattr(pipeline.photo_cache, "lookup_file", lookup_file)
+    monkeypatch.setattr(pipeline.PhotoInput, "_recognize", recognize)
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=1, full_name="Test"))
+    source = pipeline.PhotoInput([photo_message(1), photo_message(2), photo_message(3)])
+
+    prepared = await source.prepare(update, "kk", Reply(), pipeline.StageTimings())
+
+    assert sorted(recognized) == ["uniq_2", "uniq_3"] and Reply.waits == 1
+    assert prepared.lookup_text == "Состав: сахар E120"
+    assert "1-сурет: Состав: сахар / 2-сурет: E120" in prepared.query_for_ai
+    assert "3 суретін" in prepared.query_for_ai
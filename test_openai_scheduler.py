@@ -0,0 +1,86 @@
+# test_openai_scheduler.py
+import asyncio
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from bot import metrics
+from bot.openai_scheduler import OpenAIScheduler
+
+
+def rate_limit_error(headers=None, code=None):
+    response = SimpleNamespace(request=None, status_code=429, headers=headers or {})
+    return openai.RateLimitError("rate limited", response=response, body={"code": code} if code else None)
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = OpenAIScheduler(max_concurrency=1)
+    order = []
+
+    async def job(name, tier):
+        async with scheduler.slot(tier):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async with scheduler.slot('free'):
+        tasks = [asyncio.create_task(job(name, tier)) for name, tier in
+                 [("free1", "free"), ("premium", "premium"), ("free2", "free"), ("admin", "admin")]]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["waiting"] == 4
+    await asyncio.gather(*tasks)
+
+    assert order == ["admin", "premium", "free1", "free2"]
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    scheduler = OpenAIScheduler(max_concurrency=1)
+    async with scheduler.slot():
+        waiter = asyncio.create_task(scheduler.slot().__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+    async with scheduler.slot():
+        assert scheduler.stats()["active"] == 1
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_retried_honouring_retry_after():
+    scheduler = OpenAIScheduler(max_retries=3, base_delay=0.001)
+    assert 0.05 <= scheduler.retry_delay(rate_limit_error({"retry-after-ms": "50"}), 0) <= 0.051
+    assert 2 <= scheduler.retry_delay(rate_limit_error({"retry-after": "2"}), 0) <= 2.001
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error({"retry-after-ms": "1"})
+        return "ok"
+
+    assert await scheduler.call(flaky) == "ok"
+    assert len(attempts) == 3 and scheduler.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_insufficient_quota_is_not_retried():
+    scheduler = OpenAIScheduler(max_retries=3, base_delay=0.001)
+
+    async def no_quota():
+        raise rate_limit_error(code="insufficient_quota")
+
+    with pytest.raises(openai.RateLimitError):
+        await scheduler.call(no_quota)
+    assert scheduler.stats()["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_is_recorded():
+    metrics.reset()
+    scheduler = OpenAIScheduler(max_concurrency=2)
+    async with scheduler.slot('premium'):
+        pass
+    assert metrics.snapshot()["latency"]["openai_queue_wait"]["count"] == 1
@@ -0,0 +1,68 @@
+# test_photo_cache.py
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from bot import answer_cache, photo_cache
+
+
+def label(text: str, quality: int = 90, size=(400, 300)) -> bytes:
+    """Өнім қаптамасына ұқсас сурет: мәтін мен жолақтар."""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 60), fill="darkgreen")
+    for row, line in enumerate(text.split("\n")):
+        draw.text((20, 90 + row * 30), line, fill="black")
+    draw.ellipse((280, 150, 380, 250), fill="red")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def distance(a: bytes, b: bytes) -> int:
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).bit_count()
+
+
+def test_perceptual_hash_tolerates_recompression_but_not_other_products():
+    original = photo_cache.perceptual_hash(label("Құрамы: қант, E120"))
+    recompressed = photo_cache.perceptual_hash(label("Құрамы: қант, E120", quality=40))
+    other = Image.new("RGB", (400, 300), "navy")
+    ImageDraw.Draw(other).rectangle((200, 0, 400, 300), fill="yellow")
+    buffer = io.BytesIO()
+    other.save(buffer, format="JPEG")
+
+    assert len(original) == photo_cache.PHOTO_HASH_SIZE ** 2 // 8
+    assert distance(original, recompressed) <= photo_cache.PHOTO_HASH_MAX_DISTANCE
+    assert distance(original, photo_cache.perceptual_hash(buffer.getvalue())) > photo_cache.PHOTO_HASH_MAX_DISTANCE
+    assert photo_cache.perceptual_hash(b"not an image") is None
+
+
+@pytest.mark.asyncio
+async def test_repeat_photo_is_found_by_file_id_then_by_hash(db):
+    image = label("Құрамы: желатин")
+    assert await photo_cache.lookup_file("uniq_1") is None
+    text, phash = await photo_cache.lookup_image("uniq_1", image)
+    assert text is None
+    await photo_cache.put("uniq_1", phash, "Құрамы: желатин")
+
+    assert await photo_cache.lookup_file("uniq_1") == "Құрамы: желатин"
+    # Басқа қолданушы сол қаптаманы қайта түсірді: file_unique_id басқа, хэш жақын
+    text, _ = await photo_cache.lookup_image("uniq_2", label("Құрамы: желатин", quality=50))
+    assert text == "Құрамы: желатин"
+    assert await photo_cache.lookup_file("uniq_2") == "Құрамы: желатин"
+
+
+@pytest.mark.asyncio
+async def test_photo_cache_is_size_bounded(db, monkeypatch):
+    monkeypatch.setattr(photo_cache, "PHOTO_CACHE_MAX_ROWS", 2)
+    for index in range(3):
+        await photo_cache.put(f"uniq_{index}", None, f"мәтін {index}")
+
+    assert db.get_photo_cache_stats()["rows"] == 2
+    assert await photo_cache.lookup_file("uniq_0") is None
+    assert await photo_cache.lookup_file("uniq_2") == "мәтін 2"
+
+
+def test_photo_answers_do_not_collide_with_text_questions():
+    assert answer_cache.make_key(photo_cache.answer_key("E120"), "kk") != answer_cache.make_key("E120", "kk")
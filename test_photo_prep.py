@@ -0,0 +1,54 @@
+# test_photo_prep.py
+import io
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image, ImageDraw
+
+from bot import photo_prep
+
+
+def size(width, height, name):
+    return SimpleNamespace(width=width, height=height, file_unique_id=name)
+
+
+def test_smallest_readable_size_is_selected():
+    sizes = [size(90, 67, "s"), size(320, 240, "m"), size(800, 600, "x"), size(1280, 960, "y"), size(2560, 1920, "w")]
+    assert photo_prep.select_photo_size(sizes, min_side=720).file_unique_id == "y"
+    assert photo_prep.select_photo_size(sizes, min_side=500).file_unique_id == "x"
+    # Жеткілікті өлшем жоқ болса — ең үлкені
+    assert photo_prep.select_photo_size(sizes[:3], min_side=720).file_unique_id == "x"
+
+
+def test_preprocess_grayscales_crops_and_shrinks(monkeypatch):
+    monkeypatch.setattr(photo_prep, "PHOTO_MAX_SIDE", 400)
+    image = Image.new("RGB", (1200, 900), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((300, 200, 900, 700), fill="orange")
+    draw.text((350, 300), "Состав: сахар, E120", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    original = buffer.getvalue()
+
+    processed = photo_prep.preprocess(original)
+
+    with Image.open(io.BytesIO(processed)) as result:
+        assert result.mode == "L" and result.format == "JPEG"
+        assert max(result.size) <= 400
+        # Ақ жиектер кесілді: пропорция ішкі тіктөртбұрышқа жақын
+        assert abs(result.width / result.height - 600 / 500) < 0.1
+    assert len(processed) < len(original)
+    assert photo_prep.preprocess(b"not an image") == b"not an image"
+
+
+@pytest.mark.asyncio
+async def test_download_reads_into_memory_once():
+    class File:
+        async def download_to_memory(self, out):
+            out.write(b"jpeg-bytes")
+
+    class Photo:
+        async def get_file(self):
+            return File()
+
+    assert await photo_prep.download(Photo()) == b"jpeg-bytes"
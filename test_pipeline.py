@@ -0,0 +1,105 @@
+# test_pipeline.py
+from types import SimpleNamespace
+
+import pytest
+
+from bot import metrics, pipeline
+
+
+def test_shared_client_uses_tuned_pool_and_no_sdk_retries():
+    client = pipeline.create_openai_client(api_key="test")
+    pool = client._client._transport._pool
+    assert client.max_retries == 0
+    assert pool._max_connections == pipeline.OPENAI_HTTP_MAX_CONNECTIONS
+    assert pool._max_keepalive_connections == pipeline.OPENAI_HTTP_MAX_KEEPALIVE
+    assert client.timeout.connect == pipeline.OPENAI_HTTP_CONNECT_TIMEOUT
+
+
+def test_stage_timings_accumulate_and_are_recorded():
+    metrics.reset()
+    timings = pipeline.StageTimings()
+    with timings.stage("ocr"):
+        pass
+    timings.add("run", 0.5)
+    timings.add("run", 0.25)
+    timings.finish(1, "photo")
+
+    assert timings.stages["run"] == 0.75
+    latency = metrics.snapshot()["latency"]
+    assert latency["stage_ocr"]["count"] == 1
+    assert latency["stage_run"]["count"] == 2
+    assert latency["stage_total"]["count"] == 1
+
+
+class Message:
+    def __init__(self):
+        self.replies = []
+        self.edits = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+@pytest.mark.asyncio
+async def test_reply_sends_one_message_and_then_edits_it():
+    message = Message()
+    reply = pipeline.Reply(message)
+    await reply.wait("Күте тұрыңыз...")
+    await reply.wait("Сурет талданды")
+    await reply.final("Жауап")
+
+    assert message.replies == ["Күте тұрыңыз..."]
+    assert message.edits == ["Сурет талданды", "Жауап"]
+
+
+@pytest.mark.asyncio
+async def test_standalone_question_in_an_ongoing_thread_is_cached(db, monkeypatch):
+    from bot import answer_cache
+
+    answer_cache._memory.invalidate()
+    runs = []
+
+    async def prepare_thread(user_id):
+        return "thread_1", 7, None  # қолданушының бұрыннан сұхбаты бар
+
+    async def poll_assistant(query, thread_id, user_id, timings):
+        runs.append(query)
+        return "E120 — харам.", thread_id, "completed"
+
+    async def allow(user, request_type, lang_code):
+        return None
+
+    def constant(value):
+        async def get(*args):
+            return value
+        return get
+
+    monkeypatch.setattr(pipeline, "OPENAI_STREAMING", False)
+    monkeypatch.setattr(pipeline, "check_user_limits", allow)
+    monkeypatch.setattr(pipeline, "local_verdict", lambda text, lang: None)
+    monkeypatch.setattr(pipeline, "get_user_language", constant("kk"))
+    monkeypatch.setattr(pipeline.thread_policy, "prepare_thread", prepare_thread)
+    monkeypatch.setattr(pipeline.quota, "get_user_tier", constant("free"))
+    monkeypatch.setattr(pipeline, "_poll_assistant", poll_assistant)
+    monkeypatch.setattr(pipeline, "record_thread_turn", constant(None))
+
+    def update(text):
+        message = Message()
+        message.text = text
+        return SimpleNamespace(effective_user=SimpleNamespace(id=1, full_name="Test"), message=message)
+
+    await pipeline.handle_request(update("E120 халал ма?"), pipeline.TextInput())
+    assert await answer_cache.get("E120 халал ма?", "kk") == "E120 — харам."
+
+    # Келесі қолданушы ассистентсіз кэштен жауап алады, ал "ал бұл ше?" кэштелмейді
+    second = update("е-120 халал ма")
+    await pipeline.handle_request(second, pipeline.TextInput())
+    await pipeline.handle_request(update("ал бұл ше?"), pipeline.TextInput())
+    assert len(runs) == 2
+    assert second.message.replies == ["E120 — харам."]
+    assert await answer_cache.get("ал бұл ше?", "kk") is None
+    answer_cache._memory.invalidate()
@@ -0,0 +1,39 @@
+# test_quota.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bot import quota
+
+
+def test_limit_is_enforced_and_counted(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    assert [db.check_and_increment_usage(1, 'text', 2) for _ in range(3)] == [True, True, False]
+    assert db.check_and_increment_usage(1, 'photo', 1)
+    assert db.get_user_usage(1)[:2] == (2, 1)
+
+def test_counters_reset_on_new_day(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO user_usage (user_id, usage_date, text_count) VALUES (1, '2000-01-01', 5)")
+    assert db.check_and_increment_usage(1, 'text', 2)
+    assert db.get_user_usage(1)[0] == 1
+
+def test_concurrent_threads_never_exceed_limit(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: db.check_and_increment_usage(1, 'text', 25), range(200)))
+    assert results.count(True) == 25
+    db.close_connections()
+    assert db.get_user_usage(1)[0] == 25
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_never_exceed_limit(db):
+    db.add_or_update_user(1, "Test", "test", "kk")
+    results = await asyncio.gather(*(quota.consume(1, 'photo') for _ in range(100)))
+    assert [allowed for allowed, _ in results].count(True) == quota.get_limit('free', 'photo')
+
+def test_tier_limits():
+    assert quota.get_limit('admin', 'text') is None
+    assert quota.get_limit('unknown', 'photo') == quota.get_limit('free', 'photo')
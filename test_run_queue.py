@@ -0,0 +1,67 @@
+# test_run_queue.py
+import asyncio
+
+import pytest
+
+from bot.run_queue import UserRunQueue
+
+
+class Message:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text):
+        self.edits.append(text)
+
+
+@pytest.mark.asyncio
+async def test_messages_during_active_run_are_merged_into_one_follow_up():
+    calls, active = [], {"count": 0, "max": 0}
+    release = asyncio.Event()
+
+    async def runner(user_id, waiting_message, query, question, reply_markup, timings):
+        active["count"] += 1
+        active["max"] = max(active["max"], active["count"])
+        calls.append(query)
+        if len(calls) == 1:
+            await release.wait()
+        active["count"] -= 1
+        return f"жауап: {query}"
+
+    queue = UserRunQueue(runner)
+    messages = [Message() for _ in range(3)]
+    first = asyncio.create_task(queue.submit(1, messages[0], "q1", "q1", None, merged_text="біріктірілді"))
+    await asyncio.sleep(0)
+    rest = [
+        asyncio.create_task(queue.submit(1, messages[i], f"q{i + 1}", f"q{i + 1}", None, merged_text="біріктірілді"))
+        for i in (1, 2)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == "жауап: q1"
+    assert await asyncio.gather(*rest) == [None, None]
+    assert calls == ["q1", "q2\n\nq3"]
+    assert active["max"] == 1
+    assert messages[1].edits == ["біріктірілді"] and messages[2].edits == []
+    assert queue.stats() == {"active_users": 0, "queued": 0, "runs": 2, "merged": 1}
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_in_parallel_and_errors_reach_the_caller():
+    started = []
+
+    async def runner(user_id, waiting_message, query, question, reply_markup, timings):
+        started.append(user_id)
+        await asyncio.sleep(0.01)
+        if user_id == 2:
+            raise RuntimeError("openai down")
+        return "ok"
+
+    queue = UserRunQueue(runner)
+    results = await asyncio.gather(
+        queue.submit(1, Message(), "a", "a", None), queue.submit(2, Message(), "b", "b", None),
+        return_exceptions=True,
+    )
+    assert results[0] == "ok" and isinstance(results[1], RuntimeError)
+    assert sorted(started) == [1, 2]
@@ -0,0 +1,73 @@
+# test_run_supervisor.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.run_supervisor import RunSupervisor, RunTimeout
+
+
+class FakeRuns:
+    """Әр run берілген сұраулар санынан кейін аяқталатын runs API."""
+
+    def __init__(self, polls_until_done: dict[str, int]):
+        self.polls_until_done = polls_until_done
+        self.retrieved: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def retrieve(self, thread_id, run_id):
+        self.retrieved.append(run_id)
+        done = self.retrieved.count(run_id) >= self.polls_until_done[run_id]
+        return SimpleNamespace(id=run_id, thread_id=thread_id, status='completed' if done else 'in_progress')
+
+    async def cancel(self, thread_id, run_id):
+        self.cancelled.append(run_id)
+
+
+def make_supervisor(runs: FakeRuns, **kwargs) -> RunSupervisor:
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    return RunSupervisor(lambda: client, **kwargs)
+
+
+def queued(run_id: str):
+    return SimpleNamespace(id=run_id, thread_id=f"thread_{run_id}", status='queued')
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_share_one_poller():
+    runs = FakeRuns({"a": 1, "b": 3, "c": 2})
+    supervisor = make_supervisor(runs, initial_interval=0.01, max_interval=0.02)
+
+    results = await asyncio.gather(*(supervisor.wait(queued(run_id)) for run_id in "abc"))
+
+    assert [run.status for run in results] == ["completed"] * 3
+    assert sorted(runs.retrieved) == ["a", "b", "b", "b", "c", "c"]
+    assert supervisor.stats()["in_flight"] == 0
+    assert supervisor.stats()["completed"] == 3
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_run_past_deadline_is_cancelled():
+    runs = FakeRuns({"slow": 1000})
+    supervisor = make_supervisor(runs, initial_interval=0.01, max_interval=0.01)
+
+    with pytest.raises(RunTimeout):
+        await supervisor.wait(queued("slow"), timeout=0.05)
+
+    assert runs.cancelled == ["slow"]
+    assert supervisor.stats()["timeouts"] == 1
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_poll_interval_backs_off():
+    runs = FakeRuns({"x": 1000})
+    supervisor = make_supervisor(runs, initial_interval=0.01, max_interval=0.08, backoff=2)
+
+    with pytest.raises(RunTimeout):
+        await supervisor.wait(queued("x"), timeout=0.2)
+
+    # Тұрақты 0.01 с аралықпен ~20 сұрау болар еді; backoff-пен әлдеқайда аз
+    assert len(runs.retrieved) <= 6
+    await supervisor.stop()
@@ -0,0 +1,66 @@
+# test_streaming.py
+import pytest
+import pytest_asyncio
+from openai import AsyncOpenAI
+
+from bot import metrics, pipeline
+from fake_openai_server import DEFAULT_REPLY, FakeOpenAIServer
+
+
+@pytest_asyncio.fixture
+async def fake_openai(monkeypatch):
+    async with FakeOpenAIServer(chunk_size=5, chunk_delay=0.005) as server:
+        client = AsyncOpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+        monkeypatch.setattr(pipeline, "client_openai", client)
+        monkeypatch.setattr(pipeline, "OPENAI_ASSISTANT_ID", "asst_fake")
+        metrics.reset()
+        yield server
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_creates_thread_and_delivers_text_progressively(fake_openai):
+    partials = []
+
+    async def on_text(text):
+        partials.append(text)
+
+    text, thread_id, status = await pipeline.stream_openai_assistant("E120 халал ма?", None, on_text)
+
+    assert status == "completed"
+    assert text == DEFAULT_REPLY
+    assert thread_id.startswith("thread_")
+    assert len(partials) > 1
+    assert all(DEFAULT_REPLY.startswith(partial) for partial in partials)
+    assert metrics.snapshot()["latency"]["openai_ttft"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_reuses_existing_thread(fake_openai):
+    async def on_text(text):
+        pass
+
+    text, thread_id, status = await pipeline.stream_openai_assistant("Тағы сұрақ", "thread_42", on_text)
+
+    assert (thread_id, status) == ("thread_42", "completed")
+    paths = [path for _, path, _ in fake_openai.requests]
+    assert paths == ["/v1/threads/thread_42/messages", "/v1/threads/thread_42/runs"]
+    assert pipeline.clean_assistant_text(text) == "E120 (кармин) жәндіктерден алынады, сондықтан халал емес."
+
+
+@pytest.mark.asyncio
+async def test_progressive_editor_throttles_edits():
+    from bot.pipeline import ProgressiveEditor
+
+    class Message:
+        def __init__(self):
+            self.edits = []
+
+        async def edit_text(self, text):
+            self.edits.append(text)
+
+    message = Message()
+    editor = ProgressiveEditor(message, interval=60)
+    await editor.update("Бірінші")
+    await editor.update("Бірінші бөлік")
+    assert message.edits == ["Бірінші ▌"]
@@ -0,0 +1,39 @@
+# test_thread_policy.py
+import time
+
+import pytest
+
+from bot import repository, thread_policy
+
+
+def test_should_rotate_on_turns_age_or_unknown_age(monkeypatch):
+    monkeypatch.setattr(thread_policy, "THREAD_MAX_TURNS", 10)
+    monkeypatch.setattr(thread_policy, "THREAD_MAX_AGE_HOURS", 1)
+    now = time.time()
+    assert not thread_policy.should_rotate(now - 60, 3, now)
+    assert thread_policy.should_rotate(now - 60, 10, now)
+    assert thread_policy.should_rotate(now - 7200, 0, now)
+    assert thread_policy.should_rotate(None, 0, now)
+
+
+@pytest.mark.asyncio
+async def test_turns_are_counted_and_thread_is_rotated_with_summary(db, monkeypatch):
+    monkeypatch.setattr(thread_policy, "THREAD_MAX_TURNS", 2)
+    db.add_or_update_user(1, "Test", "test", "kk")
+    await repository.set_thread_id(1, "thread_a")
+
+    assert await thread_policy.prepare_thread(1) == ("thread_a", 0, None)
+    await repository.record_thread_turn(1, "thread_a")
+    await repository.record_thread_turn(1, "thread_old")  # басқа thread-тің run-ы есептелмейді
+    await repository.set_last_q_and_a(1, "E471 халал ма?", "Шығу тегіне байланысты.")
+    await repository.journal.flush()
+    assert db.get_thread_state(1)[::2] == ("thread_a", 1)
+
+    await repository.record_thread_turn(1, "thread_a")
+    thread_id, turns, summary = await thread_policy.prepare_thread(1)
+    assert (thread_id, turns) == (None, 0)
+    assert "E471 халал ма?" in summary
+
+    await repository.set_thread_id(1, "thread_b")
+    await repository.journal.flush()
+    assert db.get_thread_state(1)[::2] == ("thread_b", 0)
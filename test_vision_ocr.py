@@ -0,0 +1,54 @@
+# test_vision_ocr.py
+import asyncio
+
+import pytest
+
+from bot import metrics
+from bot.vision_ocr import VisionBatcher
+from fake_vision import FakeVisionClient
+
+
+@pytest.mark.asyncio
+async def test_concurrent_photos_share_one_batch_request():
+    metrics.reset()
+    fake = FakeVisionClient({b"img1": "E120 кармин", b"img2": "шошқа желатині"})
+    batcher = VisionBatcher(lambda: fake, max_batch=16, max_wait_ms=10)
+
+    first, second, empty = await asyncio.gather(
+        batcher.text_detection(b"img1"), batcher.text_detection(b"img2"), batcher.text_detection(b"blank")
+    )
+
+    assert fake.batch_sizes == [3]
+    assert first.text_annotations[0].description == "E120 кармин"
+    assert second.text_annotations[0].description == "шошқа желатині"
+    assert not empty.text_annotations
+    assert metrics.snapshot()["latency"]["vision_ocr"]["count"] == 3
+    assert batcher.stats()["avg_batch"] == 3
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting():
+    fake = FakeVisionClient()
+    batcher = VisionBatcher(lambda: fake, max_batch=2, max_wait_ms=10_000)
+
+    await asyncio.wait_for(asyncio.gather(*(batcher.text_detection(b"x") for _ in range(4))), timeout=1)
+
+    assert fake.batch_sizes == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_client_is_created_lazily_and_errors_reach_every_caller():
+    created = []
+
+    def factory():
+        created.append(1)
+        return FakeVisionClient(error=RuntimeError("vision down"))
+
+    batcher = VisionBatcher(factory, max_wait_ms=1)
+    assert not created
+
+    results = await asyncio.gather(batcher.text_detection(b"a"), batcher.text_detection(b"b"), return_exceptions=True)
+
+    assert len(created) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.stats()["errors"] == 1